@@ -1,8 +1,15 @@
+import json
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
 from django.core.cache import cache
+from django.test import RequestFactory
 from rest_framework.reverse import reverse
 from rest_framework.test import APITestCase
 import vcr
 
+from api import views
+from elections.models import InvalidPostcodeError
 from people.tests.factories import PersonFactory, PersonPostFactory
 from parties.tests.factories import PartyFactory
 from elections.tests.factories import (
@@ -22,6 +29,14 @@ class TestAPIBasics(APITestCase):
         assert req.status_code == 400
         assert req.data == {"detail": "postcode is a required GET parameter"}
 
+    def test_candidates_for_invalid_postcode(self):
+        url = reverse("api:candidates-for-postcode-list")
+        with patch("core.upstream.get") as get:
+            req = self.client.get("{}?postcode=NOTAPOSTCODE".format(url))
+        assert req.status_code == 400
+        assert req.data == {"detail": "Could not find postcode"}
+        get.assert_not_called()
+
 
 class TestAPISearchViews(APITestCase):
     def setUp(self):
@@ -93,14 +108,14 @@ class TestAPISearchViews(APITestCase):
     @vcr.use_cassette("fixtures/vcr_cassettes/test_postcode_view.yaml")
     def test_candidates_for_postcode_view(self):
         url = reverse("api:candidates-for-postcode-list")
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(5):
             req = self.client.get("{}?postcode=EC1A4EU".format(url))
         assert req.status_code == 200
         assert req.json() == self.expected_response
 
     def test_candidates_for_ballots(self):
         url = reverse("api:candidates-for-ballots-list")
-        with self.assertNumQueries(6):
+        with self.assertNumQueries(5):
             req = self.client.get(
                 "{}?ballot_ids=parl.cities-of-london-and-westminster.2017-06-08".format(
                     url
@@ -117,3 +132,29 @@ class TestAPISearchViews(APITestCase):
         req = self.client.get("{}?postcode=EC1A4EU".format(url))
         assert req.status_code == 200
         assert req.json()[0]["ballot_locked"] == True
+
+    def test_async_candidates_for_postcode_view(self):
+        request = RequestFactory().get("/", {"postcode": "EC1A4EU"})
+        ballots = views.CandidatesAndElectionsForPostcodeViewSet().get_ballots_queryset(
+            [self.post_election.ballot_paper_id]
+        )
+        with patch.object(
+            views.CandidatesAndElectionsForPostcodeViewSet,
+            "apostcode_to_ballots",
+            return_value=ballots,
+        ):
+            response = async_to_sync(views.candidates_for_postcode)(request)
+            response.render()
+        assert response.status_code == 200
+        assert json.loads(response.content) == self.expected_response
+
+    def test_async_candidates_for_postcode_view_invalid_postcode(self):
+        request = RequestFactory().get("/", {"postcode": "NOTAPOSTCODE"})
+        with patch.object(
+            views.CandidatesAndElectionsForPostcodeViewSet,
+            "apostcode_to_ballots",
+            side_effect=InvalidPostcodeError,
+        ):
+            response = async_to_sync(views.candidates_for_postcode)(request)
+        assert response.status_code == 400
+        assert response.data == {"detail": "Could not find postcode"}
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 
 from rest_framework import routers
@@ -18,7 +19,18 @@ router.register(
 )
 
 
-urlpatterns = [
+urlpatterns = []
+if settings.ASYNC_POSTCODE_VIEWS:
+    # Takes precedence over the router's sync view of the same name
+    urlpatterns.append(
+        path(
+            "candidates_for_postcode/",
+            views.candidates_for_postcode,
+            name="candidates-for-postcode-list",
+        )
+    )
+
+urlpatterns += [
     path(r"", include(router.urls)),
     path(
         "last-updated-timestamps/",
@@ -1,5 +1,7 @@
 import abc
 
+from asgiref.sync import sync_to_async
+
 from rest_framework import viewsets
 from rest_framework.exceptions import APIException
 from rest_framework.response import Response
@@ -10,7 +12,7 @@ from django.utils.http import urlencode
 
 from api import serializers
 from api.serializers import VotingSystemSerializer
-from core.helpers import clean_postcode
+from core.postcodes import clean_postcode
 from elections.views import mixins
 from elections.models import PostElection, InvalidPostcodeError
 from hustings.api.serializers import HustingSerializer
@@ -66,7 +68,7 @@ class BaseCandidatesAndElectionsViewSet(
         postelections = postelections.select_related("voting_system")
         for postelection in postelections:
             candidates = []
-            personposts = self.people_for_ballot(postelection, compact=True)
+            personposts = self.people_for_ballot(postelection)
             for personpost in personposts:
                 candidates.append(
                     serializers.PersonPostSerializer(
@@ -115,17 +117,49 @@ class BaseCandidatesAndElectionsViewSet(
 class CandidatesAndElectionsForPostcodeViewSet(
     BaseCandidatesAndElectionsViewSet, mixins.PostcodeToPostsMixin
 ):
+    # Set by candidates_for_postcode when the ballots have already been
+    # looked up asynchronously
+    ballots = None
+    postcode_invalid = False
+
     def get_ballots(self, request):
+        if self.postcode_invalid:
+            raise InvalidPostcode()
+        if self.ballots is not None:
+            return self.ballots
         postcode = request.GET.get("postcode", None)
         if not postcode:
             raise PostcodeNotProvided()
         postcode = clean_postcode(postcode)
         try:
-            return self.postcode_to_ballots(postcode, compact=True)
+            return self.postcode_to_ballots(postcode)
         except InvalidPostcodeError:
             raise InvalidPostcode()
 
 
+async def candidates_for_postcode(request):
+    """
+    CandidatesAndElectionsForPostcodeViewSet for when the site is served with
+    ASGI. The ballots are looked up with the async postcode pipeline, then the
+    response is built by the viewset in a thread, as DRF views aren't async.
+    """
+    initkwargs = {}
+    postcode = request.GET.get("postcode", None)
+    if postcode:
+        view = CandidatesAndElectionsForPostcodeViewSet()
+        try:
+            initkwargs["ballots"] = await view.apostcode_to_ballots(
+                clean_postcode(postcode)
+            )
+        except InvalidPostcodeError:
+            initkwargs["postcode_invalid"] = True
+
+    viewset = CandidatesAndElectionsForPostcodeViewSet.as_view(
+        {"get": "list", "head": "list"}, **initkwargs
+    )
+    return await sync_to_async(viewset)(request)
+
+
 class CandidatesAndElectionsForBallots(BaseCandidatesAndElectionsViewSet):
     def get_ballots(self, request):
         ballot_ids_str = request.GET.get("ballot_ids", None)
@@ -0,0 +1,35 @@
+from django_redis.client import DefaultClient
+
+from core.timing import timed
+
+
+class TimedRedisClient(DefaultClient):
+    """
+    django-redis client that records how long each cache call takes in the
+    current request's timings. set_many isn't wrapped as it calls set for
+    each key.
+    """
+
+    def get(self, *args, **kwargs):
+        with timed("cache"):
+            return super().get(*args, **kwargs)
+
+    def get_many(self, *args, **kwargs):
+        with timed("cache"):
+            return super().get_many(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        with timed("cache"):
+            return super().set(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        with timed("cache"):
+            return super().add(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with timed("cache"):
+            return super().delete(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        with timed("cache"):
+            return super().delete_many(*args, **kwargs)
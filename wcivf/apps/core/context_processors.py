@@ -1,6 +1,6 @@
 from django.conf import settings
 
-from core.helpers import clean_postcode
+from core.postcodes import clean_postcode
 from .forms import PostcodeLookupForm
 
 
@@ -1,4 +1,24 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core.timing import get_current_timings, record_timings, timed
+
+logger = logging.getLogger(__name__)
+
+
 class UTMTrackerMiddleware(object):
+    """
+    Adds the request's UTM parameters to `request.utm_data`, so postcode
+    lookups can be attributed to a campaign. They are kept on the request
+    rather than in the session, so anonymous requests don't save a session.
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
 
@@ -13,4 +33,56 @@ class UTMTrackerMiddleware(object):
 
         keys = ("utm_source", "utm_medium", "utm_campaign")
         utm_data = {k: v for k, v in map(_get_value_from_req, keys) if v}
-        request.session["utm_data"] = utm_data
+        request.utm_data = utm_data
+
+
+class HotPathTimingMiddleware(object):
+    """
+    Times database queries, cache calls, upstream requests and template
+    rendering for a sample of requests. The timings are added to the
+    response in a `Server-Timing` header, and logged as JSON.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.HOT_PATH_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with record_timings() as timings, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.time_query))
+            response = self.get_response(request)
+        timings.add("total", time.perf_counter() - start)
+
+        response["Server-Timing"] = timings.server_timing_header()
+        logger.info(
+            json.dumps(
+                {
+                    "path": request.path,
+                    "status": response.status_code,
+                    "timings": timings.as_dict(),
+                }
+            )
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        timings = get_current_timings()
+        if timings is None:
+            return response
+
+        start = time.perf_counter()
+
+        def finished_rendering(response):
+            timings.add("template", time.perf_counter() - start)
+
+        response.add_post_render_callback(finished_rendering)
+        return response
+
+    @staticmethod
+    def time_query(execute, sql, params, many, context):
+        with timed("db"):
+            return execute(sql, params, many, context)
@@ -1,6 +1,6 @@
 import csv
-import requests
 
+from core import upstream
 from elections.models import PostElection
 
 
@@ -13,7 +13,7 @@ class ReadFromUrlMixin:
         Takes optional url otherwise uses URL used in init method
         """
         url = url or self.url
-        with requests.get(url, stream=True) as r:
+        with upstream.get(url, stream=True) as r:
             r.encoding = "utf-8"
             yield from csv.DictReader(r.iter_lines(decode_unicode=True))
 
@@ -0,0 +1,59 @@
+"""
+Normalising and validating UK postcodes.
+
+Postcodes are checked against the format of a UK postcode before they are
+looked up, so an invalid postcode is rejected straight away rather than after
+a request to EveryElection. If `settings.POSTCODE_OUTCODES_FILE` is set, the
+outward code (the part before the space) must also be one of the outward
+codes listed in that file, one per line. The non-geographic postcode
+GIR 0AA doesn't follow the usual format, so is allowed as a special case.
+"""
+import functools
+import re
+
+from django.conf import settings
+
+# A digit followed by two letters other than C, I, K, M, O or V
+INCODE_PATTERN = "[0-9][ABD-HJLNP-UW-Z]{2}"
+OUTCODE_PATTERN = "[A-Z]{1,2}[0-9][A-Z0-9]?"
+GIROBANK_POSTCODE = "GIR 0AA"
+
+SPACE_REGEX = re.compile(r" *({})$".format(INCODE_PATTERN))
+POSTCODE_REGEX = re.compile(
+    r"^(?:(?P<outcode>{}) (?P<incode>{})|{})$".format(
+        OUTCODE_PATTERN, INCODE_PATTERN, GIROBANK_POSTCODE
+    )
+)
+
+
+def clean_postcode(postcode):
+    """
+    Upper cases the postcode and puts a single space before the inward code
+    """
+    postcode = postcode.replace("+", "").strip().upper()
+    return SPACE_REGEX.sub(r" \1", postcode)
+
+
+@functools.lru_cache(maxsize=None)
+def known_outcodes():
+    """
+    Returns the outward codes in POSTCODE_OUTCODES_FILE, or an empty set if
+    it isn't set
+    """
+    if not settings.POSTCODE_OUTCODES_FILE:
+        return frozenset()
+    with open(settings.POSTCODE_OUTCODES_FILE) as outcodes_file:
+        return frozenset(
+            line.strip().upper() for line in outcodes_file if line.strip()
+        )
+
+
+def is_valid_postcode(postcode):
+    match = POSTCODE_REGEX.match(clean_postcode(postcode))
+    if not match:
+        return False
+    if not match.group("outcode"):
+        # GIR 0AA, which isn't in any list of outward codes
+        return True
+    outcodes = known_outcodes()
+    return not outcodes or match.group("outcode") in outcodes
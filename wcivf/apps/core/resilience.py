@@ -0,0 +1,218 @@
+"""
+Helpers for keeping pages fast when an upstream API is slow or down.
+
+`StaleWhileRevalidateCache` keeps cached values past their freshness, serving
+the stale value while a fresh one is fetched in the background, and caches
+failures briefly so that every visitor doesn't wait on a failing API.
+
+`CircuitBreaker` counts failures in the cache, so they are shared by every
+server, and stops calls to an API for a while once it has failed too often.
+"""
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from core.single_flight import async_single_flight, single_flight
+
+_background_tasks = set()
+
+
+async def async_cache_call(func, *args):
+    """
+    Calls a cache function from an async view. Django 3.2's cache has no
+    async API, so it is called from a thread to avoid blocking the event loop
+    """
+    return await sync_to_async(func, thread_sensitive=False)(*args)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(
+        self, name, failure_threshold, failure_window, recovery_timeout
+    ):
+        self.failures_key = f"circuit_{name}_failures"
+        self.open_key = f"circuit_{name}_open"
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.recovery_timeout = recovery_timeout
+
+    def is_open(self):
+        return bool(cache.get(self.open_key))
+
+    def check(self):
+        if self.is_open():
+            raise CircuitOpenError(self.open_key)
+
+    def record_failure(self):
+        """
+        Counts a failure, and opens the circuit for recovery_timeout seconds
+        if there have been failure_threshold failures within failure_window
+        seconds
+        """
+        cache.add(self.failures_key, 0, self.failure_window)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            # the count expired between add and incr
+            return
+        if failures >= self.failure_threshold:
+            cache.set(self.open_key, True, self.recovery_timeout)
+            cache.delete(self.failures_key)
+
+
+class StaleWhileRevalidateCache:
+    """
+    Caches values for up to hard_ttl seconds. Values older than soft_ttl are
+    still returned, but a fresh value is fetched in the background using
+    executor. Empty values, and the default returned when fetching fails, are
+    only kept for negative_ttl seconds.
+    """
+
+    def __init__(self, soft_ttl, hard_ttl, negative_ttl, executor):
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.negative_ttl = negative_ttl
+        self.executor = executor
+
+    def get_entry(self, key):
+        """
+        Returns the cached entry for key, or None if it isn't cached. Values
+        cached in another format, such as by an earlier release, are treated
+        as not being cached.
+        """
+        entry = cache.get(key)
+        if not isinstance(entry, dict):
+            return None
+        if "value" not in entry or "fresh_until" not in entry:
+            return None
+        return entry
+
+    def get(self, key, fetch, default=None):
+        """
+        Returns the cached value for key, calling fetch to get it if it isn't
+        cached. If fetch raises an exception, default is returned instead.
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            return self.refresh(key, fetch, default)
+
+        if time.time() >= entry["fresh_until"]:
+            self.revalidate(key, fetch)
+        return entry["value"]
+
+    def get_if_cached(self, key, fetch, default=None):
+        """
+        The same as `get`, except that if the key isn't cached, None is
+        returned straight away and the value is fetched in the background
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            self.executor.submit(self.refresh, key, fetch, default)
+            return None
+
+        if time.time() >= entry["fresh_until"]:
+            self.revalidate(key, fetch)
+        return entry["value"]
+
+    def is_fresh(self, key):
+        """
+        Returns True if a value for key is cached and isn't yet due to be
+        revalidated
+        """
+        entry = self.get_entry(key)
+        return entry is not None and time.time() < entry["fresh_until"]
+
+    def set(self, key, value):
+        if value:
+            soft_ttl, hard_ttl = self.soft_ttl, self.hard_ttl
+        else:
+            soft_ttl = hard_ttl = self.negative_ttl
+        entry = {"value": value, "fresh_until": time.time() + soft_ttl}
+        cache.set(key, entry, hard_ttl)
+        return entry
+
+    def refresh(self, key, fetch, default=None):
+        """
+        Fetches and caches a value for a key that isn't cached. Concurrent
+        requests for the same key wait for one of them to do this.
+        """
+
+        def fetch_and_set():
+            try:
+                value = fetch()
+            except Exception:
+                value = default
+            return self.set(key, value)
+
+        entry = single_flight(
+            key, fetch=fetch_and_set, check=lambda: self.get_entry(key)
+        )
+        return entry["value"]
+
+    def revalidate(self, key, fetch):
+        """
+        Refreshes a stale value in the background. Only one refresh runs for
+        each key at a time, and a refresh that fails leaves the stale value
+        in the cache.
+        """
+        if not cache.add(f"{key}_revalidating", True, self.negative_ttl):
+            return
+
+        def refresh_stale():
+            try:
+                self.set(key, fetch())
+            except Exception:
+                pass
+
+        self.executor.submit(refresh_stale)
+
+    async def aget(self, key, fetch, default=None):
+        """
+        The same as `get`, for async views, where fetch is a coroutine
+        function. Stale values are refreshed in a background task.
+        """
+        entry = await async_cache_call(self.get_entry, key)
+        if entry is None:
+            return await self.arefresh(key, fetch, default)
+
+        if time.time() >= entry["fresh_until"]:
+            await self.arevalidate(key, fetch)
+        return entry["value"]
+
+    async def arefresh(self, key, fetch, default=None):
+        async def fetch_and_set():
+            try:
+                value = await fetch()
+            except Exception:
+                value = default
+            return await async_cache_call(self.set, key, value)
+
+        async def check():
+            return await async_cache_call(self.get_entry, key)
+
+        entry = await async_single_flight(key, fetch=fetch_and_set, check=check)
+        return entry["value"]
+
+    async def arevalidate(self, key, fetch):
+        added = await async_cache_call(
+            cache.add, f"{key}_revalidating", True, self.negative_ttl
+        )
+        if not added:
+            return
+
+        async def refresh_stale():
+            try:
+                value = await fetch()
+            except Exception:
+                return
+            await async_cache_call(self.set, key, value)
+
+        task = asyncio.ensure_future(refresh_stale())
+        # keep a reference so the task isn't garbage collected before it runs
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
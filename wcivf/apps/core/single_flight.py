@@ -0,0 +1,125 @@
+"""
+Request coalescing for cache misses.
+
+When a popular key expires, every request that misses it would otherwise do
+the same expensive work at the same time. `single_flight` takes a lock in
+Redis so that only one worker calls `fetch` for a key. The others poll
+`check` (usually a cache read) until the result appears, and only fall back
+to fetching it themselves if it takes longer than
+`settings.SINGLE_FLIGHT_WAIT_TIMEOUT`.
+
+If Redis isn't available the lock is skipped and `fetch` is called directly.
+"""
+import asyncio
+import time
+import uuid
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+# Deletes the lock only if it still holds our token, so a worker whose lock
+# expired doesn't release a lock another worker has since taken
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def get_lock_key(key):
+    return "{}:single_flight:{}".format(settings.REDIS_KEY_PREFIX, key)
+
+
+class Lock:
+    def __init__(self, key):
+        self.red = redis.Redis(connection_pool=settings.REDIS_POOL)
+        self.key = get_lock_key(key)
+        self.token = uuid.uuid4().hex
+
+    def acquire(self):
+        """
+        Returns True if the lock was acquired, False if another worker holds
+        it, or None if Redis isn't available
+        """
+        try:
+            return bool(
+                self.red.set(
+                    self.key,
+                    self.token,
+                    nx=True,
+                    px=int(settings.SINGLE_FLIGHT_LOCK_TIMEOUT * 1000),
+                )
+            )
+        except redis.RedisError:
+            return None
+
+    def release(self):
+        try:
+            self.red.eval(RELEASE_LOCK_SCRIPT, 1, self.key, self.token)
+        except redis.RedisError:
+            pass
+
+    def is_held(self):
+        try:
+            return bool(self.red.exists(self.key))
+        except redis.RedisError:
+            return False
+
+
+def single_flight(key, fetch, check):
+    """
+    Returns the result of `fetch()`, calling it in only one worker at a time
+    for each key. `check` should return the result once another worker has
+    stored it, or None if it isn't available yet.
+    """
+    lock = Lock(key)
+    acquired = lock.acquire()
+    if acquired is None:
+        return fetch()
+
+    if acquired:
+        try:
+            return fetch()
+        finally:
+            lock.release()
+
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+        result = check()
+        if result is not None:
+            return result
+        if not lock.is_held():
+            # the other worker failed without storing a result
+            break
+    return fetch()
+
+
+async def async_single_flight(key, fetch, check):
+    """
+    The same as `single_flight`, for async views. `fetch` and `check` are
+    coroutine functions, and Redis is called from a thread so the event loop
+    isn't blocked.
+    """
+    lock = Lock(key)
+    acquired = await sync_to_async(lock.acquire, thread_sensitive=False)()
+    if acquired is None:
+        return await fetch()
+
+    if acquired:
+        try:
+            return await fetch()
+        finally:
+            await sync_to_async(lock.release, thread_sensitive=False)()
+
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+        result = await check()
+        if result is not None:
+            return result
+        if not await sync_to_async(lock.is_held, thread_sensitive=False)():
+            break
+    return await fetch()
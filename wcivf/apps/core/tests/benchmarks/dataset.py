@@ -0,0 +1,161 @@
+"""
+Builds a synthetic dataset the size of a UK general election for the
+benchmarks, using the existing factories. Objects are built in memory and
+saved with bulk_create, as creating them one at a time would take minutes.
+"""
+import datetime
+import random
+
+from django.utils import timezone
+
+from elections.models import Post, PostElection
+from elections.tests.factories import (
+    ElectionFactory,
+    PostElectionFactory,
+    PostFactory,
+)
+from hustings.models import Husting
+from leaflets.models import Leaflet
+from parties.models import LocalParty, Party
+from parties.tests.factories import LocalPartyFactory, PartyFactory
+from people.models import Person, PersonPost
+from people.tests.factories import PersonFactory, PersonPostFactory
+
+CONSTITUENCIES = 650
+PARTIES = 12
+# gives about 4,000 candidates in total
+CANDIDATES_PER_BALLOT = (4, 8)
+LEAFLETS_PER_CANDIDATE = (0, 1)
+LOCAL_PARTIES_PER_BALLOT = 2
+INDEPENDENT_PARTY_ID = "ynmp-party:2"
+
+
+class Dataset:
+    def __init__(self, election, ballots, parties, people):
+        self.election = election
+        self.ballots = ballots
+        self.parties = parties
+        self.people = people
+
+
+def build_dataset(seed=2024):
+    """
+    Creates the dataset and returns a Dataset with the objects in it
+    """
+    rand = random.Random(seed)
+    # in the future so the pages show the pre-election state, which is when
+    # they get the most traffic
+    election_date = datetime.date.today() + datetime.timedelta(days=30)
+    election = ElectionFactory(
+        slug=f"parl.{election_date}",
+        name="UK Parliamentary general election",
+        election_date=election_date,
+        election_type="parl",
+        current=True,
+    )
+
+    parties = Party.objects.bulk_create(
+        [PartyFactory.build(party_id=INDEPENDENT_PARTY_ID, party_name="Ind")]
+        + [
+            PartyFactory.build(party_id=f"PP{i}", party_name=f"Party {i}")
+            for i in range(1, PARTIES)
+        ]
+    )
+
+    posts = Post.objects.bulk_create(
+        [
+            PostFactory.build(
+                ynr_id=f"WMC:E{i:08d}",
+                label=f"Constituency {i}",
+                territory="ENG",
+                organization_type="parl",
+            )
+            for i in range(CONSTITUENCIES)
+        ]
+    )
+    ballots = PostElection.objects.bulk_create(
+        [
+            PostElectionFactory.build(
+                post=post,
+                election=election,
+                ballot_paper_id=f"parl.constituency-{i}.{election_date}",
+                locked=True,
+            )
+            for i, post in enumerate(posts)
+        ]
+    )
+
+    people = []
+    person_posts = []
+    for ballot in ballots:
+        candidates = rand.randint(*CANDIDATES_PER_BALLOT)
+        for party in rand.sample(parties, candidates):
+            person = PersonFactory.build(ynr_id=len(people) + 1)
+            people.append(person)
+            person_posts.append(
+                PersonPostFactory.build(
+                    person=person,
+                    post=ballot.post,
+                    post_election=ballot,
+                    election=election,
+                    party=party,
+                    party_name=party.party_name,
+                )
+            )
+    Person.objects.bulk_create(people)
+    PersonPost.objects.bulk_create(person_posts)
+
+    Leaflet.objects.bulk_create(
+        [
+            Leaflet(
+                person=person,
+                leaflet_id=person.pk * 10 + i,
+                thumb_url=f"https://example.com/{person.pk}/{i}.jpg",
+                date_uploaded_to_electionleaflets=timezone.now(),
+            )
+            for person in people
+            for i in range(rand.randint(*LEAFLETS_PER_CANDIDATE))
+        ]
+    )
+    Husting.objects.bulk_create(
+        [
+            Husting(
+                post_election=ballot,
+                title=f"{ballot.post.label} hustings",
+                url="https://example.com/hustings/",
+                starts=timezone.now() + datetime.timedelta(days=14),
+            )
+            for ballot in ballots
+        ]
+    )
+    LocalParty.objects.bulk_create(
+        [
+            LocalPartyFactory.build(
+                parent=party,
+                post_election=ballot,
+                name=f"{ballot.post.label} {party.party_name}",
+            )
+            for ballot in ballots
+            for party in rand.sample(parties[1:], LOCAL_PARTIES_PER_BALLOT)
+        ]
+    )
+    return Dataset(
+        election=election, ballots=ballots, parties=parties, people=people
+    )
+
+
+def delete_dataset(dataset):
+    """
+    Deletes everything build_dataset created. Ballots, candidacies, hustings
+    and local parties go with their election, posts and parties
+    """
+    dataset.election.delete()
+    Post.objects.filter(
+        pk__in=[ballot.post_id for ballot in dataset.ballots]
+    ).delete()
+    Person.objects.filter(
+        pk__in=[person.pk for person in dataset.people]
+    ).delete()
+    Party.objects.filter(
+        pk__in=[party.pk for party in dataset.parties]
+    ).delete()
@@ -0,0 +1,196 @@
+"""
+Benchmarks for the views that get the most traffic on polling day.
+
+Each view is requested against a dataset the size of a general election (see
+dataset.py) and the number of queries it makes on a cold cache is compared
+with baselines.json. These checks are deterministic, so they run with the
+rest of the tests.
+
+Timing the views is slow and depends on the machine, so the p50 and p95
+response times and peak Python memory are only measured when asked for:
+
+    RUN_BENCHMARKS=1 pytest wcivf/apps/core/tests/benchmarks
+
+To record new baselines after an intentional change, run with
+UPDATE_BENCHMARK_BASELINES=1. Only commit the query counts in
+baselines.json; to check times and memory, record baselines with
+RUN_BENCHMARKS=1 before a change and compare against them after it.
+BENCHMARK_TOLERANCE (default 1.5) is how many times the baseline time and
+memory a view may use before the test fails.
+"""
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.tests.benchmarks.dataset import build_dataset, delete_dataset
+
+BASELINES_PATH = Path(__file__).parent / "baselines.json"
+RUN_BENCHMARKS = bool(os.environ.get("RUN_BENCHMARKS"))
+RUNS = int(os.environ.get("BENCHMARK_RUNS", 20))
+TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", 1.5))
+UPDATE_BASELINES = bool(os.environ.get("UPDATE_BENCHMARK_BASELINES"))
+
+
+def load_baselines():
+    if not BASELINES_PATH.exists():
+        return {}
+    with BASELINES_PATH.open() as f:
+        return json.load(f)
+
+
+def save_baseline(name, result):
+    baselines = load_baselines()
+    baselines[name] = result
+    with BASELINES_PATH.open("w") as f:
+        json.dump(baselines, f, indent=4, sort_keys=True)
+        f.write("\n")
+
+
+def percentile(timings, percent):
+    timings = sorted(timings)
+    index = round(percent / 100 * (len(timings) - 1))
+    return timings[index]
+
+
+def count_queries(client, url):
+    """
+    Requests the URL on a cold cache and returns the number of queries made
+    """
+    cache.clear()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url, follow=True)
+    assert response.status_code == 200
+    return len(queries)
+
+
+def measure(client, url):
+    """
+    Requests the URL on a cold cache to find the peak memory, then RUNS more
+    times to time it
+    """
+    cache.clear()
+    tracemalloc.start()
+    client.get(url, follow=True)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(RUNS):
+        cache.clear()
+        start = time.perf_counter()
+        client.get(url, follow=True)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(percentile(timings, 95), 2),
+        "peak_kb": round(peak / 1024),
+    }
+
+
+def check_view(name, client, url):
+    result = {"queries": count_queries(client, url)}
+    if RUN_BENCHMARKS:
+        result.update(measure(client, url))
+
+    if UPDATE_BASELINES:
+        save_baseline(name, result)
+        return
+
+    baseline = load_baselines().get(name)
+    if not baseline:
+        pytest.skip(
+            f"No baseline for {name}, run with UPDATE_BENCHMARK_BASELINES=1"
+        )
+
+    assert result["queries"] <= baseline["queries"], (
+        f"{name} made {result['queries']} queries, "
+        f"baseline is {baseline['queries']}"
+    )
+    for metric in ["p95_ms", "peak_kb"]:
+        if metric not in result or metric not in baseline:
+            continue
+        limit = baseline[metric] * TOLERANCE
+        assert result[metric] <= limit, (
+            f"{name} {metric} was {result[metric]}, "
+            f"baseline is {baseline[metric]}"
+        )
+
+
+@pytest.fixture(scope="module")
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        dataset = build_dataset()
+        yield dataset
+        delete_dataset(dataset)
+
+
+@pytest.fixture
+def mock_upstream(mocker, dataset):
+    """
+    Stops the postcode views making requests to EE and WDIV, and from
+    logging the look up
+    """
+    ballot = dataset.ballots[0]
+    response = mocker.MagicMock(status_code=200)
+    response.json.return_value = {
+        "results": [{"election_id": ballot.ballot_paper_id}]
+    }
+    mocker.patch("core.upstream.get", return_value=response)
+    mocker.patch(
+        "elections.views.mixins.PollingStationInfoMixin.get_polling_station_info",
+        return_value={},
+    )
+    mocker.patch(
+        "elections.views.mixins.PollingStationInfoMixin.get_cached_polling_station_info",
+        return_value={},
+    )
+    mocker.patch("elections.views.mixins.LogLookUpMixin.log_postcode")
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("locmem_cache")
+class TestHotViews:
+    def test_postcode_view(self, client, dataset, mock_upstream):
+        url = reverse("postcode_view", kwargs={"postcode": "SW1A1AA"})
+        check_view("postcode_view", client, url)
+
+    def test_ballot_view(self, client, dataset):
+        url = dataset.ballots[0].get_absolute_url()
+        check_view("ballot_view", client, url)
+
+    def test_person_view(self, client, dataset):
+        url = dataset.people[0].get_absolute_url()
+        check_view("person_view", client, url)
+
+    def test_election_view(self, client, dataset):
+        url = dataset.election.get_absolute_url()
+        check_view("election_view", client, url)
+
+    def test_party_view(self, client, dataset):
+        url = dataset.parties[1].get_absolute_url()
+        check_view("party_view", client, url)
+
+    def test_candidates_for_postcode_api(self, client, dataset, mock_upstream):
+        url = "{}?postcode=SW1A1AA".format(
+            reverse("api:candidates-for-postcode-list")
+        )
+        check_view("candidates_for_postcode_api", client, url)
+
+    def test_candidates_for_ballots_api(self, client, dataset):
+        ballot_ids = ",".join(
+            ballot.ballot_paper_id for ballot in dataset.ballots[:10]
+        )
+        url = "{}?ballot_ids={}".format(
+            reverse("api:candidates-for-ballots-list"), ballot_ids
+        )
+        check_view("candidates_for_ballots_api", client, url)
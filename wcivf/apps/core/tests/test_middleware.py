@@ -0,0 +1,20 @@
+import pytest
+from django.http import HttpResponse
+
+from core.middleware import UTMTrackerMiddleware
+
+
+class TestUTMTrackerMiddleware:
+    def test_utm_data_added_to_request(self, rf):
+        request = rf.get(
+            "/", {"utm_source": "test", "utm_medium": "", "foo": "bar"}
+        )
+        UTMTrackerMiddleware(lambda request: HttpResponse())(request)
+
+        assert request.utm_data == {"utm_source": "test"}
+
+    @pytest.mark.django_db
+    def test_session_not_saved(self, client, settings):
+        response = client.get("/", {"utm_source": "test"})
+
+        assert settings.SESSION_COOKIE_NAME not in response.cookies
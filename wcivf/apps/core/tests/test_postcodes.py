@@ -0,0 +1,53 @@
+import pytest
+
+from core.postcodes import clean_postcode, is_valid_postcode, known_outcodes
+
+
+class TestCleanPostcode:
+    @pytest.mark.parametrize(
+        "postcode",
+        ["s11 8qe", "S118QE", "S11  8QE", " s11 8qe ", "S11+8QE"],
+    )
+    def test_clean_postcode(self, postcode):
+        assert clean_postcode(postcode) == "S11 8QE"
+
+
+class TestIsValidPostcode:
+    @pytest.fixture(autouse=True)
+    def clear_outcodes(self):
+        known_outcodes.cache_clear()
+        yield
+        known_outcodes.cache_clear()
+
+    @pytest.mark.parametrize(
+        "postcode",
+        ["S11 8QE", "e12ax", "SW1A 1AA", "EC1A4EU", "M1 1AE", "gir0aa"],
+    )
+    def test_valid(self, postcode):
+        assert is_valid_postcode(postcode)
+
+    @pytest.mark.parametrize(
+        "postcode",
+        [
+            "",
+            "INVALID",
+            "S11",
+            "S11 8QEE",
+            "S11 8CE",
+            "11S 8QE",
+            "GIR 0AB",
+            "wp-login.php",
+        ],
+    )
+    def test_invalid(self, postcode):
+        assert not is_valid_postcode(postcode)
+
+    def test_outcodes_file(self, settings, tmp_path):
+        outcodes_file = tmp_path / "outcodes.txt"
+        outcodes_file.write_text("S11\nsw1a\n\n")
+        settings.POSTCODE_OUTCODES_FILE = str(outcodes_file)
+
+        assert is_valid_postcode("S11 8QE")
+        assert is_valid_postcode("SW1A 1AA")
+        assert not is_valid_postcode("TE1 1ST")
+        assert is_valid_postcode("GIR 0AA")
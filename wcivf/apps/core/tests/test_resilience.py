@@ -0,0 +1,108 @@
+import pytest
+from django.core.cache import cache
+
+from core.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    StaleWhileRevalidateCache,
+)
+
+
+class ImmediateExecutor:
+    def submit(self, fn, *args, **kwargs):
+        fn(*args, **kwargs)
+
+
+@pytest.mark.usefixtures("locmem_cache")
+class TestCircuitBreaker:
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(
+            "test", failure_threshold=2, failure_window=60, recovery_timeout=30
+        )
+        breaker.record_failure()
+        breaker.check()
+
+        breaker.record_failure()
+
+        assert breaker.is_open()
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+
+
+@pytest.mark.usefixtures("locmem_cache")
+class TestStaleWhileRevalidateCache:
+    @pytest.fixture
+    def swr_cache(self):
+        return StaleWhileRevalidateCache(
+            soft_ttl=60,
+            hard_ttl=600,
+            negative_ttl=10,
+            executor=ImmediateExecutor(),
+        )
+
+    def test_fetches_when_not_cached(self, swr_cache, mocker):
+        fetch = mocker.Mock(return_value={"foo": "bar"})
+
+        assert swr_cache.get("key", fetch) == {"foo": "bar"}
+        assert swr_cache.get("key", fetch) == {"foo": "bar"}
+        fetch.assert_called_once()
+
+    def test_fetch_fails(self, swr_cache, mocker):
+        fetch = mocker.Mock(side_effect=ValueError)
+
+        assert swr_cache.get("key", fetch, default={}) == {}
+        assert swr_cache.get("key", fetch, default={}) == {}
+        fetch.assert_called_once()
+
+    def test_get_if_cached_fetches_in_background(self, swr_cache, mocker):
+        fetch = mocker.Mock(return_value={"foo": "bar"})
+        submit = mocker.spy(swr_cache.executor, "submit")
+
+        assert swr_cache.get_if_cached("key", fetch) is None
+        submit.assert_called_once()
+        assert swr_cache.get_if_cached("key", fetch) == {"foo": "bar"}
+        fetch.assert_called_once()
+
+    def test_stale_value_returned_and_revalidated(self, swr_cache, mocker):
+        time = mocker.patch("core.resilience.time.time", return_value=0)
+        swr_cache.get("key", mocker.Mock(return_value="old"))
+
+        time.return_value = 61
+        fetch = mocker.Mock(return_value="new")
+
+        assert swr_cache.get("key", fetch) == "old"
+        fetch.assert_called_once()
+        assert swr_cache.get("key", fetch) == "new"
+
+    def test_failed_revalidation_keeps_stale_value(self, swr_cache, mocker):
+        time = mocker.patch("core.resilience.time.time", return_value=0)
+        swr_cache.get("key", mocker.Mock(return_value="old"))
+
+        time.return_value = 61
+        fetch = mocker.Mock(side_effect=ValueError)
+
+        assert swr_cache.get("key", fetch) == "old"
+        assert swr_cache.get("key", fetch) == "old"
+        # only one revalidation is started while one is in progress
+        fetch.assert_called_once()
+
+    def test_is_fresh(self, swr_cache, mocker):
+        time = mocker.patch("core.resilience.time.time", return_value=0)
+        assert not swr_cache.is_fresh("key")
+
+        swr_cache.set("key", "value")
+        assert swr_cache.is_fresh("key")
+
+        time.return_value = 61
+        assert not swr_cache.is_fresh("key")
+
+    @pytest.mark.parametrize("old_value", ["value", {"foo": "bar"}])
+    def test_other_format_treated_as_not_cached(
+        self, swr_cache, mocker, old_value
+    ):
+        cache.set("key", old_value)
+        fetch = mocker.Mock(return_value="new")
+
+        assert not swr_cache.is_fresh("key")
+        assert swr_cache.get("key", fetch) == "new"
+        fetch.assert_called_once()
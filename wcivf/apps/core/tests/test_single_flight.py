@@ -0,0 +1,55 @@
+import pytest
+import redis
+
+from core.single_flight import single_flight
+
+
+class TestSingleFlight:
+    @pytest.fixture
+    def red(self, mocker, settings):
+        settings.SINGLE_FLIGHT_POLL_INTERVAL = 0
+        return mocker.patch("core.single_flight.redis.Redis").return_value
+
+    def test_lock_acquired(self, red, mocker):
+        red.set.return_value = True
+        fetch = mocker.Mock(return_value="result")
+        check = mocker.Mock()
+
+        assert single_flight("key", fetch, check) == "result"
+        fetch.assert_called_once()
+        check.assert_not_called()
+        red.eval.assert_called_once()
+
+    def test_waits_for_other_worker(self, red, mocker):
+        red.set.return_value = None
+        red.exists.return_value = True
+        fetch = mocker.Mock()
+        check = mocker.Mock(side_effect=[None, None, "result"])
+
+        assert single_flight("key", fetch, check) == "result"
+        fetch.assert_not_called()
+        assert check.call_count == 3
+
+    def test_other_worker_failed(self, red, mocker):
+        red.set.return_value = None
+        red.exists.return_value = False
+        fetch = mocker.Mock(return_value="result")
+        check = mocker.Mock(return_value=None)
+
+        assert single_flight("key", fetch, check) == "result"
+        fetch.assert_called_once()
+
+    def test_wait_timeout(self, red, mocker, settings):
+        settings.SINGLE_FLIGHT_WAIT_TIMEOUT = 0
+        red.set.return_value = None
+        fetch = mocker.Mock(return_value="result")
+
+        assert single_flight("key", fetch, mocker.Mock()) == "result"
+        fetch.assert_called_once()
+
+    def test_redis_unavailable(self, red, mocker):
+        red.set.side_effect = redis.ConnectionError
+        fetch = mocker.Mock(return_value="result")
+
+        assert single_flight("key", fetch, mocker.Mock()) == "result"
+        fetch.assert_called_once()
@@ -0,0 +1,82 @@
+import pytest
+from django.http import HttpResponse
+from django.template import engines
+from django.template.response import TemplateResponse
+
+from core.middleware import HotPathTimingMiddleware
+from core.timing import (
+    RequestTimings,
+    get_current_timings,
+    record_timings,
+    timed,
+)
+
+
+class TestTimed:
+    def test_no_request_being_timed(self):
+        with timed("db"):
+            pass
+
+        assert get_current_timings() is None
+
+    def test_records_timings(self, mocker):
+        mocker.patch("core.timing.time.perf_counter", side_effect=[1, 1.5])
+        with record_timings() as timings:
+            with timed("db"):
+                pass
+
+        assert timings.as_dict() == {"db": {"ms": 500, "count": 1}}
+        assert timings.server_timing_header() == 'db;dur=500.00;desc="1 call"'
+        assert get_current_timings() is None
+
+    def test_server_timing_header(self):
+        timings = RequestTimings()
+        timings.add("db", 0.25)
+        timings.add("db", 0.25)
+        timings.add("ee", 0.1)
+
+        assert timings.server_timing_header() == (
+            'db;dur=500.00;desc="2 calls", ee;dur=100.00;desc="1 call"'
+        )
+
+
+@pytest.mark.django_db
+class TestHotPathTimingMiddleware:
+    def test_not_sampled(self, rf, settings):
+        settings.HOT_PATH_TIMING_SAMPLE_RATE = 0
+        middleware = HotPathTimingMiddleware(lambda request: HttpResponse())
+
+        response = middleware(rf.get("/"))
+
+        assert "Server-Timing" not in response
+
+    def test_sampled(self, rf, settings, mocker):
+        settings.HOT_PATH_TIMING_SAMPLE_RATE = 1
+        logger = mocker.patch("core.middleware.logger")
+
+        def view(request):
+            with timed("ee"):
+                pass
+            return HttpResponse()
+
+        response = HotPathTimingMiddleware(view)(rf.get("/"))
+
+        header = response["Server-Timing"]
+        assert header.startswith("ee;dur=")
+        assert "total;dur=" in header
+        logger.info.assert_called_once()
+
+    def test_template_render_timed(self, rf, settings):
+        settings.HOT_PATH_TIMING_SAMPLE_RATE = 1
+        template = engines["django"].from_string("hello")
+        middleware = HotPathTimingMiddleware(None)
+
+        def get_response(request):
+            response = TemplateResponse(request, template)
+            response = middleware.process_template_response(request, response)
+            return response.render()
+
+        middleware.get_response = get_response
+        response = middleware(rf.get("/"))
+
+        assert "template;dur=" in response["Server-Timing"]
@@ -0,0 +1,48 @@
+import pytest
+
+from core import upstream
+
+
+class TestUpstream:
+    @pytest.fixture(autouse=True)
+    def clear_sessions(self, mocker):
+        mocker.patch.object(upstream, "_sessions", {})
+
+    def test_session_reused_per_host(self):
+        session = upstream.get_session("example.com")
+
+        assert upstream.get_session("example.com") is session
+        assert upstream.get_session("example.org") is not session
+
+    def test_session_retries(self, settings):
+        settings.UPSTREAM_RETRIES = 3
+        session = upstream.get_session("example.com")
+
+        retries = session.get_adapter("https://example.com/").max_retries
+        assert retries.total == 3
+        assert 503 in retries.status_forcelist
+        assert "POST" not in retries.allowed_methods
+
+    def test_get_uses_host_timeout(self, settings, mocker):
+        settings.UPSTREAM_TIMEOUT = 60
+        settings.UPSTREAM_HOST_TIMEOUTS = {"example.com": 5}
+        session = upstream.get_session("example.com")
+        mocker.patch.object(session, "request")
+
+        upstream.get("https://example.com/api/")
+
+        session.request.assert_called_once_with(
+            "GET", "https://example.com/api/", timeout=5
+        )
+
+    def test_get_explicit_timeout(self, settings, mocker):
+        settings.UPSTREAM_TIMEOUT = 60
+        settings.UPSTREAM_HOST_TIMEOUTS = {"example.com": 5}
+        session = upstream.get_session("example.org")
+        mocker.patch.object(session, "request")
+
+        upstream.get("https://example.org/api/", timeout=2)
+
+        session.request.assert_called_once_with(
+            "GET", "https://example.org/api/", timeout=2
+        )
@@ -0,0 +1,29 @@
+from core.utils import LRUCache
+
+
+class TestLRUCache:
+    def test_drops_least_recently_used(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache["a"] = 1
+        cache["b"] = 2
+        assert cache["a"] == 1
+
+        cache["c"] = 3
+
+        assert len(cache) == 2
+        assert "a" in cache
+        assert "b" not in cache
+        assert cache.get("c") == 3
+
+    def test_items_expire(self, mocker):
+        monotonic = mocker.patch("core.utils.time.monotonic", return_value=0)
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache["a"] = None
+
+        monotonic.return_value = 59
+        assert "a" in cache
+        assert cache["a"] is None
+
+        monotonic.return_value = 61
+        assert "a" not in cache
+        assert cache.get("a", "missing") == "missing"
@@ -0,0 +1,84 @@
+"""
+Records where a request spends its time.
+
+`HotPathTimingMiddleware` starts a `RequestTimings` for a sample of requests,
+and anything wrapped in `timed(name)` while that request is being handled
+adds its duration to it. Database queries, cache calls, upstream requests
+and template rendering are timed automatically; other code can use `timed`
+directly:
+
+    with timed("postcode_lookup"):
+        ...
+
+When no request is being timed, `timed` does nothing.
+"""
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        # upstream requests can be made from upstream_executor threads
+        self.lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.durations[name] += seconds * 1000
+            self.counts[name] += 1
+
+    def as_dict(self):
+        return {
+            name: {
+                "ms": round(duration, 2),
+                "count": self.counts[name],
+            }
+            for name, duration in self.durations.items()
+        }
+
+    def server_timing_header(self):
+        return ", ".join(
+            '{};dur={:.2f};desc="{} {}"'.format(
+                name,
+                duration,
+                self.counts[name],
+                "call" if self.counts[name] == 1 else "calls",
+            )
+            for name, duration in self.durations.items()
+        )
+
+
+def get_current_timings():
+    return _current.get()
+
+
+@contextmanager
+def record_timings():
+    """
+    Times everything wrapped in `timed` until the block exits
+    """
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
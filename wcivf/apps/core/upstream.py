@@ -0,0 +1,126 @@
+"""
+A shared HTTP client for requests to the APIs we depend on (YNR, EE, WDIV
+and others).
+
+Each host gets its own `requests.Session`, so connections are kept alive and
+reused between requests rather than paying for a new TCP and TLS handshake
+every time. Failed connections and gateway errors are retried with backoff,
+and every request gets a timeout, which can be set per host with
+`settings.UPSTREAM_HOST_TIMEOUTS`. Requests are added to the current
+request's timings under the host's name in `settings.UPSTREAM_TIMING_NAMES`.
+
+Use it in place of `requests.get` and `requests.post`:
+
+    from core import upstream
+    response = upstream.get(url)
+
+Async views can use `async_get`, which makes the request with a shared
+`httpx.AsyncClient` and returns an `httpx.Response`:
+
+    response = await upstream.async_get(url)
+"""
+import asyncio
+import threading
+import weakref
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.timing import timed
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+# an AsyncClient can only be used from the event loop it was created on
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_timeout(host):
+    return settings.UPSTREAM_HOST_TIMEOUTS.get(host, settings.UPSTREAM_TIMEOUT)
+
+
+def make_session():
+    retry = Retry(
+        total=settings.UPSTREAM_RETRIES,
+        backoff_factor=settings.UPSTREAM_BACKOFF_FACTOR,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        # return the last response rather than raising, so callers can check
+        # the status code as they would without retries
+        raise_on_status=False,
+    )
+    # views make upstream requests from upstream_executor threads, so allow
+    # a connection for each of them
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.UPSTREAM_MAX_WORKERS,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def make_async_client():
+    # httpx only retries failed connections, not gateway errors
+    transport = httpx.AsyncHTTPTransport(retries=settings.UPSTREAM_RETRIES)
+    return httpx.AsyncClient(
+        transport=transport,
+        limits=httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_ASYNC_CONNECTIONS
+        ),
+    )
+
+
+def get_async_client():
+    """
+    Returns the client for the running event loop, creating it on first use
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _async_clients:
+        _async_clients[loop] = make_async_client()
+    return _async_clients[loop]
+
+
+def get_session(host):
+    """
+    Returns the session for the host, creating it on first use
+    """
+    try:
+        return _sessions[host]
+    except KeyError:
+        pass
+    with _sessions_lock:
+        if host not in _sessions:
+            _sessions[host] = make_session()
+        return _sessions[host]
+
+
+def request(method, url, **kwargs):
+    host = urlparse(url).hostname
+    kwargs.setdefault("timeout", get_timeout(host))
+    with timed(settings.UPSTREAM_TIMING_NAMES.get(host, "upstream")):
+        return get_session(host).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, data=None, **kwargs):
+    return request("POST", url, data=data, **kwargs)
+
+
+async def async_request(method, url, **kwargs):
+    host = urlparse(url).hostname
+    kwargs.setdefault("timeout", get_timeout(host))
+    with timed(settings.UPSTREAM_TIMING_NAMES.get(host, "upstream")):
+        return await get_async_client().request(method, url, **kwargs)
+
+
+async def async_get(url, **kwargs):
+    return await async_request("GET", url, **kwargs)
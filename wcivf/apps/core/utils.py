@@ -1,3 +1,7 @@
+import threading
+import time
+from collections import OrderedDict
+
 from django.db.models import Transform
 
 
@@ -18,3 +22,53 @@ class LastWord(Transform):
 
     def as_postgresql(self, compiler, connection):
         return self.as_sql(compiler, connection)
+
+
+class LRUCache:
+    """
+    A thread safe, dict-like cache that holds at most `maxsize` items,
+    dropping the least recently used item when it is full. Items expire
+    `ttl` seconds after they are set.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            expires, value = self._items[key]
+            if expires < time.monotonic():
+                del self._items[key]
+                raise KeyError(key)
+            self._items.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
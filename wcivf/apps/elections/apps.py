@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ElectionsConfig(AppConfig):
     name = "elections"
+
+    def ready(self):
+        # connect the signal receivers
+        from elections import cache_invalidation  # noqa
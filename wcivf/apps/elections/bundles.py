@@ -0,0 +1,206 @@
+"""
+Compact, plain-data "bundles" of the candidates standing on a ballot.
+
+Caching a PersonPost QuerySet pickles the query, every model instance and all
+of their prefetch caches. A bundle instead stores only the values that the
+candidate lists and API need, and is turned back in to model instances when
+it is read from the cache, so rendering from a warm bundle doesn't touch the
+database.
+"""
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+from core.utils import LastWord
+from elections.constants import BALLOT_BUNDLE_FORMAT, PEOPLE_FOR_BALLOT_KEY_FMT
+from leaflets.models import Leaflet
+from parties.models import Party
+from people.models import Person, PersonPost
+
+PERSON_POST_FIELDS = (
+    "id",
+    "person_id",
+    "post_id",
+    "election_id",
+    "party_id",
+    "party_name",
+    "party_description_text",
+    "list_position",
+    "elected",
+    "votes_cast",
+)
+PERSON_FIELDS = (
+    "ynr_id",
+    "name",
+    "sort_name",
+    "email",
+    "gender",
+    "death_date",
+    "photo_url",
+)
+PARTY_FIELDS = ("party_id", "party_name", "emblem_url")
+LEAFLET_FIELDS = (
+    "id",
+    "person_id",
+    "leaflet_id",
+    "thumb_url",
+    "date_uploaded_to_electionleaflets",
+)
+
+
+class BallotPeople(list):
+    """
+    The PersonPost objects for a ballot, rebuilt from a bundle. Supports the
+    parts of the PersonPostQuerySet API that the templates use, without
+    making any database queries.
+    """
+
+    def count(self):
+        return len(self)
+
+    def by_party(self):
+        """
+        Matches the ordering of PersonPostQuerySet.by_party, where
+        candidates without a list position come last in each party
+        """
+        return sorted(
+            self,
+            key=lambda person_post: (
+                person_post.party.party_name if person_post.party else "",
+                person_post.list_position is None,
+                person_post.list_position or 0,
+            ),
+        )
+
+
+def ballot_bundle_key(postelection):
+    """
+    Returns the cache key for the ballot bundle. The ballot's modified
+    timestamp is used as the data version, so saving the ballot means a new
+    bundle is built on the next request.
+    """
+    version = f"{BALLOT_BUNDLE_FORMAT}.{postelection.modified.timestamp()}"
+    return PEOPLE_FOR_BALLOT_KEY_FMT.format(
+        postelection.ballot_paper_id, version
+    )
+
+
+def build_ballot_bundle(postelection):
+    """
+    Queries everything needed to display the candidates on a ballot and
+    returns it as a dict of plain values
+    """
+    person_posts = PersonPost.objects.filter(post_election=postelection)
+    person_posts = person_posts.annotate(last_name=LastWord("person__name"))
+    person_posts = person_posts.annotate(
+        name_for_ordering=Coalesce("person__sort_name", "last_name")
+    )
+    if postelection.election.uses_lists:
+        order_by = ["party__party_name", "list_position"]
+    else:
+        order_by = ["name_for_ordering", "person__name"]
+    person_posts = person_posts.order_by(
+        F("elected").desc(nulls_last=True), *order_by
+    )
+
+    person_fields = [f"person__{field}" for field in PERSON_FIELDS]
+    party_fields = [f"party__{field}" for field in PARTY_FIELDS]
+
+    bundle = {"candidacies": [], "people": {}, "parties": {}, "leaflets": {}}
+    candidacies_by_id = {}
+    for row in person_posts.values(
+        *PERSON_POST_FIELDS, *person_fields, *party_fields
+    ):
+        candidacy = {field: row[field] for field in PERSON_POST_FIELDS}
+        candidacy["previous_party_ids"] = []
+        bundle["candidacies"].append(candidacy)
+        candidacies_by_id[candidacy["id"]] = candidacy
+
+        person = {field: row[f"person__{field}"] for field in PERSON_FIELDS}
+        bundle["people"][person["ynr_id"]] = person
+        if row["party_id"]:
+            party = {field: row[f"party__{field}"] for field in PARTY_FIELDS}
+            bundle["parties"][party["party_id"]] = party
+
+    if not candidacies_by_id:
+        return bundle
+
+    affiliations = PersonPost.previous_party_affiliations.through.objects
+    affiliations = affiliations.filter(
+        personpost_id__in=list(candidacies_by_id)
+    )
+    affiliations = affiliations.order_by("party__party_name")
+    for row in affiliations.values("personpost_id", *party_fields):
+        party = {field: row[f"party__{field}"] for field in PARTY_FIELDS}
+        bundle["parties"][party["party_id"]] = party
+        candidacy = candidacies_by_id[row["personpost_id"]]
+        candidacy["previous_party_ids"].append(party["party_id"])
+
+    leaflets = Leaflet.objects.filter(person_id__in=list(bundle["people"]))
+    leaflets = leaflets.order_by("date_uploaded_to_electionleaflets")
+    for leaflet in leaflets.values(*LEAFLET_FIELDS):
+        bundle["leaflets"].setdefault(leaflet["person_id"], []).append(leaflet)
+
+    return bundle
+
+
+def _from_bundle(model, data):
+    """
+    Creates a model instance as if it had been loaded from the database.
+    Fields not stored in the bundle are deferred, so they are still
+    available (at the cost of a query) if a template ever asks for one.
+    """
+    field_names = [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.attname in data
+    ]
+    values = [data[field_name] for field_name in field_names]
+    return model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+
+
+def people_from_bundle(bundle, postelection):
+    """
+    Rebuilds the PersonPost objects for the ballot from a bundle, with their
+    person, party, previous party affiliations and leaflets already attached
+    """
+    parties = {
+        party_id: _from_bundle(Party, data)
+        for party_id, data in bundle["parties"].items()
+    }
+
+    people = {}
+    for person_id, data in bundle["people"].items():
+        person = _from_bundle(Person, data)
+        person.ordered_leaflets = [
+            _from_bundle(Leaflet, leaflet)
+            for leaflet in bundle["leaflets"].get(person_id, [])
+        ]
+        people[person_id] = person
+
+    person_posts = BallotPeople()
+    for data in bundle["candidacies"]:
+        person_post = _from_bundle(
+            PersonPost, {**data, "post_election_id": postelection.pk}
+        )
+        person_post.post_election = postelection
+        person_post.person = people[data["person_id"]]
+        person_post.party = parties.get(data["party_id"])
+        if person_post.post_id == postelection.post_id:
+            person_post.post = postelection.post
+        if person_post.election_id == postelection.election_id:
+            person_post.election = postelection.election
+
+        previous_party_affiliations = (
+            person_post.previous_party_affiliations.get_queryset()
+        )
+        previous_party_affiliations._result_cache = [
+            parties[party_id] for party_id in data["previous_party_ids"]
+        ]
+        previous_party_affiliations._prefetch_done = True
+        person_post._prefetched_objects_cache = {
+            "previous_party_affiliations": previous_party_affiliations
+        }
+        person_posts.append(person_post)
+
+    return person_posts
@@ -0,0 +1,69 @@
+"""
+Evicts cached ballot data when the importers tell us it has changed.
+
+The importers send the `ballots_updated` signal with the IDs of the ballots
+they touched, so only the cache entries for those ballots are thrown away
+rather than flushing everything. Cached postcode pages can show any ballot,
+so they are all invalidated by bumping the data version.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import receiver
+from django.utils import timezone
+
+from elections.bundles import ballot_bundle_key, build_ballot_bundle
+from elections.constants import BALLOT_BUNDLE_TTL
+from elections.models import PostElection
+from elections.page_cache import bump_data_version
+from elections.signals import ballots_updated
+
+CHUNK_SIZE = 500
+
+
+def chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def invalidate_ballots(ballot_paper_ids):
+    """
+    Bumps the data version of each ballot, and deletes its cached bundle.
+    When only a few ballots have changed the bundles for the current ones are
+    rebuilt straight away, so the next visitor doesn't have to wait for them.
+    Returns the number of ballots invalidated.
+    """
+    ballot_paper_ids = list(ballot_paper_ids)
+    count = 0
+    for ids in chunks(ballot_paper_ids):
+        ballots = PostElection.objects.filter(ballot_paper_id__in=ids)
+        cache.delete_many(
+            [
+                ballot_bundle_key(ballot)
+                for ballot in ballots.only("ballot_paper_id", "modified")
+            ]
+        )
+        count += ballots.update(modified=timezone.now())
+
+    if count <= settings.BALLOT_BUNDLE_REBUILD_LIMIT:
+        rebuild_ballot_bundles(ballot_paper_ids)
+    return count
+
+
+def rebuild_ballot_bundles(ballot_paper_ids):
+    ballots = PostElection.objects.filter(
+        ballot_paper_id__in=ballot_paper_ids,
+        election__current=True,
+    ).select_related("election", "post")
+    for ballot in ballots:
+        cache.set(
+            ballot_bundle_key(ballot),
+            build_ballot_bundle(ballot),
+            BALLOT_BUNDLE_TTL,
+        )
+
+
+@receiver(ballots_updated)
+def invalidate_updated_ballots(sender, ballot_paper_ids, **kwargs):
+    invalidate_ballots(ballot_paper_ids)
+    bump_data_version()
@@ -1,6 +1,42 @@
 POSTCODE_TO_BALLOT_KEY_FMT = "postcode_to_ballot_{}"
-PEOPLE_FOR_BALLOT_KEY_FMT = "people_for_ballot_{}_compact_{}"
+PEOPLE_FOR_BALLOT_KEY_FMT = "people_for_ballot_{}_{}"
+# Increment when the structure of a ballot bundle changes, so that bundles
+# cached by an older release aren't read
+BALLOT_BUNDLE_FORMAT = 1
 POLLING_STATIONS_KEY_FMT = "pollingstations_{}"
+POSTCODE_PAGE_KEY_FMT = "postcode_page_{version}_{language}_{date}_{postcode}"
+BALLOT_SET_FRAGMENT_KEY_FMT = "ballot_set_{language}_{date}_{signature}"
+# Bumped by the importers when ballot data changes, to invalidate every
+# cached postcode page at once
+DATA_VERSION_KEY = "data_version"
+
+# How long to cache data for, in seconds. Data from EE and WDIV isn't
+# invalidated by anything, so is only cached for a short time. Ballot bundles
+# are evicted by the importers when the data in them changes, so are safe to
+# cache for much longer.
+POSTCODE_TO_BALLOT_TTL = 60 * 5
+POLLING_STATIONS_TTL = 60 * 5
+BALLOT_BUNDLE_TTL = 60 * 60 * 24
+# Postcode pages include EE and WDIV data, so are cached for the same time
+POSTCODE_PAGE_TTL = 60 * 5
+# The ballots section of the postcode page is shared by every postcode with
+# the same ballots. It includes hustings and news, which don't change the
+# ballots' data versions, so it is cached for the same time as the page.
+BALLOT_SET_FRAGMENT_TTL = 60 * 5
+# Polling station data older than POLLING_STATIONS_TTL is refreshed in the
+# background, and served until then for up to POLLING_STATIONS_STALE_TTL.
+# Empty results and failed lookups are cached for
+# POLLING_STATIONS_NEGATIVE_TTL.
+POLLING_STATIONS_STALE_TTL = 60 * 60 * 6
+POLLING_STATIONS_NEGATIVE_TTL = 30
+# Stop calling WDIV for WDIV_CIRCUIT_RECOVERY_TIMEOUT seconds after
+# WDIV_CIRCUIT_FAILURE_THRESHOLD failures in WDIV_CIRCUIT_FAILURE_WINDOW seconds
+WDIV_CIRCUIT_FAILURE_THRESHOLD = 5
+WDIV_CIRCUIT_FAILURE_WINDOW = 60
+WDIV_CIRCUIT_RECOVERY_TIMEOUT = 30
+# Requests made by prewarm_postcode_caches --site-url send this header, so
+# they aren't logged as postcode lookups
+PREWARM_HEADER = "X-WCIVF-Prewarm"
 
 UPDATED_SLUGS = {
     "2010": "parl.2010-05-06",
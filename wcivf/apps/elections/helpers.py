@@ -1,5 +1,8 @@
+import queue
+import re
 import sys
-from functools import update_wrapper
+import threading
+from functools import lru_cache, update_wrapper
 
 from django.db import transaction
 from django.conf import settings
@@ -8,13 +11,17 @@ from django.utils.timezone import datetime, timedelta
 from django.utils.http import urlencode
 from uk_election_timetables.election_ids import from_election_id
 from uk_election_timetables.calendars import Country
+from requests import RequestException
 
-import requests
+from core import upstream
+from core.utils import LRUCache
 
 
 class EEHelper:
-
-    ee_cache = {}
+    def __init__(self):
+        self.ee_cache = LRUCache(
+            maxsize=settings.EE_CACHE_MAX_SIZE, ttl=settings.EE_CACHE_TTL
+        )
 
     @property
     def base_elections_url(self):
@@ -73,7 +80,7 @@ class EEHelper:
     def get_data(self, election_id):
         if election_id in self.ee_cache:
             return self.ee_cache[election_id]
-        req = requests.get(f"{self.base_elections_url}{election_id}/")
+        req = upstream.get(f"{self.base_elections_url}{election_id}/")
         if req.status_code == 200:
             self.ee_cache[election_id] = req.json()
             return self.ee_cache[election_id]
@@ -81,22 +88,76 @@ class EEHelper:
             self.ee_cache[election_id] = None
         return None
 
+    def get_many(self, election_ids):
+        """
+        Adds the data for each of the election IDs that isn't already cached
+        to the cache, looking up EE_BATCH_SIZE elections per request with
+        EE's election_id_regex filter
+        """
+        missing = [
+            election_id
+            for election_id in dict.fromkeys(election_ids)
+            if election_id not in self.ee_cache
+        ]
+        for i in range(0, len(missing), settings.EE_BATCH_SIZE):
+            batch = missing[i : i + settings.EE_BATCH_SIZE]
+            regex = "^({})$".format("|".join(map(re.escape, batch)))
+            querystring = urlencode(
+                {"election_id_regex": regex, "page_size": len(batch)}
+            )
+            results = {}
+            try:
+                for page in JsonPaginator(
+                    f"{self.base_elections_url}?{querystring}", sys.stdout
+                ):
+                    for result in page["results"]:
+                        results[result["election_id"]] = result
+            except RequestException:
+                # leave the batch uncached, so get_data will try each
+                # election on its own
+                continue
+
+            for election_id in batch:
+                # IDs that EE doesn't know are cached as None, like get_data
+                self.ee_cache[election_id] = results.get(election_id)
+
 
 class JsonPaginator:
-    def __init__(self, page1, stdout):
+    """
+    Iterates over the pages of a JSON API, following the `next` URL on each
+    page.
+
+    When `prefetch` is set, pages are downloaded on a background thread while
+    the caller works on the current page. At most `prefetch` pages are held
+    in memory waiting to be used.
+    """
+
+    # put on the queue after the last page
+    END = object()
+
+    def __init__(self, page1, stdout, prefetch=0):
         self.next_page = page1
         self.stdout = stdout
+        self.prefetch = prefetch
 
     def __iter__(self):
-        while self.next_page:
-            self.stdout.write(f"{self.next_page}\n")
+        if self.prefetch:
+            return self.prefetched_pages()
+        return self.pages()
+
+    def get_page(self, url):
+        self.stdout.write(f"{url}\n")
+
+        r = upstream.get(url)
+        if r.status_code != 200:
+            self.stdout.write("crashing with response:")
+            self.stdout.write(r.text)
+        r.raise_for_status()
+        return r.json()
 
-            r = requests.get(self.next_page)
-            if r.status_code != 200:
-                self.stdout.write("crashing with response:")
-                self.stdout.write(r.text)
-            r.raise_for_status()
-            data = r.json()
+    def pages(self):
+        while self.next_page:
+            data = self.get_page(self.next_page)
 
             try:
                 self.next_page = data["next"]
@@ -107,6 +168,49 @@ class JsonPaginator:
 
         return
 
+    def prefetched_pages(self):
+        pages = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            # keep trying until there is space, unless the caller has
+            # stopped iterating, so the thread never blocks forever
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def fetch():
+            # always ends by putting END or the error on the queue, so the
+            # caller never waits for a page that isn't coming
+            last = self.END
+            try:
+                for page in self.pages():
+                    if not put(page):
+                        return
+            except BaseException as e:
+                last = e
+            finally:
+                put(last)
+
+        thread = threading.Thread(
+            target=fetch, name="JsonPaginator", daemon=True
+        )
+        thread.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is self.END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
 
 class ElectionIDSwitcher:
     def __init__(self, ballot_view, election_view, **initkwargs):
@@ -142,7 +246,13 @@ class ElectionIDSwitcher:
         return view(request, *args, **kwargs)
 
 
+@lru_cache(maxsize=4096)
 def get_election_timetable(slug, territory):
+    """
+    Returns the timetable for an election or ballot ID in the given
+    territory, or None if it can't be worked out. Timetables only depend on
+    their arguments, so they are memoised for the life of the process.
+    """
     country = {
         "ENG": Country.ENGLAND,
         "WLS": Country.WALES,
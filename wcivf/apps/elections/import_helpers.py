@@ -1,16 +1,31 @@
 import sys
 import re
+from collections import defaultdict, namedtuple
+from functools import reduce
+from operator import or_
 from urllib.parse import urlencode
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from elections.helpers import JsonPaginator, EEHelper
-from elections.models import PostElection, Election, Post, VotingSystem
+from elections.models import (
+    PostElection,
+    Election,
+    Post,
+    VotingSystem,
+)
+from elections.signals import ballots_updated
 from parties.models import Party
 from people.models import Person, PersonPost
 
+CandidacyChanges = namedtuple(
+    "CandidacyChanges", ["created", "updated", "deleted"]
+)
+
 
 def time_function_length(func):
     """
@@ -160,6 +175,35 @@ class YNRPostImporter:
             self.post_cache[post_id] = post
         return self.post_cache[post_id]
 
+    def bulk_update_or_create_from_ballot_dicts(self, ballot_dicts):
+        """
+        Makes sure a Post exists for every ballot dict, using one query to
+        find the existing posts and one each to create and update them.
+        Returns a dict of posts keyed by ID.
+        """
+        labels = {}
+        for ballot_dict in ballot_dicts:
+            post_id = ballot_dict["post"]["id"] or ballot_dict["post"]["slug"]
+            if post_id and post_id not in self.post_cache:
+                labels[post_id] = ballot_dict["post"]["label"]
+
+        existing = Post.objects.in_bulk(list(labels))
+        to_create = []
+        to_update = []
+        for post_id, label in labels.items():
+            post = existing.get(post_id)
+            if not post:
+                post = Post(ynr_id=post_id, label=label)
+                to_create.append(post)
+            elif post.label != label:
+                post.label = label
+                to_update.append(post)
+            self.post_cache[post_id] = post
+
+        Post.objects.bulk_create(to_create)
+        Post.objects.bulk_update(to_update, ["label"])
+        return self.post_cache
+
 
 class YNRBallotImporter:
     """
@@ -172,6 +216,29 @@ class YNRBallotImporter:
 
     """
 
+    # the PostElection fields set from YNR data, see get_ballot_defaults
+    BULK_BALLOT_FIELDS = [
+        "election",
+        "post",
+        "winner_count",
+        "cancelled",
+        "locked",
+        "contested",
+        "ynr_modified",
+        "modified",
+    ]
+    # the PostElection fields set from EE data, see import_metadata_from_ee
+    EE_BALLOT_FIELDS = ["voting_system", "metadata"]
+    # the PersonPost fields set from YNR data, see get_candidacy_defaults
+    CANDIDACY_FIELDS = (
+        "party_id",
+        "party_name",
+        "party_description_text",
+        "list_position",
+        "elected",
+        "votes_cast",
+    )
+
     def __init__(
         self,
         force_update=False,
@@ -183,6 +250,7 @@ class YNRBallotImporter:
         recently_updated=False,
         base_url=None,
         default_params=None,
+        bulk=False,
     ):
         self.stdout = stdout
         self.ee_helper = EEHelper()
@@ -197,10 +265,14 @@ class YNRBallotImporter:
         self.recently_updated = recently_updated
         self.base_url = base_url or settings.YNR_BASE
         self.default_params = default_params or {"page_size": 200}
+        self.bulk = bulk
+        self.updated_ballot_ids = set()
 
     @time_function_length
     def get_paginator(self, page1):
-        return JsonPaginator(page1, self.stdout)
+        return JsonPaginator(
+            page1, self.stdout, prefetch=settings.IMPORT_PREFETCH_PAGES
+        )
 
     @time_function_length
     def get_last_updated(self):
@@ -278,13 +350,29 @@ class YNRBallotImporter:
             self.ee_helper.prewarm_cache(current=not self.force_metadata)
 
         pages = self.get_paginator(self.import_url)
+        add_ballots = self.add_ballots_bulk if self.bulk else self.add_ballots
         for page in pages:
-            self.add_ballots(page)
+            add_ballots(page)
+            self.send_ballots_updated()
 
         if self.should_run_post_ballot_import_tasks:
             self.attach_cancelled_ballot_info()
 
         self.delete_orphan_posts()
+        self.send_ballots_updated()
+
+    def send_ballots_updated(self):
+        """
+        Tell anything caching ballot data which ballots this import has
+        changed. This is sent after each page, so the IDs are never all held
+        in memory.
+        """
+        if not self.updated_ballot_ids:
+            return
+        ballots_updated.send(
+            sender=self.__class__, ballot_paper_ids=self.updated_ballot_ids
+        )
+        self.updated_ballot_ids = set()
 
     @time_function_length
     def delete_orphan_posts(self):
@@ -314,9 +402,95 @@ class YNRBallotImporter:
         ballot.replaces.add(replaced_ballot)
         return True
 
+    def get_ballot_defaults(self, ballot_dict, election, post):
+        defaults = {
+            "election": election,
+            "post": post,
+            "winner_count": ballot_dict["winner_count"],
+            "cancelled": ballot_dict["cancelled"],
+            "locked": ballot_dict["candidates_locked"],
+        }
+
+        if ballot_dict["candidates_locked"] or ballot_dict["cancelled"]:
+            if ballot_dict["winner_count"]:
+                defaults["contested"] = not ballot_dict["uncontested"]
+
+        # only update this when using the recently_updated flag as otherwise
+        # the timestamp will only be the modifed timestamp on the ballot
+        # see BallotSerializer.get_last_updated in YNR
+        if self.recently_updated:
+            defaults["ynr_modified"] = parse_datetime(
+                ballot_dict["last_updated"]
+            )
+        return defaults
+
+    def ballot_has_changed(self, ballot, defaults):
+        """
+        Returns True if any of the defaults differ from the ballot's values
+        """
+        for name, value in defaults.items():
+            field = PostElection._meta.get_field(name)
+            if field.is_relation:
+                name, value = field.attname, value.pk
+            if getattr(ballot, name) != value:
+                return True
+        return False
+
+    def update_or_create_ballot(self, ballot_paper_id, defaults):
+        """
+        Like PostElection.objects.update_or_create, but an existing ballot is
+        only saved if the defaults have changed. Returns the ballot, whether
+        it was created, and whether it was created or changed.
+        """
+        try:
+            ballot = PostElection.objects.get(ballot_paper_id=ballot_paper_id)
+        except PostElection.DoesNotExist:
+            ballot = PostElection.objects.create(
+                ballot_paper_id=ballot_paper_id, **defaults
+            )
+            return ballot, True, True
+
+        changed = self.ballot_has_changed(ballot, defaults)
+        for field, value in defaults.items():
+            setattr(ballot, field, value)
+        if changed:
+            ballot.save()
+        return ballot, False, changed
+
+    def get_candidacy_defaults(self, candidate):
+        result = candidate["result"] or {}
+        # if we dont have a result, get the "elected" value from
+        # the main candidacy data
+        return {
+            "party_id": candidate["party"]["legacy_slug"],
+            "party_name": candidate["party_name"],
+            "party_description_text": candidate["party_description_text"],
+            "list_position": candidate["party_list_position"],
+            "elected": result.get("elected", candidate["elected"]),
+            "votes_cast": result.get("num_ballots", None),
+        }
+
+    def prefetch_ee_data(self, results):
+        """
+        Looks up the EE data for the elections and ballots on a page that
+        will need it, in as few requests as possible
+        """
+        election_ids = []
+        for ballot_dict in results["results"]:
+            election = ballot_dict["election"]
+            if (
+                election["election_id"]
+                not in self.election_importer.election_cache
+            ):
+                election_ids.append(election["election_id"])
+            if election["current"] or self.force_metadata:
+                election_ids.append(ballot_dict["ballot_paper_id"])
+        self.ee_helper.get_many(election_ids)
+
     @time_function_length
     @transaction.atomic()
     def add_ballots(self, results):
+        self.prefetch_ee_data(results)
         for ballot_dict in results["results"]:
             print(ballot_dict["ballot_paper_id"])
 
@@ -331,28 +505,12 @@ class YNRBallotImporter:
                 # cant create a ballot without a post so skip to the next one
                 continue
 
-            defaults = {
-                "election": election,
-                "post": post,
-                "winner_count": ballot_dict["winner_count"],
-                "cancelled": ballot_dict["cancelled"],
-                "locked": ballot_dict["candidates_locked"],
-            }
-
-            if ballot_dict["candidates_locked"] or ballot_dict["cancelled"]:
-                if ballot_dict["winner_count"]:
-                    defaults["contested"] = not ballot_dict["uncontested"]
-
-            # only update this when using the recently_updated flag as otherwise
-            # the timestamp will only be the modifed timestamp on the ballot
-            # see BallotSerializer.get_last_updated in YNR
-            if self.recently_updated:
-                defaults["ynr_modified"] = ballot_dict["last_updated"]
-
-            ballot, created = PostElection.objects.update_or_create(
-                ballot_paper_id=ballot_dict["ballot_paper_id"],
-                defaults=defaults,
+            defaults = self.get_ballot_defaults(ballot_dict, election, post)
+            ballot, created, changed = self.update_or_create_ballot(
+                ballot_dict["ballot_paper_id"], defaults
             )
+            if changed:
+                self.updated_ballot_ids.add(ballot.ballot_paper_id)
 
             if self.recently_updated:
                 # we can do this as the older ballot will be known.
@@ -364,67 +522,285 @@ class YNRBallotImporter:
                 )
 
             if ballot.election.current or self.force_metadata:
-                self.import_metadata_from_ee(ballot)
+                if self.import_metadata_from_ee(ballot):
+                    self.updated_ballot_ids.add(ballot.ballot_paper_id)
 
             if not self.exclude_candidacies:
-                # Now set the nominations up for this ballot
-                # First, remove any old candidates, this is to flush out candidates
-                # that have changed. We just delete the `person_post`
-                # (`membership` in YNR), not the person profile.
-                ballot.personpost_set.all().delete()
-                for candidate in ballot_dict["candidacies"]:
-                    person, person_created = Person.objects.update_or_create(
-                        ynr_id=candidate["person"]["id"],
-                        defaults={"name": candidate["person"]["name"]},
+                # Now set the nominations up for this ballot, only
+                # changing the candidacies that differ from YNR
+                self.sync_candidacies([(ballot, ballot_dict)])
+
+            if created:
+                self.stdout.write(
+                    "Added new ballot: {0}".format(ballot.ballot_paper_id)
+                )
+
+    @time_function_length
+    @transaction.atomic()
+    def add_ballots_bulk(self, results):
+        """
+        Does the same job as add_ballots, but for a whole page at a time.
+        Existing rows are loaded with one query per model and compared in
+        memory, so only new or changed rows are written, using bulk_create
+        and bulk_update.
+        """
+        self.prefetch_ee_data(results)
+        ballot_dicts = []
+        elections = {}
+        posts = self.post_importer.bulk_update_or_create_from_ballot_dicts(
+            results["results"]
+        )
+        for ballot_dict in results["results"]:
+            post_id = ballot_dict["post"]["id"] or ballot_dict["post"]["slug"]
+            if not post_id:
+                # cant create a ballot without a post so skip to the next one
+                continue
+            ballot_dicts.append(ballot_dict)
+            elections[
+                ballot_dict["ballot_paper_id"]
+            ] = self.election_importer.update_or_create_from_ballot_dict(
+                ballot_dict
+            )
+
+        existing = PostElection.objects.select_related(
+            "election", "post"
+        ).in_bulk(
+            [ballot_dict["ballot_paper_id"] for ballot_dict in ballot_dicts],
+            field_name="ballot_paper_id",
+        )
+        now = timezone.now()
+        ballots = []
+        to_create = []
+        to_update = []
+        for ballot_dict in ballot_dicts:
+            ballot_paper_id = ballot_dict["ballot_paper_id"]
+            post_id = ballot_dict["post"]["id"] or ballot_dict["post"]["slug"]
+            defaults = self.get_ballot_defaults(
+                ballot_dict, elections[ballot_paper_id], posts[post_id]
+            )
+            ballot = existing.get(ballot_paper_id)
+            created = ballot is None
+            if created:
+                ballot = PostElection(ballot_paper_id=ballot_paper_id)
+            changed = created or self.ballot_has_changed(ballot, defaults)
+            for field, value in defaults.items():
+                setattr(ballot, field, value)
+            if ballot.election.current or self.force_metadata:
+                # set before saving, so it's written with the YNR fields
+                if self.import_metadata_from_ee(ballot, save=False):
+                    changed = True
+            if created:
+                to_create.append(ballot)
+            elif changed:
+                ballot.modified = now
+                to_update.append(ballot)
+            ballots.append((ballot, ballot_dict))
+
+        PostElection.objects.bulk_create(to_create)
+        PostElection.objects.bulk_update(
+            to_update, self.BULK_BALLOT_FIELDS + self.EE_BALLOT_FIELDS
+        )
+        for ballot in to_create:
+            self.stdout.write(
+                "Added new ballot: {0}".format(ballot.ballot_paper_id)
+            )
+
+        self.updated_ballot_ids.update(
+            ballot.ballot_paper_id for ballot in to_create + to_update
+        )
+        if self.recently_updated:
+            for ballot, ballot_dict in ballots:
+                self.add_replaced_ballot(
+                    ballot=ballot,
+                    replaced_ballot_id=ballot_dict.get("replaces"),
+                )
+
+        if not self.exclude_candidacies:
+            self.sync_candidacies(ballots)
+
+    def add_people_bulk(self, candidates):
+        """
+        Makes sure a Person exists for each candidate, creating or renaming
+        them in bulk. Returns a dict of people keyed by ID.
+        """
+        names = {
+            int(candidate["person"]["id"]): candidate["person"]["name"]
+            for candidate in candidates
+        }
+        people = Person.objects.only("ynr_id", "name").in_bulk(list(names))
+        to_create = []
+        to_update = []
+        for person_id, name in names.items():
+            person = people.get(person_id)
+            if not person:
+                person = Person(ynr_id=person_id, name=name)
+                people[person_id] = person
+                to_create.append(person)
+            elif person.name != name:
+                person.name = name
+                to_update.append(person)
+
+        Person.objects.bulk_create(to_create)
+        Person.objects.bulk_update(to_update, ["name"])
+        return people
+
+    def get_previous_party_ids(self, candidate, known_party_ids):
+        return {
+            party["legacy_slug"]
+            for party in candidate.get("previous_party_affiliations", [])
+            # if the previous party affiliation is the
+            # same as the party on the candidacy skip it
+            if party["legacy_slug"] != candidate["party"]["legacy_slug"]
+            and party["legacy_slug"] in known_party_ids
+        }
+
+    def sync_candidacies(self, ballots):
+        """
+        Takes a list of (ballot, ballot_dict) pairs and makes the candidacies
+        in the database match those in YNR. Candidacies are matched on the
+        person, and only the ones that have been added, changed or removed
+        are written, so unchanged candidacies keep their PKs.
+
+        Returns a dict of CandidacyChanges keyed by ballot paper ID.
+        """
+        candidates = [
+            candidate
+            for _, ballot_dict in ballots
+            for candidate in ballot_dict["candidacies"]
+        ]
+        people = self.add_people_bulk(candidates)
+        known_party_ids = set(
+            Party.objects.filter(
+                party_id__in={
+                    party["legacy_slug"]
+                    for candidate in candidates
+                    for party in candidate.get(
+                        "previous_party_affiliations", []
                     )
-                    result = candidate["result"] or {}
-                    # if we dont have a result, get the "elected" value from
-                    # the main candidacy data
-                    elected = result.get("elected", candidate["elected"])
+                }
+            ).values_list("party_id", flat=True)
+        )
 
-                    person_post = PersonPost.objects.create(
+        existing = defaultdict(dict)
+        person_posts = PersonPost.objects.filter(
+            post_election__in=[ballot for ballot, _ in ballots]
+        ).prefetch_related("previous_party_affiliations")
+        for person_post in person_posts:
+            existing[person_post.post_election_id][
+                person_post.person_id
+            ] = person_post
+
+        to_create = []
+        to_update = []
+        to_delete = []
+        affiliations_to_add = []
+        affiliations_to_remove = []
+        changes = {}
+        for ballot, ballot_dict in ballots:
+            current = existing[ballot.pk]
+            created = updated = 0
+            for candidate in ballot_dict["candidacies"]:
+                defaults = self.get_candidacy_defaults(candidate)
+                party_ids = self.get_previous_party_ids(
+                    candidate, known_party_ids
+                )
+                person_post = current.pop(int(candidate["person"]["id"]), None)
+                if not person_post:
+                    person_post = PersonPost(
                         post_election=ballot,
-                        person=person,
-                        party_id=candidate["party"]["legacy_slug"],
-                        party_name=candidate["party_name"],
-                        party_description_text=candidate[
-                            "party_description_text"
-                        ],
-                        list_position=candidate["party_list_position"],
-                        elected=elected,
-                        votes_cast=result.get("num_ballots", None),
+                        person=people[int(candidate["person"]["id"])],
                         post=ballot.post,
                         election=ballot.election,
+                        **defaults,
                     )
-                    for party in candidate.get(
-                        "previous_party_affiliations", []
-                    ):
-                        # if the previous party affiliation is the
-                        # same as the party on the candidacy skip it
-                        party_id = party["legacy_slug"]
-                        if party_id == person_post.party_id:
-                            continue
-
-                        try:
-                            party = Party.objects.get(party_id=party_id)
-                        except Party.DoesNotExist:
-                            continue
-                        person_post.previous_party_affiliations.add(party)
+                    to_create.append(person_post)
+                    affiliations_to_add.extend(
+                        (person_post, party_id) for party_id in party_ids
+                    )
+                    created += 1
+                    continue
+
+                current_party_ids = {
+                    party.party_id
+                    for party in person_post.previous_party_affiliations.all()
+                }
+                changed = any(
+                    getattr(person_post, field) != value
+                    for field, value in defaults.items()
+                )
+                if not changed and party_ids == current_party_ids:
+                    continue
+                for field, value in defaults.items():
+                    setattr(person_post, field, value)
+                to_update.append(person_post)
+                affiliations_to_add.extend(
+                    (person_post, party_id)
+                    for party_id in party_ids - current_party_ids
+                )
+                affiliations_to_remove.extend(
+                    (person_post, party_id)
+                    for party_id in current_party_ids - party_ids
+                )
+                updated += 1
 
-            if created:
-                self.stdout.write(
-                    "Added new ballot: {0}".format(ballot.ballot_paper_id)
+            # anyone left over is no longer standing on this ballot
+            to_delete.extend(person_post.pk for person_post in current.values())
+            changes[ballot.ballot_paper_id] = CandidacyChanges(
+                created=created, updated=updated, deleted=len(current)
+            )
+
+        PersonPost.objects.filter(pk__in=to_delete).delete()
+        PersonPost.objects.bulk_create(to_create)
+        PersonPost.objects.bulk_update(to_update, list(self.CANDIDACY_FIELDS))
+
+        Through = PersonPost.previous_party_affiliations.through
+        if affiliations_to_remove:
+            Through.objects.filter(
+                reduce(
+                    or_,
+                    (
+                        Q(personpost_id=person_post.pk, party_id=party_id)
+                        for person_post, party_id in affiliations_to_remove
+                    ),
                 )
+            ).delete()
+        Through.objects.bulk_create(
+            [
+                Through(personpost_id=person_post.pk, party_id=party_id)
+                for person_post, party_id in affiliations_to_add
+            ],
+            ignore_conflicts=True,
+        )
+
+        for ballot_paper_id, ballot_changes in changes.items():
+            if not any(ballot_changes):
+                continue
+            self.updated_ballot_ids.add(ballot_paper_id)
+            self.stdout.write(
+                f"{ballot_paper_id}: {ballot_changes.created} added, "
+                f"{ballot_changes.updated} updated, "
+                f"{ballot_changes.deleted} removed candidacies\n"
+            )
+        return changes
 
-    def import_metadata_from_ee(self, ballot):
-        # First, grab the data from EE
+    def import_metadata_from_ee(self, ballot, save=True):
+        """
+        Sets the data we want from EE on the ballot and its post. Returns
+        True if the ballot's EE_BALLOT_FIELDS have changed, in which case
+        the ballot is saved unless save is False.
+        """
+        before = (ballot.voting_system_id, ballot.metadata)
 
         self.set_territory(ballot)
         self.set_voting_system(ballot)
         self.set_metadata(ballot)
         self.set_organisation_type(ballot)
         self.set_division_type(ballot)
-        ballot.save()
+
+        changed = (ballot.voting_system_id, ballot.metadata) != before
+        if changed and save:
+            ballot.save()
+        return changed
 
     def set_territory(self, ballot):
         if ballot.post.territory and not self.force_update:
@@ -452,7 +828,6 @@ class YNRBallotImporter:
                 self.voting_systems[voting_system_slug] = voting_system
 
             ballot.voting_system = self.voting_systems[voting_system_slug]
-            ballot.save()
 
     def set_metadata(self, ballot):
         if not self.force_current_metadata:
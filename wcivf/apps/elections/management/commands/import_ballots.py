@@ -42,6 +42,13 @@ class Command(BaseCommand):
             default=False,
             help="Ignore candidacies when importing ballots",
         )
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            dest="bulk",
+            default=False,
+            help="Write each page of ballots using bulk queries",
+        )
 
     @time_function_length
     def populate_any_non_by_elections_field(self):
@@ -84,6 +91,7 @@ class Command(BaseCommand):
             force_current_metadata=options["force_current_metadata"],
             recently_updated=options["recently_updated"],
             exclude_candidacies=options["exclude_candidacies"],
+            bulk=options["bulk"],
         )
         importer.do_import()
         self.populate_any_non_by_elections_field()
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from elections.prewarm import PostcodeCacheWarmer, rank_postcodes
+
+
+class Command(BaseCommand):
+    help = """
+    Warms the postcode→ballot, polling station and ballot bundle caches for
+    the postcodes that have been looked up most recently
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            action="store",
+            type=int,
+            default=1000,
+            help="Number of postcodes to warm",
+        )
+        parser.add_argument(
+            "--days",
+            action="store",
+            type=int,
+            default=7,
+            help="Rank postcodes by the lookups in this many days",
+        )
+        parser.add_argument(
+            "--workers",
+            action="store",
+            type=int,
+            default=10,
+            help="Number of postcodes to warm at once",
+        )
+        parser.add_argument(
+            "--ee-rate",
+            action="store",
+            type=float,
+            default=10,
+            help="Maximum requests a second to EveryElection",
+        )
+        parser.add_argument(
+            "--wdiv-rate",
+            action="store",
+            type=float,
+            default=10,
+            help="Maximum requests a second to WhereDoIVote",
+        )
+        parser.add_argument(
+            "--site-url",
+            action="store",
+            help="""
+            Warm the caches by requesting each postcode's page from this
+            site, rather than in this process. Use this when the caches
+            aren't shared with the web servers.
+            """,
+        )
+
+    def handle(self, **options):
+        lookups = rank_postcodes(now() - timedelta(days=options["days"]))
+        total_lookups = sum(lookups.values())
+        top = lookups.most_common(options["top"])
+        covered_lookups = sum(count for _, count in top)
+        self.stdout.write(
+            f"{total_lookups} lookups of {len(lookups)} postcodes in the "
+            f"last {options['days']} days"
+        )
+        if not top:
+            return
+        self.stdout.write(
+            f"Warming the top {len(top)} postcodes, which cover "
+            f"{covered_lookups / total_lookups:.1%} of lookups"
+        )
+
+        warmer = PostcodeCacheWarmer(
+            ee_rate=options["ee_rate"],
+            wdiv_rate=options["wdiv_rate"],
+            workers=options["workers"],
+            site_url=options["site_url"],
+        )
+        stats = warmer.warm([postcode for postcode, _ in top])
+        for stat, count in sorted(stats.items()):
+            self.stdout.write(f"{stat}: {count}")
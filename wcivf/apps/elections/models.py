@@ -6,6 +6,7 @@ import pytz
 from django.conf import settings
 from django.db.models import JSONField
 from django.db import models
+from django.db.models.functions import Least
 from django.template.defaultfilters import pluralize
 from django.contrib.humanize.templatetags.humanize import apnumber
 from django.urls import reverse
@@ -340,6 +341,44 @@ class PostElectionQuerySet(models.QuerySet):
         """
         return self.filter(ynr_modified__isnull=False).latest("ynr_modified")
 
+    def with_candidate_counts(self):
+        """
+        Annotates the numbers used by PostElection.party_ballot_count, so
+        they can be shown for a list of ballots without a query for each one
+        """
+        independent = models.Q(personpost__party_id="ynmp-party:2")
+        without_party = models.Q(personpost__party_id__isnull=True)
+        return self.annotate(
+            num_candidates=models.Count("personpost", distinct=True),
+            num_independent_candidates=models.Count(
+                "personpost", filter=independent, distinct=True
+            ),
+            # candidates without a party count as one more party
+            num_other_parties=models.Count(
+                "personpost__party", filter=~independent, distinct=True
+            )
+            + Least(
+                models.Count("personpost", filter=without_party, distinct=True),
+                1,
+            ),
+        )
+
+    def with_next_ballot(self):
+        """
+        Annotates the ID of the ballot returned by PostElection.next_ballot
+        """
+        next_ballots = PostElection.objects.filter(
+            post=models.OuterRef("post"),
+            election__election_date__gt=models.OuterRef(
+                "election__election_date"
+            ),
+            election__election_date__gte=datetime.date.today(),
+            election__election_type=models.OuterRef("election__election_type"),
+        ).order_by("-election__election_date")
+        return self.annotate(
+            next_ballot_id=models.Subquery(next_ballots.values("pk")[:1])
+        )
+
 
 class PostElection(TimeStampedModel):
     ballot_paper_id = models.CharField(blank=True, max_length=800, unique=True)
@@ -373,20 +412,24 @@ class PostElection(TimeStampedModel):
     class Meta:
         get_latest_by = "ynr_modified"
 
+    @cached_property
+    def election_timetable(self):
+        """
+        The timetable for this ballot, shared by all of the deadline
+        properties so that it is only looked up once per instance
+        """
+        return get_election_timetable(self.ballot_paper_id, self.post.territory)
+
     @property
     def expected_sopn_date(self):
         try:
-            return get_election_timetable(
-                self.ballot_paper_id, self.post.territory
-            ).sopn_publish_date
+            return self.election_timetable.sopn_publish_date
         except AttributeError:
             return None
 
     @property
     def registration_deadline(self):
-        return get_election_timetable(
-            self.ballot_paper_id, self.post.territory
-        ).registration_deadline
+        return self.election_timetable.registration_deadline
 
     @property
     def past_registration_deadline(self):
@@ -394,9 +437,7 @@ class PostElection(TimeStampedModel):
 
     @property
     def postal_vote_application_deadline(self):
-        return get_election_timetable(
-            self.ballot_paper_id, self.post.territory
-        ).postal_vote_application_deadline
+        return self.election_timetable.postal_vote_application_deadline
 
     @property
     def is_mayoral(self):
@@ -526,8 +567,16 @@ class PostElection(TimeStampedModel):
         if self.election.current:
             return None
 
+        next_ballots = PostElection.objects.select_related("election", "post")
+        if hasattr(self, "next_ballot_id"):
+            # annotated by PostElectionQuerySet.with_next_ballot
+            if self.next_ballot_id is None:
+                return None
+            return next_ballots.get(pk=self.next_ballot_id)
+
         try:
-            return self.post.postelection_set.filter(
+            return next_ballots.filter(
+                post=self.post,
                 election__election_date__gt=self.election.election_date,
                 election__election_date__gte=datetime.date.today(),
                 election__election_type=self.election.election_type,
@@ -535,18 +584,39 @@ class PostElection(TimeStampedModel):
         except PostElection.DoesNotExist:
             return None
 
+    @cached_property
+    def candidate_counts(self):
+        """
+        Returns a dict with the number of candidates on the ballot, how many
+        of them are independents and the number of other parties standing.
+        Uses the values from PostElectionQuerySet.with_candidate_counts if
+        they were annotated, otherwise gets them in one query.
+        """
+        if hasattr(self, "num_candidates"):
+            return {
+                "num_candidates": self.num_candidates,
+                "num_independent_candidates": self.num_independent_candidates,
+                "num_other_parties": self.num_other_parties,
+            }
+
+        independent = models.Q(party_id="ynmp-party:2")
+        without_party = models.Q(party_id__isnull=True)
+        return self.personpost_set.aggregate(
+            num_candidates=models.Count("pk"),
+            num_independent_candidates=models.Count("pk", filter=independent),
+            num_other_parties=models.Count(
+                "party_id", filter=~independent, distinct=True
+            )
+            + Least(models.Count("pk", filter=without_party), 1),
+        )
+
     @property
     def party_ballot_count(self):
-        if self.personpost_set.exists():
-            people = self.personpost_set
+        counts = self.candidate_counts
+        if counts["num_candidates"]:
             if self.election.uses_lists:
-                ind_candidates = people.filter(party_id="ynmp-party:2").count()
-                num_other_parties = (
-                    people.exclude(party_id="ynmp-party:2")
-                    .values("party_id")
-                    .distinct()
-                    .count()
-                )
+                ind_candidates = counts["num_independent_candidates"]
+                num_other_parties = counts["num_other_parties"]
                 ind_and_parties = ind_candidates + num_other_parties
                 ind_and_parties_apnumber = apnumber(ind_and_parties)
                 ind_and_parties_pluralized = pluralize(ind_and_parties)
@@ -556,7 +626,7 @@ class PostElection(TimeStampedModel):
                 return value
 
             else:
-                num_candidates = people.count()
+                num_candidates = counts["num_candidates"]
                 candidates_apnumber = apnumber(num_candidates)
                 candidates_pluralized = pluralize(num_candidates)
                 return f"{candidates_apnumber} candidate{candidates_pluralized}"
@@ -0,0 +1,118 @@
+"""
+A full-page cache for the postcode view.
+
+Rendered pages are cached by postcode, language, date and a global data
+version, which the importers bump whenever ballot data changes, so a warm
+page is served without touching the database or the template engine.
+
+The parts of the page that are different for each visitor (the CSRF token
+and the feedback form's token) are rendered as placeholders, and filled in
+for each request when the page is served.
+
+The ballots section of the page only depends on the ballots, so it is also
+cached by a signature of the set of ballots and their data versions. Every
+postcode with the same ballots shares it, so it is still warm when the page
+for a new postcode is rendered.
+"""
+import hashlib
+import uuid
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils import timezone, translation
+
+from elections.constants import (
+    BALLOT_SET_FRAGMENT_KEY_FMT,
+    BALLOT_SET_FRAGMENT_TTL,
+    DATA_VERSION_KEY,
+    POSTCODE_PAGE_KEY_FMT,
+    POSTCODE_PAGE_TTL,
+)
+
+CSRF_TOKEN_PLACEHOLDER = "__CSRF_TOKEN__"
+FEEDBACK_TOKEN_PLACEHOLDER = "__FEEDBACK_TOKEN__"
+
+
+def get_data_version():
+    return cache.get(DATA_VERSION_KEY, 0)
+
+
+def bump_data_version():
+    """
+    Changes the data version, so that every cached page is re-rendered on
+    its next request
+    """
+    try:
+        return cache.incr(DATA_VERSION_KEY)
+    except ValueError:
+        cache.set(DATA_VERSION_KEY, 1, None)
+        return 1
+
+
+def postcode_page_key(postcode):
+    return POSTCODE_PAGE_KEY_FMT.format(
+        version=get_data_version(),
+        language=translation.get_language(),
+        date=timezone.now().date(),
+        postcode=postcode.replace(" ", ""),
+    )
+
+
+def ballot_set_signature(postelections):
+    """
+    Returns a hash of the IDs of the ballots and the times they were last
+    modified, which is bumped whenever a ballot's data changes
+    """
+    ballots = sorted(
+        "{}:{}".format(ballot.ballot_paper_id, ballot.modified.timestamp())
+        for ballot in postelections
+    )
+    return hashlib.md5("|".join(ballots).encode()).hexdigest()
+
+
+def ballot_set_fragment_key(postelections):
+    return BALLOT_SET_FRAGMENT_KEY_FMT.format(
+        language=translation.get_language(),
+        date=timezone.now().date(),
+        signature=ballot_set_signature(postelections),
+    )
+
+
+def get_cached_fragment(key):
+    return cache.get(key)
+
+
+def cache_fragment(key, content):
+    cache.set(key, content, BALLOT_SET_FRAGMENT_TTL)
+
+
+def is_cacheable(request):
+    """
+    Pages showing messages are only for the visitor they were added for, and
+    pages for a URL with a query string render it in links and forms, so
+    they aren't cached either
+    """
+    return (
+        request.method == "GET"
+        and not request.GET
+        and not get_messages(request)
+    )
+
+
+def get_cached_page(key):
+    return cache.get(key)
+
+
+def cache_page(key, content):
+    cache.set(key, content, POSTCODE_PAGE_TTL)
+
+
+def fill_placeholders(request, content):
+    """
+    Replaces the placeholders in the cached page with the values for this
+    request
+    """
+    return content.replace(
+        CSRF_TOKEN_PLACEHOLDER.encode(), get_token(request).encode()
+    ).replace(FEEDBACK_TOKEN_PLACEHOLDER.encode(), uuid.uuid4().hex.encode())
@@ -0,0 +1,204 @@
+"""
+Warms the caches used by the postcode page for the postcodes that are looked
+up most, so they are ready before the traffic arrives (e.g. on polling day).
+
+Postcodes are ranked by the lookups logged in `LoggedPostcode`, plus any
+still waiting in the Redis log queue. For each of the top postcodes the
+postcode→ballot and polling station caches are filled from EveryElection
+and WhereDoIVote, then a bundle is built for each of their ballots. Requests
+are made from a pool of threads, and each API has its own `RateLimiter` so
+warming doesn't put too much load on them.
+
+Caches are local to each web server, so when warming from elsewhere (e.g. a
+scheduled Lambda) pass `site_url` to warm by requesting each postcode's page
+from the site instead.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from requests.exceptions import RequestException
+
+from core import upstream
+from core.postcodes import clean_postcode, is_valid_postcode
+from core.models import LoggedPostcode
+from core.resilience import CircuitOpenError
+from elections.bundles import ballot_bundle_key
+from elections.constants import (
+    POLLING_STATIONS_KEY_FMT,
+    POSTCODE_TO_BALLOT_KEY_FMT,
+    PREWARM_HEADER,
+)
+from elections.models import InvalidPostcodeError, PostElection
+from elections.views.mixins import (
+    PollingStationInfoMixin,
+    PostcodeToPostsMixin,
+    PostelectionsToPeopleMixin,
+    polling_station_cache,
+)
+
+
+def queued_lookups(since):
+    """
+    Returns the lookups since `since` that are still in the Redis log queue
+    waiting to be written to LoggedPostcode, or none if Redis isn't available
+    """
+    red = redis.Redis(connection_pool=settings.REDIS_POOL)
+    key = "{}:log_postcode_queue".format(settings.REDIS_KEY_PREFIX)
+    try:
+        items = red.zrangebyscore(key, since.timestamp(), "+inf")
+    except redis.RedisError:
+        return []
+    return [json.loads(item) for item in items]
+
+
+def rank_postcodes(since):
+    """
+    Returns a Counter of the number of times each postcode has been looked up
+    since `since`
+    """
+    lookups = Counter()
+    logged = (
+        LoggedPostcode.objects.filter(created__gte=since)
+        .values_list("postcode")
+        .annotate(lookups=Count("id"))
+    )
+    for postcode, count in logged:
+        lookups[clean_postcode(postcode)] += count
+
+    for log_dict in queued_lookups(since):
+        lookups[clean_postcode(log_dict["postcode"])] += 1
+
+    for postcode in list(lookups):
+        if not is_valid_postcode(postcode):
+            del lookups[postcode]
+    return lookups
+
+
+class RateLimiter:
+    """
+    Spaces out calls to `wait` so there are no more than `rate` a second,
+    across every thread using it
+    """
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.lock = threading.Lock()
+        self.next_call = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PostcodeCacheWarmer(
+    PostcodeToPostsMixin, PollingStationInfoMixin, PostelectionsToPeopleMixin
+):
+    def __init__(self, ee_rate, wdiv_rate, workers, site_url=None):
+        self.ee_limiter = RateLimiter(ee_rate)
+        self.wdiv_limiter = RateLimiter(wdiv_rate)
+        self.workers = workers
+        self.site_url = site_url
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    def count(self, stat):
+        with self.stats_lock:
+            self.stats[stat] += 1
+
+    def warm(self, postcodes):
+        """
+        Warms the caches for each postcode, and returns a Counter of what was
+        warmed, already cached or failed
+        """
+        if self.site_url:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                list(executor.map(self.warm_page, postcodes))
+            return self.stats
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(self.warm_postcode, postcodes)
+            ballot_paper_ids = set().union(*results)
+        self.warm_bundles(ballot_paper_ids)
+        return self.stats
+
+    def warm_postcode(self, postcode):
+        """
+        Warms the caches for a postcode and returns the IDs of its ballots
+        """
+        self.warm_polling_station(postcode)
+        return self.warm_ballots(postcode)
+
+    def warm_ballots(self, postcode):
+        key = POSTCODE_TO_BALLOT_KEY_FMT.format(postcode.replace(" ", ""))
+        results_json = cache.get(key)
+        if results_json:
+            self.count("ballots_cached")
+        else:
+            self.ee_limiter.wait()
+            try:
+                results_json = self.fetch_postcode_elections(postcode, key)
+            except (InvalidPostcodeError, RequestException):
+                self.count("ballots_failed")
+                return []
+            self.count("ballots_warmed")
+        return [election["election_id"] for election in results_json]
+
+    def warm_polling_station(self, postcode):
+        key = POLLING_STATIONS_KEY_FMT.format(postcode.replace(" ", ""))
+        if polling_station_cache.is_fresh(key):
+            self.count("polling_stations_cached")
+            return
+
+        self.wdiv_limiter.wait()
+        try:
+            info = self.fetch_polling_station_info(postcode)
+        except (CircuitOpenError, RequestException):
+            self.count("polling_stations_failed")
+            return
+        polling_station_cache.set(key, info)
+        self.count("polling_stations_warmed")
+
+    def warm_bundles(self, ballot_paper_ids):
+        ballots = PostElection.objects.filter(
+            ballot_paper_id__in=ballot_paper_ids
+        ).select_related("election")
+        keys = {ballot_bundle_key(ballot): ballot for ballot in ballots}
+        cached = cache.get_many(keys.keys())
+        for key, ballot in keys.items():
+            if key in cached:
+                self.count("bundles_cached")
+            else:
+                self.build_and_cache_bundle(ballot, key)
+                self.count("bundles_warmed")
+
+    def warm_page(self, postcode):
+        """
+        Requests the postcode's page from the site, which warms every cache
+        it uses on the server that handles the request. The request has a
+        header so it isn't logged as a lookup.
+        """
+        url = "{}/elections/{}/".format(
+            self.site_url.rstrip("/"), quote(postcode)
+        )
+        # each page makes a request to EE and WDIV if they aren't cached
+        self.ee_limiter.wait()
+        self.wdiv_limiter.wait()
+        try:
+            response = upstream.get(url, headers={PREWARM_HEADER: "1"})
+            response.raise_for_status()
+        except RequestException:
+            self.count("pages_failed")
+            return
+        self.count("pages_warmed")
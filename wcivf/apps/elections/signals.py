@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent by the importers once they have finished, with the ballot_paper_ids of
+# every ballot whose data they may have changed
+ballots_updated = Signal()
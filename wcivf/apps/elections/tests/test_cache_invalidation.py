@@ -0,0 +1,71 @@
+import pytest
+
+from django.core.cache import cache
+
+from elections.bundles import ballot_bundle_key
+from elections.cache_invalidation import invalidate_ballots
+from elections.models import PostElection
+from elections.signals import ballots_updated
+from elections.tests.factories import (
+    ElectionFactory,
+    PostElectionFactory,
+    PostFactory,
+)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("locmem_cache")
+class TestInvalidateBallots:
+    @pytest.fixture
+    def ballot(self):
+        return PostElectionFactory(election=ElectionFactory(current=True))
+
+    def test_deletes_bundle_and_bumps_version(self, ballot, settings):
+        settings.BALLOT_BUNDLE_REBUILD_LIMIT = 0
+        old_key = ballot_bundle_key(ballot)
+        cache.set(old_key, {"candidacies": []})
+
+        assert invalidate_ballots([ballot.ballot_paper_id]) == 1
+
+        ballot.refresh_from_db()
+        assert cache.get(old_key) is None
+        assert ballot_bundle_key(ballot) != old_key
+        assert cache.get(ballot_bundle_key(ballot)) is None
+
+    def test_rebuilds_current_ballots(self, ballot, settings):
+        settings.BALLOT_BUNDLE_REBUILD_LIMIT = 10
+        invalidate_ballots([ballot.ballot_paper_id])
+
+        ballot.refresh_from_db()
+        assert cache.get(ballot_bundle_key(ballot)) is not None
+
+    def test_doesnt_rebuild_past_ballots(self, settings):
+        settings.BALLOT_BUNDLE_REBUILD_LIMIT = 10
+        ballot = PostElectionFactory(
+            election=ElectionFactory(slug="local.2019-05-02", current=False)
+        )
+        invalidate_ballots([ballot.ballot_paper_id])
+
+        ballot.refresh_from_db()
+        assert cache.get(ballot_bundle_key(ballot)) is None
+
+    def test_only_touches_given_ballots(self, ballot):
+        other = PostElectionFactory(post=PostFactory(ynr_id="other"))
+        modified = other.modified
+
+        invalidate_ballots([ballot.ballot_paper_id])
+
+        assert PostElection.objects.get(pk=other.pk).modified == modified
+
+    def test_signal_invalidates_ballots(self, mocker):
+        invalidate = mocker.patch(
+            "elections.cache_invalidation.invalidate_ballots"
+        )
+        bump_data_version = mocker.patch(
+            "elections.cache_invalidation.bump_data_version"
+        )
+
+        ballots_updated.send(sender=None, ballot_paper_ids={"foo", "bar"})
+
+        invalidate.assert_called_once_with({"foo", "bar"})
+        bump_data_version.assert_called_once()
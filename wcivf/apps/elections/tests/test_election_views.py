@@ -15,6 +15,7 @@ from elections.tests.factories import (
 )
 from elections.views.mixins import PostelectionsToPeopleMixin
 from parties.tests.factories import PartyFactory
+from leaflets.models import Leaflet
 from people.tests.factories import (
     PersonFactory,
     PersonPostFactory,
@@ -470,12 +471,10 @@ class TestPostelectionsToPeopleMixin(TestCase):
 
     # should be updated as more queries are added
     PERSON_POST_QUERY = 1
-    PLEDGE_QUERY = 1
     LEAFLET_QUERY = 1
     PREVIOUS_PARTY_AFFILIATIONS_QUERY = 1
     ALL_QUERIES = [
         PERSON_POST_QUERY,
-        PLEDGE_QUERY,
         LEAFLET_QUERY,
         PREVIOUS_PARTY_AFFILIATIONS_QUERY,
     ]
@@ -501,29 +500,86 @@ class TestPostelectionsToPeopleMixin(TestCase):
             candidate.previous_party_affiliations.set(old_parties)
 
         with self.assertNumQueries(sum(self.ALL_QUERIES)):
-            queryset = self.mixin.people_for_ballot(self.post_election)
+            candidates = self.mixin.people_for_ballot(self.post_election)
             previous_parties = []
-            for candidate in queryset:
+            for candidate in candidates:
                 party_ids = [
                     party.party_id
                     for party in candidate.previous_party_affiliations.all()
                 ]
                 previous_parties += party_ids
 
-            candidates = list(queryset)
             self.assertEqual(len(candidates), 10)
             self.assertEqual(len(previous_parties), 10 * 10)
 
-    def test_num_queries_using_compact(self):
+    @pytest.mark.usefixtures("locmem_cache")
+    def test_no_queries_when_bundle_cached(self):
         """
-        Test when using compact number of queries is one less
+        Once the bundle for a ballot has been built, everything the
+        templates and API use is available without querying the database
         """
-        all_queries_without_pledge = self.ALL_QUERIES.copy()
-        all_queries_without_pledge.remove(self.PLEDGE_QUERY)
-        with self.assertNumQueries(sum(all_queries_without_pledge)):
-            queryset = self.mixin.people_for_ballot(
-                self.post_election, compact=True
+        old_party = PartyFactory(party_id="PP999")
+        self.candidates[0].previous_party_affiliations.add(old_party)
+        Leaflet.objects.create(person=self.candidates[0].person, leaflet_id=1)
+        self.mixin.people_for_ballot(self.post_election)
+
+        with self.assertNumQueries(0):
+            candidates = self.mixin.people_for_ballot(self.post_election)
+            self.assertEqual(candidates.count(), 10)
+            for candidate in candidates:
+                self.assertTrue(candidate.person.name)
+                self.assertTrue(candidate.person.get_absolute_url())
+                self.assertTrue(candidate.party.party_name)
+                self.assertEqual(
+                    candidate.post_election.ballot_paper_id,
+                    self.post_election.ballot_paper_id,
+                )
+                list(candidate.previous_party_affiliations.all())
+                list(candidate.person.ordered_leaflets)
+            candidate = next(
+                c for c in candidates if c.pk == self.candidates[0].pk
             )
-            # resolve queryset to execute the queries
-            candidates = list(queryset)
-            self.assertEqual(len(candidates), 10)
+            self.assertEqual(
+                list(candidate.previous_party_affiliations.all()), [old_party]
+            )
+            self.assertEqual(len(candidate.person.ordered_leaflets), 1)
+
+    def test_new_bundle_when_ballot_modified(self):
+        self.mixin.people_for_ballot(self.post_election)
+        self.candidates[0].delete()
+        self.post_election.save()
+
+        candidates = self.mixin.people_for_ballot(self.post_election)
+
+        self.assertEqual(len(candidates), 9)
+
+    def test_by_party(self):
+        post_election = PostElectionFactory(post=PostFactory(ynr_id="list"))
+        for party_id, party_name, list_position in [
+            ("PP2", "Zebra Party", 1),
+            ("PP1", "Apple Party", None),
+            ("PP1", "Apple Party", 2),
+            ("PP1", "Apple Party", 1),
+        ]:
+            PersonPostFactory(
+                post_election=post_election,
+                election=post_election.election,
+                post=post_election.post,
+                party=PartyFactory(party_id=party_id, party_name=party_name),
+                list_position=list_position,
+            )
+
+        candidates = self.mixin.people_for_ballot(post_election)
+
+        self.assertEqual(
+            [
+                (c.party.party_name, c.list_position)
+                for c in candidates.by_party()
+            ],
+            [
+                ("Apple Party", 1),
+                ("Apple Party", 2),
+                ("Apple Party", None),
+                ("Zebra Party", 1),
+            ],
+        )
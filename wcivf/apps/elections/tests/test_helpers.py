@@ -1,6 +1,8 @@
 from django.conf import settings
 import pytest
+import requests
 import sys
+import time
 
 from django.test import TestCase
 from django.utils import timezone
@@ -13,11 +15,19 @@ from elections.helpers import (
     EEHelper,
     JsonPaginator,
 )
-from elections.import_helpers import YNRBallotImporter, YNRPostImporter
-from elections.models import Election, PostElection, Post
+from elections.import_helpers import (
+    CandidacyChanges,
+    YNRBallotImporter,
+    YNRPostImporter,
+)
+from elections.models import (
+    Election,
+    PostElection,
+    Post,
+)
 from datetime import date
 from elections.tests.factories import PostElectionFactory
-from parties.models import Party
+from parties.tests.factories import PartyFactory
 from people.models import PersonPost
 
 
@@ -47,6 +57,15 @@ class GetElectionTimetable(TestCase):
 
         assert expected is None
 
+    def test_memoised(self):
+        get_election_timetable.cache_clear()
+
+        first = get_election_timetable("local.2019-05-02", "ENG")
+        second = get_election_timetable("local.2019-05-02", "ENG")
+
+        assert first is second
+        assert get_election_timetable.cache_info().hits == 1
+
 
 class TestEEHelper:
     @pytest.fixture
@@ -115,6 +134,125 @@ class TestEEHelper:
         )
         postelection_filter.return_value.delete.assert_called_once()
 
+    @pytest.fixture
+    def paginator(self, mocker):
+        paginator = mocker.MagicMock(spec=JsonPaginator)
+        mocker.patch("elections.helpers.JsonPaginator", new=paginator)
+        return paginator
+
+    def test_get_many(self, ee_helper, paginator, settings):
+        settings.EE_BATCH_SIZE = 2
+        paginator.return_value.__iter__.side_effect = [
+            iter([{"results": [{"election_id": "local.2021-05-06"}]}]),
+            iter([{"results": [{"election_id": "parl.2019-12-12"}]}]),
+        ]
+        ee_helper.ee_cache["mayor.2021-05-06"] = {"cached": True}
+
+        ee_helper.get_many(
+            [
+                "local.2021-05-06",
+                "mayor.2021-05-06",
+                "local.not-in-ee.2021-05-06",
+                "parl.2019-12-12",
+                "local.2021-05-06",
+            ]
+        )
+
+        assert paginator.call_count == 2
+        first_url = paginator.call_args_list[0][0][0]
+        assert "election_id_regex=%5E%28local%5C.2021%5C-05%5C-06%7C" in (
+            first_url
+        )
+        assert ee_helper.get_data("local.2021-05-06") == {
+            "election_id": "local.2021-05-06"
+        }
+        assert ee_helper.get_data("parl.2019-12-12") == {
+            "election_id": "parl.2019-12-12"
+        }
+        assert ee_helper.get_data("mayor.2021-05-06") == {"cached": True}
+        assert ee_helper.get_data("local.not-in-ee.2021-05-06") is None
+
+    def test_get_many_error(self, ee_helper, paginator):
+        paginator.return_value.__iter__.side_effect = requests.HTTPError
+
+        ee_helper.get_many(["local.2021-05-06"])
+
+        assert "local.2021-05-06" not in ee_helper.ee_cache
+
+    def test_ee_cache_not_shared(self, ee_helper):
+        ee_helper.ee_cache["local.2021-05-06"] = None
+
+        assert "local.2021-05-06" not in EEHelper().ee_cache
+
+
+class TestJsonPaginator:
+    @pytest.fixture
+    def mock_get(self, mocker):
+        def get(url):
+            page_number = int(url.split("=")[-1])
+            response = mocker.Mock(status_code=200)
+            response.json.return_value = {
+                "results": [page_number],
+                "next": f"http://example.com/?page={page_number + 1}"
+                if page_number < 5
+                else None,
+            }
+            return response
+
+        return mocker.patch("core.upstream.get", side_effect=get)
+
+    @pytest.mark.parametrize("prefetch", [0, 1, 3])
+    def test_pages_in_order(self, mock_get, prefetch, mocker):
+        paginator = JsonPaginator(
+            "http://example.com/?page=1", mocker.Mock(), prefetch=prefetch
+        )
+
+        pages = [page["results"][0] for page in paginator]
+
+        assert pages == [1, 2, 3, 4, 5]
+        assert mock_get.call_count == 5
+
+    def test_prefetch_raises_errors(self, mock_get, mocker):
+        error = mocker.Mock(status_code=500)
+        error.raise_for_status.side_effect = requests.HTTPError
+        mock_get.side_effect = [mock_get.side_effect("?page=1"), error]
+        paginator = JsonPaginator(
+            "http://example.com/?page=1", mocker.Mock(), prefetch=2
+        )
+
+        pages = iter(paginator)
+        assert next(pages)["results"] == [1]
+        with pytest.raises(requests.HTTPError):
+            next(pages)
+
+    def test_prefetch_raises_base_exceptions(self, mock_get, mocker):
+        class Stop(BaseException):
+            pass
+
+        mock_get.side_effect = Stop
+        paginator = JsonPaginator(
+            "http://example.com/?page=1", mocker.Mock(), prefetch=2
+        )
+
+        with pytest.raises(Stop):
+            next(iter(paginator))
+
+    def test_prefetch_is_bounded(self, mock_get, mocker):
+        """
+        Stopping early means the pages after those held in the queue are
+        never downloaded
+        """
+        paginator = JsonPaginator(
+            "http://example.com/?page=1", mocker.Mock(), prefetch=1
+        )
+
+        for page in paginator:
+            break
+        time.sleep(0.3)
+
+        # the page being used, one in the queue and one waiting to be added
+        assert mock_get.call_count <= 3
+
 
 class TestYNRBallotImporter:
     @pytest.fixture
@@ -199,6 +337,78 @@ class TestYNRBallotImporter:
         importer.attach_cancelled_ballot_info.assert_called()
         importer.delete_orphan_posts.assert_called_once()
 
+    def test_do_import_sends_ballots_updated(self, importer, mocker):
+        send = mocker.patch("elections.import_helpers.ballots_updated.send")
+        importer.add_ballots.side_effect = (
+            lambda page: importer.updated_ballot_ids.add("local.foo.2021-05-06")
+        )
+
+        importer.do_import(params=None)
+
+        send.assert_called_once_with(
+            sender=YNRBallotImporter,
+            ballot_paper_ids={"local.foo.2021-05-06"},
+        )
+        assert importer.updated_ballot_ids == set()
+
+    def test_do_import_sends_ballots_updated_per_page(self, importer, mocker):
+        send = mocker.patch("elections.import_helpers.ballots_updated.send")
+        importer.get_paginator.return_value = [
+            {"ballot_paper_id": "local.foo.2021-05-06"},
+            {"ballot_paper_id": "local.bar.2021-05-06"},
+        ]
+        importer.add_ballots.side_effect = (
+            lambda page: importer.updated_ballot_ids.add(
+                page["ballot_paper_id"]
+            )
+        )
+
+        importer.do_import(params=None)
+
+        assert send.call_args_list == [
+            mocker.call(
+                sender=YNRBallotImporter,
+                ballot_paper_ids={"local.foo.2021-05-06"},
+            ),
+            mocker.call(
+                sender=YNRBallotImporter,
+                ballot_paper_ids={"local.bar.2021-05-06"},
+            ),
+        ]
+
+    def test_do_import_nothing_updated(self, importer, mocker):
+        send = mocker.patch("elections.import_helpers.ballots_updated.send")
+
+        importer.do_import(params=None)
+
+        send.assert_not_called()
+
+    def test_prefetch_ee_data(self, importer, mocker):
+        mocker.patch.object(importer.ee_helper, "get_many")
+        importer.election_importer.election_cache["local.2021-05-06"] = None
+        ballot_dicts = [
+            {
+                "ballot_paper_id": "local.foo.2021-05-06",
+                "election": {
+                    "election_id": "local.2021-05-06",
+                    "current": True,
+                },
+            },
+            {
+                "ballot_paper_id": "parl.bar.2019-12-12",
+                "election": {
+                    "election_id": "parl.2019-12-12",
+                    "current": False,
+                },
+            },
+        ]
+
+        importer.prefetch_ee_data({"results": ballot_dicts})
+
+        importer.ee_helper.get_many.assert_called_once_with(
+            ["local.foo.2021-05-06", "parl.2019-12-12"]
+        )
+
     def test_should_prewarm_ee_cache(self, importer):
         importer.params = {"election_date": "2021-05-06"}
         importer.recently_updated = False
@@ -374,6 +584,7 @@ class TestYNRImporterAddBallots:
     def importer(self, post, election, ballot, mocker):
         importer = YNRBallotImporter()
         importer.exclude_candidacies = True
+        mocker.patch.object(importer, "prefetch_ee_data")
         mocker.patch.object(
             importer.election_importer,
             "update_or_create_from_ballot_dict",
@@ -387,9 +598,9 @@ class TestYNRImporterAddBallots:
         mocker.patch.object(importer, "add_replaced_ballot")
         mocker.patch.object(importer, "import_metadata_from_ee")
         mocker.patch.object(
-            PostElection.objects,
-            "update_or_create",
-            return_value=(ballot, False),
+            importer,
+            "update_or_create_ballot",
+            return_value=(ballot, False, False),
         )
         return importer
 
@@ -412,15 +623,17 @@ class TestYNRImporterAddBallots:
         importer.post_importer.update_or_create_from_ballot_dict.assert_called_once_with(
             ballot_dict
         )
-        PostElection.objects.update_or_create.assert_called_once_with(
-            ballot_paper_id="local.sheffield.fulwood.2021-05-06",
-            defaults={
+        importer.update_or_create_ballot.assert_called_once_with(
+            "local.sheffield.fulwood.2021-05-06",
+            {
                 "election": election,
                 "post": post,
                 "winner_count": 1,
                 "cancelled": False,
                 "locked": False,
-                "ynr_modified": "2021-10-12T00:00:00+00:00",
+                "ynr_modified": timezone.datetime(
+                    2021, 10, 12, tzinfo=timezone.utc
+                ),
             },
         )
 
@@ -502,7 +715,7 @@ class TestYNRImporterAddBallots:
         self, mocker, importer, ballot_dict, ballot
     ):
         """
-        Tests that if candidacies are included the importer will create them
+        Tests that if candidacies are included the importer will sync them
         """
         ballot_dict["candidacies"] = [
             {
@@ -543,21 +756,272 @@ class TestYNRImporterAddBallots:
         importer.exclude_candidacies = False
         importer.recently_updated = True
 
-        person_post = mocker.MagicMock(spec=PersonPost)
+        mocker.patch.object(importer, "sync_candidacies")
+        importer.add_ballots(results=results)
+
+        importer.sync_candidacies.assert_called_once_with(
+            [(ballot, ballot_dict)]
+        )
+        ballot.personpost_set.all.return_value.delete.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestYNRImporterAddBallotsBulk:
+    @pytest.fixture
+    def importer(self, mocker):
+        importer = YNRBallotImporter(bulk=True)
+        mocker.patch.object(importer, "prefetch_ee_data")
         mocker.patch.object(
-            PersonPost.objects, "create", return_value=person_post
+            importer.election_importer,
+            "update_or_create_from_ballot_dict",
+            return_value=ElectionFactory(current=False),
         )
-        party = mocker.MagicMock(spec=Party)
-        mocker.patch.object(Party.objects, "get", return_value=party)
-        importer.add_ballots(results=results)
+        mocker.patch.object(importer, "import_metadata_from_ee")
+        return importer
+
+    @pytest.fixture
+    def party(self):
+        return PartyFactory(party_id="ynmp-party:2", party_name="Independent")
+
+    def candidacy(self, person_id, name, party_id="party:53"):
+        return {
+            "person": {"name": name, "id": person_id},
+            "result": None,
+            "elected": None,
+            "party_list_position": None,
+            "party": {"legacy_slug": party_id},
+            "party_name": "Labour Party",
+            "party_description_text": "",
+            "previous_party_affiliations": [
+                {"legacy_slug": "ynmp-party:2"},
+                {"legacy_slug": "not-a-party"},
+                {"legacy_slug": party_id},
+            ],
+        }
+
+    def ballot_dict(self, post_id, candidacies):
+        return {
+            "ballot_paper_id": f"local.{post_id}.2021-05-06",
+            "post": {"id": post_id, "slug": post_id, "label": post_id},
+            "winner_count": 1,
+            "cancelled": False,
+            "candidates_locked": False,
+            "candidacies": candidacies,
+        }
+
+    def test_add_ballots_bulk(self, importer, party):
+        PartyFactory(party_id="party:53")
+        results = {
+            "results": [
+                self.ballot_dict("fulwood", [self.candidacy(1, "Joe Bloggs")]),
+                self.ballot_dict("crookes", [self.candidacy(2, "Jane Doe")]),
+            ]
+        }
+
+        importer.add_ballots_bulk(results)
+
+        assert PostElection.objects.count() == 2
+        assert Post.objects.get(ynr_id="crookes").label == "crookes"
+        person_post = PersonPost.objects.get(person__name="Joe Bloggs")
+        assert person_post.post_election.ballot_paper_id == (
+            "local.fulwood.2021-05-06"
+        )
+        assert list(person_post.previous_party_affiliations.all()) == [party]
+        assert importer.updated_ballot_ids == {
+            "local.fulwood.2021-05-06",
+            "local.crookes.2021-05-06",
+        }
+
+    def test_add_ballots_bulk_updates_existing(self, importer, party):
+        PartyFactory(party_id="party:53")
+        importer.add_ballots_bulk(
+            {
+                "results": [
+                    self.ballot_dict(
+                        "fulwood", [self.candidacy(1, "Joe Bloggs")]
+                    )
+                ]
+            }
+        )
+        ballot_dict = self.ballot_dict(
+            "fulwood", [self.candidacy(1, "Joseph Bloggs")]
+        )
+        ballot_dict["post"]["label"] = "Fulwood"
+        ballot_dict["winner_count"] = 2
+
+        importer.post_importer.post_cache = {}
+        importer.add_ballots_bulk({"results": [ballot_dict]})
+
+        ballot = PostElection.objects.get()
+        assert ballot.winner_count == 2
+        assert ballot.post.label == "Fulwood"
+        person_post = ballot.personpost_set.get()
+        assert person_post.person.name == "Joseph Bloggs"
+        assert person_post.previous_party_affiliations.count() == 1
+
+    def test_add_ballots_bulk_unchanged(self, importer, party):
+        PartyFactory(party_id="party:53")
+        results = {
+            "results": [
+                self.ballot_dict("fulwood", [self.candidacy(1, "Joe Bloggs")])
+            ]
+        }
+        importer.add_ballots_bulk(results)
+        importer.updated_ballot_ids = set()
+
+        importer.post_importer.post_cache = {}
+        importer.add_ballots_bulk(results)
+
+        assert importer.updated_ballot_ids == set()
 
-        ballot.personpost_set.all.return_value.delete.assert_called_once()
+    def test_add_ballots_bulk_recently_updated_unchanged(self, importer):
+        importer.recently_updated = True
+        ballot_dict = self.ballot_dict("fulwood", [])
+        ballot_dict["last_updated"] = "2021-10-12T00:00:00+00:00"
+        importer.add_ballots_bulk({"results": [ballot_dict]})
+        importer.updated_ballot_ids = set()
+
+        importer.post_importer.post_cache = {}
+        importer.add_ballots_bulk({"results": [ballot_dict]})
+
+        assert importer.updated_ballot_ids == set()
+
+    def test_add_ballots_bulk_sets_ee_metadata(self, mocker):
+        importer = YNRBallotImporter(bulk=True)
+        mocker.patch.object(importer, "prefetch_ee_data")
+        mocker.patch.object(
+            importer.election_importer,
+            "update_or_create_from_ballot_dict",
+            return_value=ElectionFactory(current=True),
+        )
+        mocker.patch.object(
+            importer.ee_helper,
+            "get_data",
+            return_value={
+                "organisation": {
+                    "territory_code": "ENG",
+                    "organisation_type": "local-authority",
+                },
+                "voting_system": {
+                    "slug": "FPTP",
+                    "name": "First past the post",
+                },
+                "metadata": {"foo": "bar"},
+                "division": None,
+            },
+        )
+        save = mocker.spy(PostElection, "save")
+        results = {"results": [self.ballot_dict("fulwood", [])]}
+
+        importer.add_ballots_bulk(results)
+
+        ballot = PostElection.objects.get()
+        assert ballot.metadata == {"foo": "bar"}
+        assert ballot.voting_system.slug == "FPTP"
+        assert ballot.post.territory == "ENG"
+
+        importer.updated_ballot_ids = set()
+        importer.post_importer.post_cache = {}
+        importer.add_ballots_bulk(results)
+
+        assert importer.updated_ballot_ids == set()
+        save.assert_not_called()
+
+    def test_update_or_create_ballot(self, importer):
+        election = ElectionFactory()
+        post = PostFactory()
+        defaults = {"election": election, "post": post, "winner_count": 1}
 
-        PersonPost.objects.create.assert_called_once()
-        Party.objects.get.assert_called_once_with(party_id="ynmp-party:2")
-        person_post.previous_party_affiliations.add.assert_called_once_with(
-            party
+        ballot, created, changed = importer.update_or_create_ballot(
+            "local.fulwood.2021-05-06", defaults
         )
+        assert (created, changed) == (True, True)
+
+        modified = ballot.modified
+        ballot, created, changed = importer.update_or_create_ballot(
+            "local.fulwood.2021-05-06", defaults
+        )
+        assert (created, changed) == (False, False)
+        assert PostElection.objects.get().modified == modified
+
+        defaults["winner_count"] = 2
+        ballot, created, changed = importer.update_or_create_ballot(
+            "local.fulwood.2021-05-06", defaults
+        )
+        assert (created, changed) == (False, True)
+        assert PostElection.objects.get().winner_count == 2
+
+    def test_bulk_import_query_count_doesnt_grow_with_page(
+        self, importer, party, django_assert_max_num_queries
+    ):
+        PartyFactory(party_id="party:53")
+        results = {
+            "results": [
+                self.ballot_dict(
+                    f"ward-{i}", [self.candidacy(i, f"Person {i}")]
+                )
+                for i in range(20)
+            ]
+        }
+        with django_assert_max_num_queries(20):
+            importer.add_ballots_bulk(results)
+
+        assert PersonPost.objects.count() == 20
+
+    def test_sync_candidacies_only_changes_differences(self, importer, party):
+        PartyFactory(party_id="party:53")
+        ballot_dict = self.ballot_dict(
+            "fulwood",
+            [
+                self.candidacy(1, "Joe Bloggs"),
+                self.candidacy(2, "Jane Doe"),
+                self.candidacy(3, "John Smith"),
+            ],
+        )
+        importer.add_ballots_bulk({"results": [ballot_dict]})
+        unchanged = PersonPost.objects.get(person_id=1)
+        updated = PersonPost.objects.get(person_id=2)
+        importer.updated_ballot_ids = set()
+
+        ballot_dict["candidacies"] = [
+            self.candidacy(1, "Joe Bloggs"),
+            self.candidacy(2, "Jane Doe", party_id="ynmp-party:2"),
+            self.candidacy(4, "Sam Jones"),
+        ]
+        ballot = PostElection.objects.get()
+        changes = importer.sync_candidacies([(ballot, ballot_dict)])
+
+        assert changes == {
+            "local.fulwood.2021-05-06": CandidacyChanges(
+                created=1, updated=1, deleted=1
+            )
+        }
+        assert set(
+            ballot.personpost_set.values_list("person_id", flat=True)
+        ) == {1, 2, 4}
+        assert PersonPost.objects.get(person_id=1).pk == unchanged.pk
+        updated_now = PersonPost.objects.get(person_id=2)
+        assert updated_now.pk == updated.pk
+        assert updated_now.party_id == "ynmp-party:2"
+        # the new party is no longer a previous affiliation
+        assert updated_now.previous_party_affiliations.count() == 0
+        assert importer.updated_ballot_ids == {"local.fulwood.2021-05-06"}
+
+    def test_sync_candidacies_nothing_changed(self, importer, party):
+        PartyFactory(party_id="party:53")
+        ballot_dict = self.ballot_dict(
+            "fulwood", [self.candidacy(1, "Joe Bloggs")]
+        )
+        importer.add_ballots_bulk({"results": [ballot_dict]})
+        importer.updated_ballot_ids = set()
+
+        ballot = PostElection.objects.get()
+        changes = importer.sync_candidacies([(ballot, ballot_dict)])
+
+        assert changes == {
+            "local.fulwood.2021-05-06": CandidacyChanges(0, 0, 0)
+        }
+        assert importer.updated_ballot_ids == set()
 
 
 class TestYNRBallotImporterDivisionType:
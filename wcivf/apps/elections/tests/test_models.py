@@ -3,6 +3,7 @@ from django.utils import timezone
 from faker import Faker
 import pytest
 
+from elections.helpers import get_election_timetable
 from elections.models import Election, Post, PostElection
 from elections.tests.factories import (
     ElectionFactoryLazySlug,
@@ -343,6 +344,90 @@ class TestPostElectionModel:
             == "six parties or independent candidates"
         )
 
+    @pytest.mark.django_db
+    def test_party_ballot_count_annotated(self, django_assert_num_queries):
+        election = ElectionFactoryLazySlug(
+            election_date="2021-5-6", current=True, election_type="local"
+        )
+        for label in ["one", "two"]:
+            ballot = PostElectionFactory(
+                post=PostFactory(ynr_id=label, label=label), election=election
+            )
+            for i in range(3):
+                PersonPostFactory(
+                    post_election=ballot,
+                    election=election,
+                    post=ballot.post,
+                    party=PartyFactory(party_id=f"party:{i % 2}"),
+                )
+        PostElectionFactory(post=PostFactory(ynr_id="empty"), election=election)
+
+        with django_assert_num_queries(1):
+            ballots = list(
+                PostElection.objects.select_related("election")
+                .with_candidate_counts()
+                .order_by("post__ynr_id")
+            )
+            counts = [ballot.party_ballot_count for ballot in ballots]
+        assert counts == [None, "three candidates", "three candidates"]
+
+        ballots[1].election.uses_lists = True
+        with django_assert_num_queries(0):
+            assert ballots[1].party_ballot_count == "two parties"
+
+    @pytest.mark.django_db
+    def test_party_ballot_count_candidates_without_party(self):
+        """
+        Candidates without a party are counted as one more party
+        """
+        ballot = PostElectionFactory(
+            election=ElectionFactoryLazySlug(
+                election_date="2021-5-6",
+                current=True,
+                election_type="local",
+                uses_lists=True,
+            ),
+        )
+        for party in [PartyFactory(party_id="party:1"), None, None]:
+            PersonPostFactory(
+                post_election=ballot,
+                election=ballot.election,
+                post=ballot.post,
+                party=party,
+            )
+
+        assert ballot.party_ballot_count == "two parties"
+        annotated = PostElection.objects.with_candidate_counts().get(
+            pk=ballot.pk
+        )
+        assert annotated.party_ballot_count == "two parties"
+
+    @pytest.mark.django_db
+    @pytest.mark.freeze_time("2021-5-1")
+    def test_next_ballot_annotated(self, django_assert_num_queries):
+        post = PostFactory()
+        for election_date in ["2020-5-6", "2021-5-6"]:
+            PostElectionFactory(
+                post=post,
+                election=ElectionFactoryLazySlug(
+                    election_date=election_date,
+                    current=False,
+                    election_type="local",
+                ),
+            )
+
+        ballots = PostElection.objects.select_related("election").order_by(
+            "election__election_date"
+        )
+        old, future = ballots.with_next_ballot()
+        with django_assert_num_queries(1):
+            assert old.next_ballot == future
+            assert old.next_ballot.election.election_date == (
+                datetime.date(2021, 5, 6)
+            )
+        with django_assert_num_queries(0):
+            assert future.next_ballot is None
+
     def test_should_display_sopn_info_in_past(self, post_election):
         post_election.locked = True
         post_election.election.election_date = fake.past_date()
@@ -353,6 +438,27 @@ class TestPostElectionModel:
         post_election.locked = True
         assert post_election.should_display_sopn_info is True
 
+    def test_deadlines_share_timetable(self, mocker):
+        ballot = PostElectionFactory.build(
+            ballot_paper_id="local.sheffield.fulwood.2021-05-06",
+            post__territory="ENG",
+        )
+        timetable = get_election_timetable(
+            "local.sheffield.fulwood.2021-05-06", "ENG"
+        )
+        get_timetable = mocker.patch(
+            "elections.models.get_election_timetable", return_value=timetable
+        )
+
+        assert ballot.expected_sopn_date == timetable.sopn_publish_date
+        assert ballot.registration_deadline == timetable.registration_deadline
+        assert ballot.postal_vote_application_deadline == (
+            timetable.postal_vote_application_deadline
+        )
+        get_timetable.assert_called_once_with(
+            "local.sheffield.fulwood.2021-05-06", "ENG"
+        )
+
     def test_should_display_sopn_info_not_in_past_not_locked_no_sopn_date(
         self, post_election, mocker
     ):
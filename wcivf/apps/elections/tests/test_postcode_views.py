@@ -1,12 +1,20 @@
+import importlib
+
+import httpx
 import pytest
+import requests
 import vcr
 
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Count
-from django.urls import reverse
+from django.urls import clear_url_caches, reverse
 from django.test import TestCase, override_settings
 from pytest_django import asserts
-from elections.models import PostElection, InvalidPostcodeError
+import elections.urls
+import wcivf.urls
+from elections.models import InvalidPostcodeError, PostElection
 
 from elections.tests.factories import (
     ElectionFactory,
@@ -14,9 +22,15 @@ from elections.tests.factories import (
     PostElectionFactory,
 )
 from core.models import LoggedPostcode, write_logged_postcodes
-from elections.views.mixins import PostcodeToPostsMixin
-from elections.views.postcode_view import PostcodeView
+from core.resilience import CircuitOpenError
+from elections import page_cache
+from elections.views.mixins import PostcodeToPostsMixin, wdiv_circuit
+from elections.views.postcode_view import (
+    PostcodeView,
+    PostcodeiCalView,
+)
 from unittest import skipIf
+from unittest.mock import patch
 
 from parishes.models import ParishCouncilElection
 
@@ -100,8 +114,10 @@ class PostcodeViewTests(TestCase):
         assert '"utm_medium": "pytest"' in logging_message.message
 
     def test_dc_logging_postcode_invalid(self):
-        with self.assertLogs(level="DEBUG") as captured:
-            self.client.get(
+        with patch.object(settings.POSTCODE_LOGGER, "log") as log, patch(
+            "core.upstream.get"
+        ) as get:
+            response = self.client.get(
                 "/elections/INVALID/",
                 {
                     "foo": "bar",
@@ -112,16 +128,40 @@ class PostcodeViewTests(TestCase):
                 HTTP_AUTHORIZATION="Token foo",
             )
 
-        for record in captured.records:
-            assert not record.message.startswith("dc-postcode-searches")
+        self.assertRedirects(
+            response,
+            "/?invalid_postcode=1&postcode=INVALID",
+            fetch_redirect_response=False,
+        )
+        log.assert_not_called()
+        get.assert_not_called()
+
+    def test_prewarm_request_not_logged(self):
+        with patch.object(settings.POSTCODE_LOGGER, "log") as log, patch(
+            "elections.views.mixins.log_postcode"
+        ) as log_postcode, patch.object(
+            PostcodeView, "postcode_to_ballot_paper_ids", return_value=[]
+        ), patch.object(
+            PostcodeView, "get_cached_polling_station_info", return_value={}
+        ):
+            response = self.client.get(
+                "/elections/DD11DD/", HTTP_X_WCIVF_PREWARM="1"
+            )
+            self.assertEqual(response.status_code, 200)
+            log.assert_not_called()
+            log_postcode.assert_not_called()
+
+            self.client.get("/elections/DD11DD/")
+            log.assert_called_once()
+            log_postcode.assert_called_once()
 
 
 @pytest.mark.freeze_time("2021-05-06")
 @pytest.mark.django_db
 class TestPostcodeViewPolls:
     """
-    Tests to check that the PostcodeView response contains correct polling
-    station opening timnes
+    Tests to check that the polling station panel of the PostcodeView
+    contains correct polling station opening timnes
     """
 
     @pytest.fixture
@@ -133,7 +173,7 @@ class TestPostcodeViewPolls:
         response = mocker.MagicMock(status_code=200)
         response.json.return_value = {"results": []}
         mocker.patch(
-            "requests.get",
+            "core.upstream.get",
             return_value=response,
             autospec=True,
         )
@@ -150,7 +190,10 @@ class TestPostcodeViewPolls:
         )
 
         response = client.get(
-            reverse("postcode_view", kwargs={"postcode": "e1 2ax"}), follow=True
+            reverse(
+                "postcode_polling_station_view", kwargs={"postcode": "e1 2ax"}
+            ),
+            follow=True,
         )
         asserts.assertContains(
             response, "Polling stations are open from 8a.m. till 8p.m. today"
@@ -167,7 +210,9 @@ class TestPostcodeViewPolls:
         )
 
         response = client.get(
-            reverse("postcode_view", kwargs={"postcode": "s11 8qe"}),
+            reverse(
+                "postcode_polling_station_view", kwargs={"postcode": "s11 8qe"}
+            ),
             follow=True,
         )
         asserts.assertContains(
@@ -183,7 +228,10 @@ class TestPostcodeViewPolls:
         )
 
         response = client.get(
-            reverse("postcode_view", kwargs={"postcode": "TE11ST"}), follow=True
+            reverse(
+                "postcode_polling_station_view", kwargs={"postcode": "TE11ST"}
+            ),
+            follow=True,
         )
         asserts.assertNotContains(
             response, "Polling stations are open from 7a.m. till 10p.m. today"
@@ -209,7 +257,10 @@ class TestPostcodeViewPolls:
         ]
 
         response = client.get(
-            reverse("postcode_view", kwargs={"postcode": "TE11ST"}), follow=True
+            reverse(
+                "postcode_polling_station_view", kwargs={"postcode": "TE11ST"}
+            ),
+            follow=True,
         )
         asserts.assertNotContains(
             response, "Polling stations are open from 7a.m. till 10p.m. today"
@@ -218,6 +269,18 @@ class TestPostcodeViewPolls:
             response, "Polling stations are open from 8a.m. till 8p.m. today"
         )
 
+    def test_postcode_page_defers_polling_station_panel(
+        self, mock_response, client
+    ):
+        response = client.get(
+            reverse("postcode_view", kwargs={"postcode": "s11 8qe"}),
+            follow=True,
+        )
+        panel_url = reverse(
+            "postcode_polling_station_view", kwargs={"postcode": "S11 8QE"}
+        )
+        asserts.assertContains(response, f'data-src="{panel_url}"')
+
     def test_multiple_elections_not_london(self, mock_response, client):
         local = PostElectionFactory(
             ballot_paper_id="local.sheffield.ecclesall.2021-05-06",
@@ -235,7 +298,10 @@ class TestPostcodeViewPolls:
         ]
 
         response = client.get(
-            reverse("postcode_view", kwargs={"postcode": "TE11ST"}), follow=True
+            reverse(
+                "postcode_polling_station_view", kwargs={"postcode": "TE11ST"}
+            ),
+            follow=True,
         )
         assert response.status_code == 200
         asserts.assertContains(
@@ -246,6 +312,111 @@ class TestPostcodeViewPolls:
         )
 
 
+@pytest.mark.django_db
+@pytest.mark.usefixtures("locmem_cache")
+class TestPostcodePageCache:
+    @pytest.fixture
+    def ballot(self, mocker):
+        ballot = PostElectionFactory(
+            ballot_paper_id="local.sheffield.ecclesall.2021-05-06",
+        )
+        response = mocker.MagicMock(status_code=200)
+        response.json.return_value = {
+            "results": [{"election_id": ballot.ballot_paper_id}]
+        }
+        mocker.patch("core.upstream.get", return_value=response)
+        mocker.patch.object(
+            PostcodeView, "get_polling_station_info", return_value={}
+        )
+        mocker.patch.object(PostcodeView, "log_postcode")
+        return ballot
+
+    def test_warm_page_served_from_cache(
+        self, ballot, client, django_assert_num_queries
+    ):
+        url = reverse("postcode_view", kwargs={"postcode": "s11 8qe"})
+        first = client.get(url)
+
+        with django_assert_num_queries(0):
+            second = client.get(url)
+
+        assert second.content.startswith(first.content[:100])
+        for response in (first, second):
+            assert (
+                page_cache.CSRF_TOKEN_PLACEHOLDER
+                not in response.content.decode()
+            )
+            assert (
+                page_cache.FEEDBACK_TOKEN_PLACEHOLDER
+                not in response.content.decode()
+            )
+        assert PostcodeView.log_postcode.call_count == 2
+
+    def test_query_string_not_cached(self, ballot, client):
+        url = reverse("postcode_view", kwargs={"postcode": "s11 8qe"})
+        key = page_cache.postcode_page_key("S11 8QE")
+        response = client.get(f"{url}?utm_source=newsletter")
+        assert "utm_source=newsletter" in response.content.decode()
+        assert cache.get(key) is None
+
+        client.get(url)
+        response = client.get(f"{url}?utm_source=newsletter")
+        assert "utm_source=newsletter" in response.content.decode()
+        assert "utm_source=newsletter" not in cache.get(key).decode()
+
+    def test_data_version_bumped(self, ballot, client):
+        url = reverse("postcode_view", kwargs={"postcode": "s11 8qe"})
+        key = page_cache.postcode_page_key("S11 8QE")
+        client.get(url)
+        assert cache.get(key) is not None
+
+        page_cache.bump_data_version()
+
+        assert page_cache.postcode_page_key("S11 8QE") != key
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("locmem_cache")
+class TestBallotSetFragmentCache:
+    @pytest.fixture
+    def ballot(self, mocker):
+        ballot = PostElectionFactory(
+            ballot_paper_id="local.sheffield.ecclesall.2021-05-06",
+        )
+        mocker.patch.object(
+            PostcodeView,
+            "postcode_to_ballot_paper_ids",
+            return_value=[ballot.ballot_paper_id],
+        )
+        mocker.patch.object(
+            PostcodeView, "get_polling_station_info", return_value={}
+        )
+        mocker.patch.object(PostcodeView, "log_postcode")
+        mocker.spy(PostcodeView, "people_for_ballot")
+        return ballot
+
+    def test_fragment_shared_by_postcodes_with_same_ballots(
+        self, ballot, client
+    ):
+        for postcode in ("S11 8QE", "S11 8QF"):
+            response = client.get(
+                reverse("postcode_view", kwargs={"postcode": postcode})
+            )
+            assert response.status_code == 200
+            assert (
+                f'id="election_{ballot.election.slug}"'
+                in response.content.decode()
+            )
+
+        assert PostcodeView.people_for_ballot.call_count == 1
+
+    def test_signature_changes_when_ballot_modified(self, ballot):
+        signature = page_cache.ballot_set_signature([ballot])
+        ballot.save()
+
+        assert page_cache.ballot_set_signature([ballot]) != signature
+
+
 class TestPostcodeViewMethods:
     @pytest.fixture
     def view_obj(self, rf):
@@ -299,6 +470,180 @@ class TestPostcodeViewMethods:
         view_obj.postcode_to_ballots.assert_not_called()
         assert result == "ballots"
 
+    def test_fetch_polling_station_info(self, view_obj, mocker):
+        response = mocker.MagicMock(status_code=200)
+        response.json.return_value = {"polling_station_known": True}
+        get = mocker.patch("core.upstream.get", return_value=response)
+
+        result = view_obj.fetch_polling_station_info("S11 8QE")
+
+        assert result == {"polling_station_known": True}
+        assert "/postcode/S11 8QE.json" in get.call_args[0][0]
+
+    def test_fetch_polling_station_info_unknown_postcode(
+        self, view_obj, mocker
+    ):
+        response = requests.Response()
+        response.status_code = 400
+        mocker.patch("core.upstream.get", return_value=response)
+        record_failure = mocker.patch.object(wdiv_circuit, "record_failure")
+
+        assert view_obj.fetch_polling_station_info("S11 8QE") == {}
+        record_failure.assert_not_called()
+
+    def test_fetch_polling_station_info_error(self, view_obj, mocker):
+        mocker.patch(
+            "core.upstream.get", side_effect=requests.exceptions.Timeout
+        )
+        record_failure = mocker.patch.object(wdiv_circuit, "record_failure")
+
+        with pytest.raises(requests.exceptions.Timeout):
+            view_obj.fetch_polling_station_info("S11 8QE")
+        record_failure.assert_called_once()
+
+    def test_fetch_polling_station_info_circuit_open(self, view_obj, mocker):
+        mocker.patch.object(wdiv_circuit, "is_open", return_value=True)
+        get = mocker.patch("core.upstream.get")
+
+        with pytest.raises(CircuitOpenError):
+            view_obj.fetch_polling_station_info("S11 8QE")
+        get.assert_not_called()
+
+    def test_get_polling_station_info_wdiv_down(self, view_obj, mocker):
+        mocker.patch.object(wdiv_circuit, "is_open", return_value=True)
+
+        assert view_obj.get_polling_station_info("S11 8QE") == {}
+
+    def test_local_polling_station_info(self, view_obj, mocker, settings):
+        settings.LOCAL_POLLING_STATIONS = True
+        mocker.patch(
+            "pollingstations.models.PostcodeLookup.objects.polling_station_info",
+            return_value={"polling_station_known": True},
+        )
+        get = mocker.patch("core.upstream.get")
+
+        assert view_obj.get_polling_station_info("S11 8QE") == {
+            "polling_station_known": True
+        }
+        future = view_obj.submit_polling_station_info("S11 8QE")
+        assert future.result(timeout=0) == {"polling_station_known": True}
+        get.assert_not_called()
+
+    def test_local_polling_station_info_falls_back_to_wdiv(
+        self, view_obj, mocker, settings
+    ):
+        settings.LOCAL_POLLING_STATIONS = True
+        mocker.patch(
+            "pollingstations.models.PostcodeLookup.objects.polling_station_info",
+            return_value=None,
+        )
+        mocker.patch.object(
+            view_obj,
+            "get_wdiv_polling_station_info",
+            return_value={"polling_station_known": False},
+        )
+
+        assert view_obj.get_polling_station_info("S11 8QE") == {
+            "polling_station_known": False
+        }
+        view_obj.get_wdiv_polling_station_info.assert_called_once_with(
+            "S11 8QE"
+        )
+
+    def test_submit_polling_station_info(self, view_obj, mocker):
+        mocker.patch.object(
+            view_obj,
+            "get_wdiv_polling_station_info",
+            return_value={"foo": "bar"},
+        )
+
+        future = view_obj.submit_polling_station_info("S11 8QE")
+
+        assert future.result(timeout=5) == {"foo": "bar"}
+        view_obj.get_wdiv_polling_station_info.assert_called_once_with(
+            "S11 8QE"
+        )
+
+    @pytest.mark.django_db
+    def test_polling_station_deferred_when_not_cached(self, view_obj, mocker):
+        mocker.patch.object(
+            view_obj,
+            "postcode_to_ballots",
+            return_value=view_obj.get_ballots_queryset([]),
+        )
+        mocker.patch.object(
+            view_obj, "get_cached_polling_station_info", return_value=None
+        )
+        mocker.patch.object(view_obj, "get_polling_station_info")
+        mocker.patch.object(view_obj, "log_postcode")
+        view_obj.request.utm_data = {}
+
+        context = view_obj.get_context_data(postcode="s11 8qe")
+
+        assert context["polling_station_deferred"] is True
+        assert "polling_station" not in context
+        view_obj.get_polling_station_info.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_polling_station_rendered_when_cached(self, view_obj, mocker):
+        mocker.patch.object(
+            view_obj,
+            "postcode_to_ballots",
+            return_value=view_obj.get_ballots_queryset([]),
+        )
+        mocker.patch.object(
+            view_obj,
+            "get_cached_polling_station_info",
+            return_value={"polling_station_known": False},
+        )
+        mocker.patch.object(view_obj, "log_postcode")
+        view_obj.request.utm_data = {}
+
+        context = view_obj.get_context_data(postcode="s11 8qe")
+
+        assert "polling_station_deferred" not in context
+        assert context["polling_station"] == {"polling_station_known": False}
+
+    def test_afetch_polling_station_info(self, view_obj, mocker):
+        response = httpx.Response(
+            200,
+            json={"polling_station_known": True},
+            request=httpx.Request("GET", "https://example.com"),
+        )
+        mocker.patch("core.upstream.async_get", return_value=response)
+
+        result = async_to_sync(view_obj.afetch_polling_station_info)("S11 8QE")
+
+        assert result == {"polling_station_known": True}
+
+    def test_afetch_polling_station_info_error(self, view_obj, mocker):
+        mocker.patch(
+            "core.upstream.async_get",
+            side_effect=httpx.ConnectTimeout("timed out"),
+        )
+        record_failure = mocker.patch.object(wdiv_circuit, "record_failure")
+
+        with pytest.raises(httpx.ConnectTimeout):
+            async_to_sync(view_obj.afetch_polling_station_info)("S11 8QE")
+        record_failure.assert_called_once()
+
+    @pytest.mark.django_db
+    def test_apostcode_to_ballots_not_in_index(self, view_obj, mocker):
+        ballot = PostElectionFactory(
+            ballot_paper_id="local.sheffield.ecclesall.2021-05-06",
+        )
+        response = httpx.Response(
+            200, json={"results": [{"election_id": ballot.ballot_paper_id}]}
+        )
+        async_get = mocker.patch(
+            "core.upstream.async_get", return_value=response
+        )
+
+        ballots = async_to_sync(view_obj.apostcode_to_ballots)("S11 8QE")
+
+        assert list(ballots) == [ballot]
+        assert "postcode=S11 8QE" in async_get.call_args[0][0]
+
     @pytest.mark.django_db
     def test_multiple_london_elections_same_day(self, view_obj, mocker):
         PostElectionFactory(
@@ -484,14 +829,88 @@ class TestPostcodeViewMethods:
 
 
 class TestPostcodeiCalView:
+    def test_invalid_postcode_not_looked_up(self, mocker, client):
+        get = mocker.patch("core.upstream.get")
+        url = reverse("postcode_ical_view", kwargs={"postcode": "INVALID"})
+        response = client.get(url)
+
+        assert response.status_code == 302
+        assert response.url == "/?invalid_postcode=1&postcode=INVALID"
+        get.assert_not_called()
+
     def test_invalid_postcode_redirects(self, mocker, client):
         mocker.patch.object(
             PostcodeToPostsMixin,
             "postcode_to_ballots",
             side_effect=InvalidPostcodeError,
         )
+        mocker.patch.object(
+            PostcodeiCalView, "get_polling_station_info", return_value={}
+        )
         url = reverse("postcode_ical_view", kwargs={"postcode": "TE1 1ST"})
         response = client.get(url)
 
         assert response.status_code == 302
         assert response.url == "/?invalid_postcode=1&postcode=TE1%201ST"
+
+
+@pytest.fixture
+def async_postcode_views(settings):
+    """
+    Routes the postcode page to the async view, which is chosen when the URLs
+    are loaded
+    """
+
+    def reload_urls():
+        importlib.reload(elections.urls)
+        importlib.reload(wcivf.urls)
+        clear_url_caches()
+
+    settings.ASYNC_POSTCODE_VIEWS = True
+    reload_urls()
+    yield
+    settings.ASYNC_POSTCODE_VIEWS = False
+    reload_urls()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("async_postcode_views", "locmem_cache")
+class TestAsyncPostcodeView:
+    @pytest.fixture
+    def url(self, mocker):
+        mocker.patch.object(PostcodeView, "log_postcode")
+        mocker.patch.object(
+            PostcodeView,
+            "apostcode_to_ballots",
+            return_value=PostcodeView().get_ballots_queryset([]),
+        )
+        mocker.patch.object(PostcodeView, "postcode_to_ballots")
+        mocker.patch.object(
+            PostcodeView, "get_cached_polling_station_info", return_value={}
+        )
+        return reverse("postcode_view", kwargs={"postcode": "s11 8qe"})
+
+    def test_ballots_looked_up_asynchronously(self, url, client):
+        response = client.get(url)
+
+        assert response.status_code == 200
+        asserts.assertTemplateUsed(response, "elections/postcode_view.html")
+        PostcodeView.apostcode_to_ballots.assert_called_once_with("S11 8QE")
+        PostcodeView.postcode_to_ballots.assert_not_called()
+
+    def test_served_from_page_cache(self, url, client):
+        first = client.get(url)
+        second = client.get(url)
+
+        assert second.status_code == 200
+        assert second.content.startswith(first.content[:100])
+        PostcodeView.apostcode_to_ballots.assert_called_once()
+
+    def test_invalid_postcode_redirects(self, url, client):
+        PostcodeView.apostcode_to_ballots.side_effect = InvalidPostcodeError
+        url = reverse("postcode_view", kwargs={"postcode": "TE1 1SX"})
+
+        response = client.get(url)
+
+        assert response.status_code == 302
+        assert response.url == "/?invalid_postcode=1&postcode=TE1%201SX"
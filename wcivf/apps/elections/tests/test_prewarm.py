@@ -0,0 +1,140 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils.timezone import now
+
+from core.models import LoggedPostcode
+from elections.bundles import ballot_bundle_key
+from elections.constants import (
+    POLLING_STATIONS_KEY_FMT,
+    POSTCODE_TO_BALLOT_KEY_FMT,
+    PREWARM_HEADER,
+)
+from elections.prewarm import PostcodeCacheWarmer, RateLimiter, rank_postcodes
+from elections.tests.factories import PostElectionFactory
+
+
+@pytest.fixture
+def warmer():
+    return PostcodeCacheWarmer(ee_rate=1000, wdiv_rate=1000, workers=2)
+
+
+@pytest.mark.django_db
+def test_rank_postcodes(mocker):
+    LoggedPostcode.objects.create(postcode="S11 8QE")
+    LoggedPostcode.objects.create(postcode="s118qe")
+    LoggedPostcode.objects.create(postcode="E1 6AN")
+    mocker.patch(
+        "elections.prewarm.queued_lookups",
+        return_value=[{"postcode": "E16AN"}, {"postcode": "E16AN"}],
+    )
+
+    lookups = rank_postcodes(now() - timedelta(days=7))
+
+    assert lookups.most_common() == [("E1 6AN", 3), ("S11 8QE", 2)]
+
+
+def test_rate_limiter_spaces_out_calls(mocker):
+    sleep = mocker.patch("elections.prewarm.time.sleep")
+    limiter = RateLimiter(rate=2)
+
+    limiter.wait()
+    limiter.wait()
+
+    assert sleep.call_count == 1
+    assert sleep.call_args[0][0] == pytest.approx(0.5, abs=0.1)
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("locmem_cache")
+class TestPostcodeCacheWarmer:
+    @pytest.fixture
+    def ballot(self):
+        return PostElectionFactory(
+            ballot_paper_id="local.sheffield.ecclesall.2021-05-06"
+        )
+
+    @pytest.fixture
+    def upstream_get(self, mocker, ballot):
+        def get(url):
+            response = mocker.MagicMock(status_code=200)
+            if "wheredoivote" in url:
+                response.json.return_value = {"polling_station_known": True}
+            else:
+                response.json.return_value = {
+                    "results": [{"election_id": ballot.ballot_paper_id}]
+                }
+            return response
+
+        return mocker.patch("core.upstream.get", side_effect=get)
+
+    def test_warm(self, warmer, ballot, upstream_get):
+        stats = warmer.warm(["S11 8QE"])
+
+        assert stats == {
+            "ballots_warmed": 1,
+            "polling_stations_warmed": 1,
+            "bundles_warmed": 1,
+        }
+        assert cache.get(POSTCODE_TO_BALLOT_KEY_FMT.format("S118QE"))
+        assert cache.get(POLLING_STATIONS_KEY_FMT.format("S118QE"))["value"]
+        assert cache.get(ballot_bundle_key(ballot)) is not None
+
+    def test_already_cached(self, warmer, ballot, upstream_get):
+        warmer.warm(["S11 8QE"])
+        upstream_get.reset_mock()
+
+        stats = PostcodeCacheWarmer(1000, 1000, workers=2).warm(["S11 8QE"])
+
+        assert stats == {
+            "ballots_cached": 1,
+            "polling_stations_cached": 1,
+            "bundles_cached": 1,
+        }
+        upstream_get.assert_not_called()
+
+    def test_failures_counted(self, warmer, mocker):
+        mocker.patch(
+            "core.upstream.get", side_effect=requests.exceptions.Timeout
+        )
+        mocker.patch("elections.views.mixins.wdiv_circuit.record_failure")
+
+        stats = warmer.warm(["S11 8QE"])
+
+        assert stats == {"ballots_failed": 1, "polling_stations_failed": 1}
+
+    def test_warm_via_site(self, mocker):
+        get = mocker.patch("core.upstream.get")
+        warmer = PostcodeCacheWarmer(
+            1000, 1000, workers=2, site_url="https://example.com/"
+        )
+
+        stats = warmer.warm(["S11 8QE"])
+
+        assert stats == {"pages_warmed": 1}
+        get.assert_called_once_with(
+            "https://example.com/elections/S11%208QE/",
+            headers={PREWARM_HEADER: "1"},
+        )
+
+
+@pytest.mark.django_db
+def test_command_reports_coverage(mocker):
+    for postcode in ["S11 8QE", "S11 8QE", "S11 8QE", "E1 6AN"]:
+        LoggedPostcode.objects.create(postcode=postcode)
+    mocker.patch("elections.prewarm.queued_lookups", return_value=[])
+    warm = mocker.patch.object(
+        PostcodeCacheWarmer, "warm", return_value={"ballots_warmed": 1}
+    )
+    out = StringIO()
+
+    call_command("prewarm_postcode_caches", "--top=1", stdout=out)
+
+    warm.assert_called_once_with(["S11 8QE"])
+    assert "4 lookups of 2 postcodes" in out.getvalue()
+    assert "cover 75.0% of lookups" in out.getvalue()
+    assert "ballots_warmed: 1" in out.getvalue()
@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.urls import re_path
 
-from elections.views.postcode_view import DummyPostcodeView
+from elections.views.postcode_view import (
+    DummyPostcodeView,
+    PostcodePollingStationView,
+    postcode_view,
+)
 
 from .views import (
     PostcodeView,
@@ -43,7 +48,16 @@ urlpatterns = [
         name="dummy_postcode_view",
     ),
     re_path(
-        r"^(?P<postcode>[^/]+)/$", PostcodeView.as_view(), name="postcode_view"
+        r"^(?P<postcode>[^/]+)/$",
+        postcode_view
+        if settings.ASYNC_POSTCODE_VIEWS
+        else PostcodeView.as_view(),
+        name="postcode_view",
+    ),
+    re_path(
+        r"^(?P<postcode>[^/]+)/polling_station/$",
+        PostcodePollingStationView.as_view(),
+        name="postcode_polling_station_view",
     ),
     re_path(
         r"^(?P<postcode>[^/]+).ics$",
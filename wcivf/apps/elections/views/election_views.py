@@ -93,9 +93,12 @@ class PostView(NewSlugsRedirectMixin, PostelectionsToPeopleMixin, DetailView):
         if queryset is None:
             queryset = self.get_queryset()
 
-        queryset = queryset.filter(
-            ballot_paper_id=self.kwargs["election"]
-        ).select_related("post", "election")
+        queryset = (
+            queryset.filter(ballot_paper_id=self.kwargs["election"])
+            .select_related("post", "election")
+            .with_candidate_counts()
+            .with_next_ballot()
+        )
 
         try:
             # Get the single item from the filtered queryset
@@ -1,25 +1,54 @@
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date, datetime
 
-import requests
-from django.db.models import F, Prefetch
 from django.conf import settings
 from django.http import HttpResponseRedirect, HttpResponsePermanentRedirect
 from django.core.cache import cache
 from django.db.models import IntegerField
 from django.db.models import When, Case, Count
-from django.db.models.functions import Coalesce
 from django.urls import reverse
 
+import httpx
+from asgiref.sync import sync_to_async
+from requests.exceptions import RequestException
+
+from core import upstream
 from core.models import log_postcode
-from core.utils import LastWord
-from leaflets.models import Leaflet
-from people.models import PersonPost
-from elections.constants import UPDATED_SLUGS
+from core.postcodes import is_valid_postcode
+from core.resilience import (
+    CircuitBreaker,
+    StaleWhileRevalidateCache,
+    async_cache_call,
+)
+from core.single_flight import async_single_flight, single_flight
+from elections.bundles import (
+    ballot_bundle_key,
+    build_ballot_bundle,
+    people_from_bundle,
+)
+from elections.constants import PREWARM_HEADER, UPDATED_SLUGS
+from pollingstations.models import PostcodeLookup
 
 from elections.constants import (
+    BALLOT_BUNDLE_TTL,
     POSTCODE_TO_BALLOT_KEY_FMT,
-    PEOPLE_FOR_BALLOT_KEY_FMT,
+    POSTCODE_TO_BALLOT_TTL,
     POLLING_STATIONS_KEY_FMT,
+    POLLING_STATIONS_TTL,
+    POLLING_STATIONS_STALE_TTL,
+    POLLING_STATIONS_NEGATIVE_TTL,
+    WDIV_CIRCUIT_FAILURE_THRESHOLD,
+    WDIV_CIRCUIT_FAILURE_WINDOW,
+    WDIV_CIRCUIT_RECOVERY_TIMEOUT,
+)
+
+# Shared pool used to run upstream API calls alongside the rest of a request.
+# Anything submitted here must not use the database, as each worker thread
+# would open (and hold on to) its own connection.
+upstream_executor = ThreadPoolExecutor(
+    max_workers=settings.UPSTREAM_MAX_WORKERS,
+    thread_name_prefix="upstream",
 )
 
 
@@ -35,29 +64,26 @@ class PostcodeToPostsMixin(object):
             )
         return self.render_to_response(context)
 
-    def postcode_to_ballots(self, postcode, compact=False):
-        key = POSTCODE_TO_BALLOT_KEY_FMT.format(postcode.replace(" ", ""))
-        results_json = cache.get(key)
-        if not results_json:
-            url = "{0}/api/elections?postcode={1}&current=1".format(
-                settings.EE_BASE, postcode
-            )
-            req = requests.get(url, timeout=30.0)
-
-            # Don't cache bad postcodes
-            from ..models import InvalidPostcodeError
+    def postcode_to_ballots(self, postcode):
+        from ..models import InvalidPostcodeError
 
-            if req.status_code != 200:
-                raise InvalidPostcodeError(postcode)
+        if not is_valid_postcode(postcode):
+            raise InvalidPostcodeError(postcode)
+        all_ballots = self.postcode_to_ballot_paper_ids(postcode)
+        return self.get_ballots_queryset(all_ballots)
 
-            results_json = req.json()["results"]
-            cache.set(key, results_json)
+    async def apostcode_to_ballots(self, postcode):
+        """
+        The same as postcode_to_ballots, for async views
+        """
+        from ..models import InvalidPostcodeError
 
-        all_ballots = []
-        for election in results_json:
-            ballot_paper_id = election["election_id"]
-            all_ballots.append(ballot_paper_id)
+        if not is_valid_postcode(postcode):
+            raise InvalidPostcodeError(postcode)
+        all_ballots = await self.apostcode_to_ballot_paper_ids(postcode)
+        return self.get_ballots_queryset(all_ballots)
 
+    def get_ballots_queryset(self, all_ballots):
         from ..models import PostElection
 
         pes = PostElection.objects.filter(ballot_paper_id__in=all_ballots)
@@ -71,8 +97,9 @@ class PostcodeToPostsMixin(object):
         # majority of ballots will have 0 so do this now to help reduce
         # unnecessary DB queries later on
         pes = pes.annotate(
-            num_parish_councils=Count("parish_councils"),
+            num_parish_councils=Count("parish_councils", distinct=True),
         )
+        pes = pes.with_candidate_counts()
         pes = pes.select_related("post")
         pes = pes.select_related("election")
         pes = pes.select_related("election__voting_system")
@@ -85,65 +112,169 @@ class PostcodeToPostsMixin(object):
 
         return pes
 
+    def postcode_to_ballot_paper_ids(self, postcode):
+        """
+        Returns the IDs of the ballots for a postcode from EveryElection
+        """
+        key = POSTCODE_TO_BALLOT_KEY_FMT.format(postcode.replace(" ", ""))
+        results_json = cache.get(key)
+        if not results_json:
+            results_json = single_flight(
+                key,
+                fetch=lambda: self.fetch_postcode_elections(postcode, key),
+                check=lambda: cache.get(key),
+            )
+        return [election["election_id"] for election in results_json]
 
-class PostelectionsToPeopleMixin(object):
-    def people_for_ballot(self, postelection, compact=False):
-        key = PEOPLE_FOR_BALLOT_KEY_FMT.format(
-            postelection.ballot_paper_id, compact
-        )
-        people_for_post = cache.get(key)
-        if people_for_post:
-            return people_for_post
+    async def apostcode_to_ballot_paper_ids(self, postcode):
+        key = POSTCODE_TO_BALLOT_KEY_FMT.format(postcode.replace(" ", ""))
 
-        people_for_post = PersonPost.objects.filter(post_election=postelection)
-        people_for_post = people_for_post.annotate(
-            last_name=LastWord("person__name")
-        )
-        people_for_post = people_for_post.annotate(
-            name_for_ordering=Coalesce("person__sort_name", "last_name")
-        )
-        if postelection.election.uses_lists:
-            order_by = ["party__party_name", "list_position"]
-        else:
-            order_by = ["name_for_ordering", "person__name"]
+        async def check():
+            return await async_cache_call(cache.get, key)
 
-        people_for_post = people_for_post.order_by(
-            F("elected").desc(nulls_last=True), *order_by
-        )
-        people_for_post = people_for_post.select_related(
-            "post",
-            "election",
-            "person",
-            "party",
-        )
-        people_for_post = people_for_post.prefetch_related(
-            "previous_party_affiliations"
-        )
-        people_for_post = people_for_post.prefetch_related(
-            Prefetch(
-                "person__leaflet_set",
-                queryset=Leaflet.objects.order_by(
-                    "date_uploaded_to_electionleaflets"
-                ),
-                to_attr="ordered_leaflets",
+        results_json = await check()
+        if not results_json:
+            results_json = await async_single_flight(
+                key,
+                fetch=lambda: self.afetch_postcode_elections(postcode, key),
+                check=check,
             )
+        return [election["election_id"] for election in results_json]
+
+    def ee_postcode_url(self, postcode):
+        return "{0}/api/elections?postcode={1}&current=1".format(
+            settings.EE_BASE, postcode
         )
-        if not compact:
-            people_for_post = people_for_post.prefetch_related(
-                "person__pledges"
+
+    def fetch_postcode_elections(self, postcode, key):
+        """
+        Requests the elections for the postcode from EveryElection and
+        caches them
+        """
+        req = upstream.get(self.ee_postcode_url(postcode))
+
+        # Don't cache bad postcodes
+        from ..models import InvalidPostcodeError
+
+        if req.status_code != 200:
+            raise InvalidPostcodeError(postcode)
+
+        results_json = req.json()["results"]
+        cache.set(key, results_json, POSTCODE_TO_BALLOT_TTL)
+        return results_json
+
+    async def afetch_postcode_elections(self, postcode, key):
+        from ..models import InvalidPostcodeError
+
+        req = await upstream.async_get(self.ee_postcode_url(postcode))
+        if req.status_code != 200:
+            raise InvalidPostcodeError(postcode)
+
+        results_json = req.json()["results"]
+        await async_cache_call(
+            cache.set, key, results_json, POSTCODE_TO_BALLOT_TTL
+        )
+        return results_json
+
+
+class PostelectionsToPeopleMixin(object):
+    def people_for_ballot(self, postelection):
+        """
+        Returns the candidates for the ballot, built from a cached bundle of
+        plain data so that a warm cache means no database queries
+        """
+        key = ballot_bundle_key(postelection)
+        bundle = cache.get(key)
+        if bundle is None:
+            bundle = single_flight(
+                key,
+                fetch=lambda: self.build_and_cache_bundle(postelection, key),
+                check=lambda: cache.get(key),
             )
-        cache.set(key, people_for_post)
-        return people_for_post
+        return people_from_bundle(bundle, postelection)
+
+    def build_and_cache_bundle(self, postelection, key):
+        bundle = build_ballot_bundle(postelection)
+        cache.set(key, bundle, BALLOT_BUNDLE_TTL)
+        return bundle
+
+
+wdiv_circuit = CircuitBreaker(
+    "wdiv",
+    failure_threshold=WDIV_CIRCUIT_FAILURE_THRESHOLD,
+    failure_window=WDIV_CIRCUIT_FAILURE_WINDOW,
+    recovery_timeout=WDIV_CIRCUIT_RECOVERY_TIMEOUT,
+)
+polling_station_cache = StaleWhileRevalidateCache(
+    soft_ttl=POLLING_STATIONS_TTL,
+    hard_ttl=POLLING_STATIONS_STALE_TTL,
+    negative_ttl=POLLING_STATIONS_NEGATIVE_TTL,
+    executor=upstream_executor,
+)
 
 
 class PollingStationInfoMixin(object):
+    def get_local_polling_station_info(self, postcode):
+        """
+        Returns the polling station info for the postcode from the local copy
+        of WhereDoIVote's data, or None if it isn't enabled or doesn't have
+        the postcode
+        """
+        if not settings.LOCAL_POLLING_STATIONS:
+            return None
+        return PostcodeLookup.objects.polling_station_info(postcode)
+
     def get_polling_station_info(self, postcode):
+        """
+        Returns the WhereDoIVote data for the postcode, or an empty dict if
+        WhereDoIVote doesn't know about the postcode or isn't available
+        """
+        info = self.get_local_polling_station_info(postcode)
+        if info is not None:
+            return info
+        return self.get_wdiv_polling_station_info(postcode)
+
+    def get_wdiv_polling_station_info(self, postcode):
         key = POLLING_STATIONS_KEY_FMT.format(postcode.replace(" ", ""))
-        info = cache.get(key)
-        if info:
+        return polling_station_cache.get(
+            key,
+            lambda: self.fetch_polling_station_info(postcode),
+            default={},
+        )
+
+    def get_cached_polling_station_info(self, postcode):
+        """
+        Returns the WhereDoIVote data for the postcode if it is cached.
+        Otherwise returns None without waiting, and starts fetching it in the
+        background so that it is ready for the next request.
+        """
+        info = self.get_local_polling_station_info(postcode)
+        if info is not None:
             return info
+        key = POLLING_STATIONS_KEY_FMT.format(postcode.replace(" ", ""))
+        return polling_station_cache.get_if_cached(
+            key,
+            lambda: self.fetch_polling_station_info(postcode),
+            default={},
+        )
 
-        info = {}
+    async def aget_polling_station_info(self, postcode):
+        """
+        The same as get_polling_station_info, for async views
+        """
+        info = await sync_to_async(self.get_local_polling_station_info)(
+            postcode
+        )
+        if info is not None:
+            return info
+        key = POLLING_STATIONS_KEY_FMT.format(postcode.replace(" ", ""))
+        return await polling_station_cache.aget(
+            key,
+            lambda: self.afetch_polling_station_info(postcode),
+            default={},
+        )
+
+    def wdiv_postcode_url(self, postcode):
         base_url = settings.WDIV_BASE + settings.WDIV_API
         url = "{}/postcode/{}.json".format(
             base_url,
@@ -152,15 +283,63 @@ class PollingStationInfoMixin(object):
         token = getattr(settings, "WDIV_API_KEY", "DCINTERNAL-WHO")
         if token:
             url = f"{url}?auth_token={token}"
+        return url
+
+    def fetch_polling_station_info(self, postcode):
+        """
+        Requests the postcode from WhereDoIVote. Raises an exception if
+        WhereDoIVote fails, or it has failed too often recently
+        """
+        wdiv_circuit.check()
+
         try:
-            req = requests.get(url, timeout=30.0)
-        except:
-            return info
-        if req.status_code != 200:
-            return info
-        info.update(req.json())
-        cache.set(key, info)
-        return info
+            req = upstream.get(self.wdiv_postcode_url(postcode))
+            req.raise_for_status()
+        except RequestException as e:
+            if e.response is None or e.response.status_code >= 500:
+                wdiv_circuit.record_failure()
+                raise
+            # WhereDoIVote doesn't know about the postcode
+            return {}
+        return req.json()
+
+    async def afetch_polling_station_info(self, postcode):
+        await async_cache_call(wdiv_circuit.check)
+
+        try:
+            req = await upstream.async_get(self.wdiv_postcode_url(postcode))
+            req.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code >= 500:
+                await async_cache_call(wdiv_circuit.record_failure)
+                raise
+            return {}
+        except httpx.HTTPError:
+            await async_cache_call(wdiv_circuit.record_failure)
+            raise
+        return req.json()
+
+    def submit_polling_station_info(self, postcode) -> Future:
+        """
+        Starts looking up the polling station for the postcode in the
+        background and returns a Future for the result. This lets the caller
+        make other upstream requests (e.g. to EveryElection) at the same time,
+        so the total wait is the slower of the calls rather than their sum.
+        The lookup runs in a copy of the current context so it is included
+        in the request's timings. Postcodes in the local copy of WhereDoIVote's
+        data are looked up straight away, as the database can't be used from
+        upstream_executor.
+        """
+        info = self.get_local_polling_station_info(postcode)
+        if info is not None:
+            future = Future()
+            future.set_result(info)
+            return future
+        return upstream_executor.submit(
+            contextvars.copy_context().run,
+            self.get_wdiv_polling_station_info,
+            postcode,
+        )
 
     def show_polling_card(self, post_elections):
         for p in post_elections:
@@ -187,9 +366,17 @@ class PollingStationInfoMixin(object):
 
 
 class LogLookUpMixin(object):
+    def should_log_postcode(self):
+        """
+        Requests made to warm the caches aren't lookups by a visitor
+        """
+        return PREWARM_HEADER not in self.request.headers
+
     def log_postcode(self, postcode):
+        if not self.should_log_postcode():
+            return
         kwargs = {"postcode": postcode}
-        kwargs.update(self.request.session["utm_data"])
+        kwargs.update(self.request.utm_data)
         log_postcode(kwargs)
 
 
@@ -1,11 +1,17 @@
+from asgiref.sync import sync_to_async
 from icalendar import Calendar, Event, vText
 from django.utils import timezone
 from django.conf import settings
 from django.http import HttpResponse, HttpResponseRedirect
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
+from django.utils.safestring import mark_safe
 from django.views.generic import TemplateView, View
 
-from core.helpers import clean_postcode
+from core.postcodes import clean_postcode, is_valid_postcode
+from elections import page_cache
 from elections.dummy_models import DummyPostElection
+from feedback.forms import FeedbackForm
 from parishes.models import ParishCouncilElection
 from .mixins import (
     LogLookUpMixin,
@@ -31,7 +37,7 @@ class PostcodeView(
 
     This is really the main destination page of the whole site, so there is a
     high chance this will need to be split out in to a few mixins, and cached
-    well.
+    well. Rendered pages are cached in full, see elections.page_cache.
     """
 
     template_name = "elections/postcode_view.html"
@@ -50,6 +56,58 @@ class PostcodeView(
 
         return self.ballots
 
+    def get(self, request, *args, **kwargs):
+        self.postcode = clean_postcode(kwargs["postcode"])
+        if not is_valid_postcode(self.postcode):
+            return HttpResponseRedirect(
+                "/?invalid_postcode=1&postcode={}".format(self.postcode)
+            )
+        response = self.get_cached_response(request)
+        if response is None:
+            response = self.render_and_cache(request, *args, **kwargs)
+        return response
+
+    def get_cached_response(self, request):
+        """
+        Returns the cached page for the postcode, or None if it isn't cached
+        """
+        if not page_cache.is_cacheable(request):
+            return None
+        key = page_cache.postcode_page_key(self.postcode)
+        content = page_cache.get_cached_page(key)
+        if content is None:
+            return None
+
+        self.log_postcode(self.postcode)
+        self.log_to_postcode_logger()
+        return HttpResponse(page_cache.fill_placeholders(request, content))
+
+    def render_and_cache(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        if page_cache.is_cacheable(request) and isinstance(
+            response, TemplateResponse
+        ):
+            key = page_cache.postcode_page_key(self.postcode)
+
+            def cache_rendered_page(response):
+                page_cache.cache_page(key, response.content)
+                response.content = page_cache.fill_placeholders(
+                    request, response.content
+                )
+
+            response.add_post_render_callback(cache_rendered_page)
+        return response
+
+    def log_to_postcode_logger(self):
+        if not self.should_log_postcode():
+            return
+        entry = settings.POSTCODE_LOGGER.entry_class(
+            postcode=self.postcode,
+            dc_product=settings.POSTCODE_LOGGER.dc_product.wcivf,
+            **self.request.utm_data,
+        )
+        settings.POSTCODE_LOGGER.log(entry)
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         self.postcode = clean_postcode(kwargs["postcode"])
@@ -57,31 +115,36 @@ class PostcodeView(
 
         context["postcode"] = self.postcode
 
+        # Don't wait for WhereDoIVote if its data isn't cached, so the page
+        # can be sent straight away. The polling station panel is then loaded
+        # from PostcodePollingStationView.
+        polling_station = self.get_cached_polling_station_info(self.postcode)
+
         try:
             context["postelections"] = self.get_ballots()
-            entry = settings.POSTCODE_LOGGER.entry_class(
-                postcode=self.postcode,
-                dc_product=settings.POSTCODE_LOGGER.dc_product.wcivf,
-                **self.request.session.get("utm_data"),
-            )
-            settings.POSTCODE_LOGGER.log(entry)
+            self.log_to_postcode_logger()
         except InvalidPostcodeError as exception:
             raise exception
 
+        if page_cache.is_cacheable(self.request):
+            # rendered as placeholders, which are filled in for each request
+            context["csrf_token"] = page_cache.CSRF_TOKEN_PLACEHOLDER
+            context["feedback_form"] = FeedbackForm(
+                initial={
+                    "source_url": self.request.path,
+                    "token": page_cache.FEEDBACK_TOKEN_PLACEHOLDER,
+                }
+            )
+
         context["show_polling_card"] = self.show_polling_card(
             context["postelections"]
         )
         context["people_for_post"] = {}
-        for postelection in context["postelections"]:
-            postelection.people = self.people_for_ballot(postelection)
 
-        context["polling_station"] = self.get_polling_station_info(
-            context["postcode"]
-        )
-
-        context[
-            "advance_voting_station"
-        ] = self.get_advance_voting_station_info(context["polling_station"])
+        if polling_station is None:
+            context["polling_station_deferred"] = True
+        else:
+            context.update(self.get_polling_station_context(polling_station))
 
         context["ballots_today"] = self.get_todays_ballots()
         context[
@@ -90,9 +153,37 @@ class PostcodeView(
         context["referendums"] = list(self.get_referendums())
         context["parish_council_election"] = self.get_parish_council_election()
         context["num_ballots"] = self.num_ballots()
+        context["ballots_fragment"] = self.get_ballots_fragment(context)
 
         return context
 
+    def get_polling_station_context(self, polling_station):
+        return {
+            "polling_station": polling_station,
+            "advance_voting_station": self.get_advance_voting_station_info(
+                polling_station
+            ),
+        }
+
+    def get_ballots_fragment(self, context):
+        """
+        Returns the rendered ballots section of the page. It only depends on
+        the ballots, so is cached and shared by every postcode with the same
+        ones, and their candidates are only loaded when it isn't cached.
+        """
+        key = page_cache.ballot_set_fragment_key(context["postelections"])
+        fragment = page_cache.get_cached_fragment(key)
+        if fragment is None:
+            for postelection in context["postelections"]:
+                postelection.people = self.people_for_ballot(postelection)
+            fragment = render_to_string(
+                "elections/includes/_postcode_ballots.html",
+                context,
+                request=self.request,
+            )
+            page_cache.cache_fragment(key, fragment)
+        return mark_safe(fragment)
+
     def get_todays_ballots(self):
         """
         Return a list of ballots filtered by whether they are today
@@ -180,6 +271,72 @@ class PostcodeView(
         return num_ballots
 
 
+async def postcode_view(request, postcode):
+    """
+    PostcodeView for when the site is served with ASGI. The EveryElection
+    request is made with an async HTTP client, so the worker can handle other
+    requests while it waits for it. The page is then built by PostcodeView in
+    a thread as before, as the ORM isn't async.
+
+    Django 3.2's class-based views can't have async handlers, so this is a
+    function view.
+    """
+    view = PostcodeView()
+    view.setup(request, postcode=postcode)
+    view.postcode = clean_postcode(postcode)
+    initkwargs = {}
+    if request.method == "GET" and is_valid_postcode(view.postcode):
+        response = await sync_to_async(view.get_cached_response)(request)
+        if response is not None:
+            return response
+
+        try:
+            initkwargs["ballots"] = await view.apostcode_to_ballots(
+                view.postcode
+            )
+        except InvalidPostcodeError:
+            return HttpResponseRedirect(
+                "/?invalid_postcode=1&postcode={}".format(view.postcode)
+            )
+
+    page_view = PostcodeView.as_view(**initkwargs)
+    return await sync_to_async(page_view)(request, postcode=postcode)
+
+
+class PostcodePollingStationView(PostcodeView):
+    """
+    The polling station and registration panels of the postcode page. When
+    WhereDoIVote's data for a postcode isn't cached, PostcodeView sends the
+    rest of the page without them, and they are loaded from here instead.
+    """
+
+    template_name = "elections/includes/_polling_station_panel.html"
+
+    def get(self, request, *args, **kwargs):
+        # skip PostcodeView's page cache
+        return super(PostcodeView, self).get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        self.postcode = clean_postcode(kwargs["postcode"])
+        postelections = self.get_ballots()
+        context = {
+            "postcode": self.postcode,
+            "postelections": postelections,
+            "show_polling_card": self.show_polling_card(postelections),
+            "ballots_today": self.get_todays_ballots(),
+            "multiple_city_of_london_elections_today": (
+                self.multiple_city_of_london_elections_today()
+            ),
+            "polling_station_deferred": True,
+        }
+        context.update(
+            self.get_polling_station_context(
+                self.get_polling_station_info(self.postcode)
+            )
+        )
+        return context
+
+
 class PostcodeiCalView(
     NewSlugsRedirectMixin, PostcodeToPostsMixin, View, PollingStationInfoMixin
 ):
@@ -188,6 +345,11 @@ class PostcodeiCalView(
 
     def get(self, request, *args, **kwargs):
         postcode = kwargs["postcode"]
+        if not is_valid_postcode(postcode):
+            return HttpResponseRedirect(
+                f"/?invalid_postcode=1&postcode={postcode}"
+            )
+        polling_station = self.submit_polling_station_info(postcode)
         try:
             ballots = self.postcode_to_ballots(postcode=postcode)
         except InvalidPostcodeError:
@@ -195,7 +357,7 @@ class PostcodeiCalView(
                 f"/?invalid_postcode=1&postcode={postcode}"
             )
 
-        polling_station = self.get_polling_station_info(postcode)
+        polling_station = polling_station.result()
 
         cal = Calendar()
         cal["summary"] = "Elections in {}".format(postcode)
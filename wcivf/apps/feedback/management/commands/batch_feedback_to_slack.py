@@ -2,11 +2,10 @@ from datetime import datetime, timedelta
 import json
 import random
 
-import requests
-
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
+from core import upstream
 from feedback.models import Feedback
 
 
@@ -138,4 +137,4 @@ class Command(BaseCommand):
 
         if getattr(settings, "SLACK_FEEDBACK_WEBHOOK_URL", None):
             url = settings.SLACK_FEEDBACK_WEBHOOK_URL
-            requests.post(url, json.dumps(payload), timeout=2)
+            upstream.post(url, json.dumps(payload), timeout=2)
@@ -5,7 +5,7 @@ from django.db import transaction
 from django.utils import timezone as tz
 from django.utils.http import urlencode
 
-import requests
+from core import upstream
 
 from elections.models import PostElection
 from people.models import Person
@@ -56,7 +56,7 @@ class Command(BaseCommand):
 
             params = urlencode({"date_uploaded__gt": last_uploaded})
             url = f"{base_url}/?{params}"
-            req = requests.get(url)
+            req = upstream.get(url)
             while url:
                 if req.status_code == 200:
                     results = req.json()
@@ -69,7 +69,7 @@ class Command(BaseCommand):
             for ballot in qs:
                 url = f"{base_url}/?ballot={ballot.ballot_paper_id}"
                 while url:
-                    req = requests.get(url)
+                    req = upstream.get(url)
                     if req.status_code == 200:
                         results = req.json()
                         url = results.get("next", None)
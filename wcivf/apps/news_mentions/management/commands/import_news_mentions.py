@@ -1,10 +1,10 @@
 import csv
-import requests
 from newspaper import Article, ArticleException, Config
 
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from core import upstream
 from news_mentions.models import BallotNewsArticle
 from elections.models import PostElection
 
@@ -21,7 +21,7 @@ class Command(BaseCommand):
             "https://docs.google.com/spreadsheets/d/e/2PACX-1vTGhmOojqQ5eUr0EIwhs577kZrBJOgHB02rivqcdjst7qoNTCuLigtLb4m1JZ8KSbzGYOZfIj1-Tea-/pub?gid=730408843&single=true&output=csv",
         ]
         for url in self.urls:
-            req = requests.get(url)
+            req = upstream.get(url)
             csv_data = csv.DictReader(req.text.splitlines())
             for line in csv_data:
                 try:
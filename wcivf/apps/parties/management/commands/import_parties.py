@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
-import requests
+from core import upstream
 
 from parties.models import Party
 
@@ -11,7 +11,7 @@ class Command(BaseCommand):
 
         next_page = settings.YNR_BASE + "/api/next/parties/?page_size=200"
         while next_page:
-            req = requests.get(next_page)
+            req = upstream.get(next_page)
             results = req.json()
             self.add_people(results)
             next_page = results.get("next")
@@ -1,4 +1,4 @@
-import requests
+from core import upstream
 
 from .models import PersonPost
 
@@ -9,7 +9,7 @@ def get_wikipedia_extract(wikipedia_url):
     url = "{}{}".format(base_url, wiki_title)
 
     print(url)
-    resp = requests.get(url)
+    resp = upstream.get(url)
     if resp.status_code != 200:
         return None
     try:
@@ -4,12 +4,12 @@ Importer for all the corporate overlords
 import collections
 import csv
 import datetime
-import requests
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
+from core import upstream
 from people.models import Person, AssociatedCompany
 
 Company = collections.namedtuple(
@@ -50,7 +50,7 @@ class Command(BaseCommand):
             # this could be due to a merge.
             # See if we can get an alternative person id from YNR
             url = settings.YNR_BASE + "/api/v0.9/person_redirects/" + person_id
-            req = requests.get(url)
+            req = upstream.get(url)
             result = req.json()
 
             if "new_person_id" not in result:
@@ -124,7 +124,7 @@ class Command(BaseCommand):
 
     def get_not_associated(self, url):
         self.not_associated_companies = collections.defaultdict(set)
-        req = requests.get(url)
+        req = upstream.get(url)
         for line in req.text.splitlines():
             person_id, company_number = line.split(",")
             self.not_associated_companies[person_id].add(company_number)
@@ -142,7 +142,7 @@ class Command(BaseCommand):
 
         self.delete_all_companies()
         counter = 0
-        req = requests.get(companies_url)
+        req = upstream.get(companies_url)
         reader = csv.reader(req.text.splitlines())
         next(reader)
         for row in reader:
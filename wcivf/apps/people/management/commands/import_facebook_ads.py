@@ -1,6 +1,6 @@
-import requests
 from django.core.management.base import BaseCommand
 
+from core import upstream
 from people.models import FacebookAdvert
 
 
@@ -8,7 +8,7 @@ class Command(BaseCommand):
     def handle(self, **options):
         url = "https://candidates.democracyclub.org.uk/api/next/facebook_adverts/?page_size=200"
         while url:
-            req = requests.get(url)
+            req = upstream.get(url)
             req.raise_for_status()
             results = req.json()
             self.import_ads(results.get("results", []))
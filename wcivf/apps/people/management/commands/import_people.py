@@ -1,28 +1,34 @@
-import os
-import json
-import tempfile
-import shutil
 from datetime import timedelta
+from io import StringIO
 from urllib.parse import urlencode
 
 from dateutil.parser import parse
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
 from django.conf import settings
 
-import requests
-
 from core.helpers import show_data_on_error
+from elections.helpers import JsonPaginator
 from elections.import_helpers import YNRBallotImporter
 from parties.models import Party
 from people.models import Person
 from elections.models import PostElection
+from elections.signals import ballots_updated
 from wcivf.apps.elections.import_helpers import time_function_length
 from wcivf.apps.people.import_helpers import YNRPersonImporter
 
+SEEN_PEOPLE_TABLE = "import_people_seen"
+CLEANUP_BATCH_SIZE = 1000
+
 
 class Command(BaseCommand):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.updated_ballot_ids = set()
+
     def add_arguments(self, parser):
         parser.add_argument(
             "--recently-updated",
@@ -69,27 +75,36 @@ class Command(BaseCommand):
             importer = YNRPersonImporter(params={"last_updated": last_updated})
             for page in importer.people_to_import:
                 self.add_people(results=page)
+                self.send_ballots_updated()
 
         else:
-            self.dirpath = tempfile.mkdtemp()
-            self.download_pages()
-            self.add_to_db()
-            shutil.rmtree(self.dirpath)
+            self.add_to_db(pages=self.get_pages())
 
         self.delete_merged_people()
         self.delete_orphaned_people()
+        self.send_ballots_updated()
+
+    def send_ballots_updated(self):
+        """
+        Tell anything caching ballot data which ballots the people we've
+        changed are standing on. This is sent after each page, so the IDs
+        are never all held in memory.
+        """
+        if not self.updated_ballot_ids:
+            return
+        ballots_updated.send(
+            sender=self.__class__, ballot_paper_ids=self.updated_ballot_ids
+        )
+        self.updated_ballot_ids = set()
 
-    def add_to_db(self):
-        self.existing_people = set(Person.objects.values_list("pk", flat=True))
-        self.seen_people = set()
+    def add_to_db(self, pages):
+        self.create_seen_people_table()
 
-        files = [f for f in os.listdir(self.dirpath) if f.endswith(".json")]
-        files = sorted(files, key=lambda k: int(k.split("-")[-1].split(".")[0]))
-        for file in files:
-            self.stdout.write("Importing {}".format(file))
-            with open(os.path.join(self.dirpath, file), "r") as f:
-                results = json.loads(f.read())
-                self.add_people(results)
+        for page in pages:
+            self.seen_people = []
+            self.add_people(page)
+            self.copy_seen_people()
+            self.send_ballots_updated()
 
         should_clean_up = not any(
             [
@@ -98,55 +113,116 @@ class Command(BaseCommand):
             ]
         )
         if should_clean_up:
-            deleted_ids = self.existing_people.difference(self.seen_people)
-            Person.objects.filter(ynr_id__in=deleted_ids).delete()
+            self.delete_unseen_people()
 
-    def save_page(self, url, page):
-        # get the file name from the page number
-        if "cached-api" in url:
-            filename = url.split("/")[-1]
-        else:
-            if "page=" in url:
-                page_number = url.split("page=")[1].split("&")[0]
+    def create_seen_people_table(self):
+        """
+        The IDs of the people seen in the import are staged in a temporary
+        table, so they are never all held in memory. It lasts until the
+        database connection is closed.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                CREATE TEMPORARY TABLE IF NOT EXISTS {SEEN_PEOPLE_TABLE}
+                (ynr_id integer NOT NULL)
+                """
+            )
+            cursor.execute(f"TRUNCATE {SEEN_PEOPLE_TABLE}")
 
-            else:
-                page_number = 1
-            filename = "page-{}.json".format(page_number)
-        file_path = os.path.join(self.dirpath, filename)
+    def copy_seen_people(self):
+        if not self.seen_people:
+            return
+        rows = StringIO("".join(f"{pk}\n" for pk in self.seen_people))
+        with connection.cursor() as cursor:
+            cursor.copy_from(rows, SEEN_PEOPLE_TABLE, columns=["ynr_id"])
 
-        # Save the page
-        with open(file_path, "w") as f:
-            f.write(page)
+    @time_function_length
+    def delete_unseen_people(self):
+        """
+        Delete everyone who wasn't in the import with a candidacy
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                CREATE INDEX IF NOT EXISTS {SEEN_PEOPLE_TABLE}_ynr_id
+                ON {SEEN_PEOPLE_TABLE} (ynr_id)
+                """
+            )
+            cursor.execute(f"ANALYZE {SEEN_PEOPLE_TABLE}")
+        person_table = Person._meta.db_table
+        unseen = Person.objects.filter(
+            RawSQL(
+                f"""
+                NOT EXISTS (
+                    SELECT 1 FROM {SEEN_PEOPLE_TABLE}
+                    WHERE {SEEN_PEOPLE_TABLE}.ynr_id = {person_table}.ynr_id
+                )
+                """,
+                [],
+                output_field=BooleanField(),
+            )
+        )
+        count = self.delete_people_in_batches(unseen)
+        self.stdout.write(f"Deleted {count} people not in the import")
 
-    def download_pages(self):
+    def delete_people_in_batches(self, people):
+        """
+        Deletes the people in the queryset CLEANUP_BATCH_SIZE at a time, so
+        neither their IDs or the related objects that Django collects to
+        cascade the delete are all held in memory at once. Returns the
+        number of people deleted.
+        """
+        count = 0
+        last_pk = None
+        people = people.order_by("pk").values_list("pk", flat=True)
+        while True:
+            batch = people
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            batch = list(batch[:CLEANUP_BATCH_SIZE])
+            if not batch:
+                return count
+            _, deleted_dict = Person.objects.filter(pk__in=batch).delete()
+            count += deleted_dict.get("people.Person", 0)
+            last_pk = batch[-1]
+
+    @property
+    def import_url(self):
         params = {"page_size": "200"}
         if self.options["recently_updated"] or self.options["since"]:
             params["last_updated"] = self.past_time_str
 
-            next_page = settings.YNR_BASE + "/api/next/people/?{}".format(
+            return settings.YNR_BASE + "/api/next/people/?{}".format(
                 urlencode(params)
             )
-        else:
-            next_page = (
-                settings.YNR_BASE
-                + "/media/cached-api/latest/people-000001.json"
-            )
+        return settings.YNR_BASE + "/media/cached-api/latest/people-000001.json"
 
-        while next_page:
-            self.stdout.write("Downloading {}".format(next_page))
-            req = requests.get(next_page)
-            req.raise_for_status()
-            page = req.text
-            results = req.json()
-            self.save_page(next_page, page)
-            next_page = results.get("next")
+    def get_pages(self):
+        """
+        Pages are downloaded on a background thread while the previous page
+        is added to the database, holding at most IMPORT_PREFETCH_PAGES
+        in memory
+        """
+        return JsonPaginator(
+            page1=self.import_url,
+            stdout=self.stdout,
+            prefetch=settings.IMPORT_PREFETCH_PAGES,
+        )
 
     @time_function_length
     @transaction.atomic
     def add_people(self, results):
         for person in results["results"]:
             with show_data_on_error("Person {}".format(person["id"]), person):
-                person_obj = Person.objects.update_or_create_from_ynr(person)
+                person_obj, changed = Person.objects.update_or_create_from_ynr(
+                    person
+                )
+                if changed:
+                    self.updated_ballot_ids.update(
+                        candidacy["ballot"]["ballot_paper_id"]
+                        for candidacy in person["candidacies"]
+                    )
 
                 if self.options["recently_updated"]:
                     self.delete_old_candidacies(
@@ -161,7 +237,7 @@ class Command(BaseCommand):
                     continue
 
                 if person["candidacies"]:
-                    self.seen_people.add(person_obj.pk)
+                    self.seen_people.append(person_obj.pk)
 
     def delete_old_candidacies(self, person_data, person_obj):
         """
@@ -171,9 +247,15 @@ class Command(BaseCommand):
             c["ballot"]["ballot_paper_id"] for c in person_data["candidacies"]
         ]
 
-        count, _ = person_obj.personpost_set.exclude(
+        old_candidacies = person_obj.personpost_set.exclude(
             post_election__ballot_paper_id__in=ballot_paper_ids
-        ).delete()
+        )
+        self.updated_ballot_ids.update(
+            old_candidacies.values_list(
+                "post_election__ballot_paper_id", flat=True
+            )
+        )
+        count, _ = old_candidacies.delete()
         self.stdout.write(f"Deleted {count} candidacies for {person_obj.name}")
 
     def update_candidacies(self, person_data, person_obj):
@@ -230,6 +312,9 @@ class Command(BaseCommand):
                     continue
                 personpost.previous_party_affiliations.add(party)
 
+            if created:
+                self.updated_ballot_ids.add(ballot_paper_id)
+
             msg = f"{personpost} was {'created' if created else 'updated'}"
             self.stdout.write(msg=msg)
 
@@ -244,22 +329,21 @@ class Command(BaseCommand):
                 self.past_time_str
             )
         )
-        merged_ids = []
-        while url:
-            req = requests.get(url)
-            page = req.json()
-            for result in page["results"]:
-                merged_ids.append(result["old_person_id"])
-            url = page.get("next")
-        Person.objects.filter(ynr_id__in=merged_ids).delete()
+        count = 0
+        for page in JsonPaginator(page1=url, stdout=self.stdout):
+            merged_ids = [result["old_person_id"] for result in page["results"]]
+            _, deleted_dict = Person.objects.filter(
+                ynr_id__in=merged_ids
+            ).delete()
+            count += deleted_dict.get("people.Person", 0)
+        self.stdout.write(f"Deleted {count} merged People objects")
 
     @time_function_length
     def delete_orphaned_people(self):
         """
         Delete all people without candidacies
         """
-        _, deleted_dict = Person.objects.filter(
-            personpost__isnull=True
-        ).delete()
-        count = deleted_dict.get("people.Person", 0)
+        count = self.delete_people_in_batches(
+            Person.objects.filter(personpost__isnull=True)
+        )
         self.stdout.write(f"Deleted {count} orphaned People objects")
@@ -1,4 +1,3 @@
-import requests
 from django.conf import settings
 
 from django.db import models
@@ -6,6 +5,8 @@ from django.db.models import Count
 from django.utils.dateparse import parse_datetime
 from django.utils.timezone import now
 
+from core import upstream
+
 VALUE_TYPES_TO_IMPORT = [
     "twitter_username",
     "facebook_page_url",
@@ -92,7 +93,11 @@ class PersonPostManager(models.Manager):
 
 class PersonManager(models.Manager):
     def update_or_create_from_ynr(self, person):
-
+        """
+        Updates or creates the Person from YNR data. Returns the person, and
+        whether they are new or have been edited in YNR since we last saw
+        them.
+        """
         last_updated = parse_datetime(person["last_updated"])
 
         sort_name = person.get("sort_name")
@@ -131,16 +136,22 @@ class PersonManager(models.Manager):
             defaults["photo_url"] = person["thumbnail"]
 
         person_id = person["id"]
-        person_obj, _ = self.update_or_create(
-            ynr_id=person_id, defaults=defaults
-        )
-        return person_obj
+        try:
+            person_obj = self.get(ynr_id=person_id)
+        except self.model.DoesNotExist:
+            return self.create(ynr_id=person_id, **defaults), True
+
+        changed = person_obj.last_updated != last_updated
+        for field, value in defaults.items():
+            setattr(person_obj, field, value)
+        person_obj.save()
+        return person_obj, changed
 
     def get_by_pk_or_redirect_from_ynr(self, pk):
         try:
             return self.get(pk=pk)
         except self.model.DoesNotExist:
-            req = requests.get(
+            req = upstream.get(
                 "{}/api/next/person_redirects/{}/".format(settings.YNR_BASE, pk)
             )
             if req.status_code == 200:
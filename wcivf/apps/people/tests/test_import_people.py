@@ -4,6 +4,8 @@ from elections.models import PostElection
 from parties.models import Party
 from people.management.commands.import_people import Command
 from people.models import Person, PersonPost
+from elections.tests.factories import PostElectionFactory
+from people.tests.factories import PersonFactory, PersonPostFactory
 
 
 class TestUpdateCandidacies:
@@ -125,6 +127,10 @@ class TestUpdateCandidacies:
             mock_party
         )
         Party.objects.get.assert_called_once_with(party_id="ynmp-party:2")
+        assert command.updated_ballot_ids == {
+            "parl.romsey-and-southampton-north.2010-05-06",
+            "local.cardiff.gabalfa.2022-05-05",
+        }
 
     def test_delete_old_candidacies(self, person_data, mocker):
         person_obj = mocker.MagicMock(spec=Person)
@@ -143,3 +149,143 @@ class TestUpdateCandidacies:
             ]
         )
         delete.assert_called_once()
+
+    def test_delete_old_candidacies_records_ballots(self, person_data, mocker):
+        person_obj = mocker.MagicMock(spec=Person)
+        old_candidacies = person_obj.personpost_set.exclude.return_value
+        old_candidacies.values_list.return_value = ["local.old.2021-05-06"]
+        old_candidacies.delete.return_value = (1, {})
+
+        command = Command()
+        command.delete_old_candidacies(
+            person_data=person_data, person_obj=person_obj
+        )
+
+        assert command.updated_ballot_ids == {"local.old.2021-05-06"}
+
+
+class TestImportAllPeople:
+    @pytest.fixture
+    def command(self):
+        command = Command()
+        command.options = {"recently_updated": False, "since": None}
+        command.past_time_str = "2022-01-01 00:00:00"
+        return command
+
+    def test_import_url(self, command, settings):
+        settings.YNR_BASE = "https://ynr.example.com"
+
+        assert command.import_url == (
+            "https://ynr.example.com/media/cached-api/latest/people-000001.json"
+        )
+
+        command.options["since"] = "2022-01-01"
+        assert command.import_url == (
+            "https://ynr.example.com/api/next/people/"
+            "?page_size=200&last_updated=2022-01-01+00%3A00%3A00"
+        )
+
+    def test_get_pages_prefetches(self, command, settings):
+        settings.IMPORT_PREFETCH_PAGES = 3
+
+        pages = command.get_pages()
+
+        assert pages.next_page == command.import_url
+        assert pages.prefetch == 3
+
+    @pytest.mark.django_db
+    def test_add_to_db_adds_each_page(self, command, mocker):
+        mocker.patch.object(command, "add_people")
+        pages = [{"results": [1]}, {"results": [2]}]
+
+        command.add_to_db(pages=iter(pages))
+
+        assert command.add_people.call_args_list == [
+            mocker.call(pages[0]),
+            mocker.call(pages[1]),
+        ]
+
+    @pytest.mark.django_db
+    def test_add_to_db_deletes_unseen_people(self, command, mocker):
+        seen = PersonFactory()
+        unseen = PersonFactory()
+
+        def add_people(page):
+            command.seen_people.extend(page["results"])
+
+        mocker.patch.object(command, "add_people", side_effect=add_people)
+        mocker.patch(
+            "people.management.commands.import_people.CLEANUP_BATCH_SIZE", 1
+        )
+
+        command.add_to_db(pages=iter([{"results": [seen.pk]}, {"results": []}]))
+
+        assert list(Person.objects.values_list("pk", flat=True)) == [seen.pk]
+        assert not Person.objects.filter(pk=unseen.pk).exists()
+
+    @pytest.mark.django_db
+    def test_add_people_records_ballots_for_changed_people(self, command):
+        person = {
+            "id": 1,
+            "name": "Joe Bloggs",
+            "email": None,
+            "gender": None,
+            "birth_date": None,
+            "death_date": None,
+            "identifiers": [],
+            "statement_to_voters": "",
+            "favourite_biscuit": None,
+            "last_updated": "2022-01-01T00:00:00+00:00",
+            "candidacies": [
+                {"ballot": {"ballot_paper_id": "local.fulwood.2022-05-05"}}
+            ],
+        }
+        command.seen_people = []
+
+        command.add_people({"results": [person]})
+        assert command.updated_ballot_ids == {"local.fulwood.2022-05-05"}
+
+        command.updated_ballot_ids = set()
+        command.add_people({"results": [person]})
+        assert command.updated_ballot_ids == set()
+
+        person["last_updated"] = "2022-01-02T00:00:00+00:00"
+        command.add_people({"results": [person]})
+        assert command.updated_ballot_ids == {"local.fulwood.2022-05-05"}
+
+    @pytest.mark.django_db
+    def test_add_to_db_sends_ballots_updated_per_page(self, command, mocker):
+        send = mocker.patch(
+            "people.management.commands.import_people.ballots_updated.send"
+        )
+
+        def add_people(page):
+            command.updated_ballot_ids.update(page["results"])
+
+        mocker.patch.object(command, "add_people", side_effect=add_people)
+        mocker.patch.object(command, "delete_unseen_people")
+
+        command.add_to_db(pages=iter([{"results": ["a"]}, {"results": ["b"]}]))
+
+        assert send.call_args_list == [
+            mocker.call(sender=Command, ballot_paper_ids={"a"}),
+            mocker.call(sender=Command, ballot_paper_ids={"b"}),
+        ]
+
+    @pytest.mark.django_db
+    def test_delete_orphaned_people(self, command, mocker):
+        mocker.patch(
+            "people.management.commands.import_people.CLEANUP_BATCH_SIZE", 2
+        )
+        orphans = PersonFactory.create_batch(5)
+        ballot = PostElectionFactory()
+        candidate = PersonPostFactory(
+            post_election=ballot, election=ballot.election, post=ballot.post
+        ).person
+
+        command.delete_orphaned_people()
+
+        assert list(Person.objects.all()) == [candidate]
+        assert not Person.objects.filter(
+            pk__in=[orphan.pk for orphan in orphans]
+        ).exists()
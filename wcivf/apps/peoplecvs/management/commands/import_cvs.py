@@ -4,7 +4,7 @@ from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone as tz
 
-import requests
+from core import upstream
 
 from people.models import Person
 from peoplecvs.models import CV
@@ -14,7 +14,7 @@ class Command(BaseCommand):
     @transaction.atomic
     def handle(self, **options):
         url = "http://cv.democracyclub.org.uk/cvs.json"
-        req = requests.get(url)
+        req = upstream.get(url)
         results = req.json()
         self.add_cvs(results)
 
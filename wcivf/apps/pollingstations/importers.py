@@ -0,0 +1,145 @@
+import json
+import os
+import sys
+
+from django.db import transaction
+
+from core.mixins import ReadFromFileMixin, ReadFromUrlMixin
+from pollingstations.models import (
+    AdvanceVotingStation,
+    Council,
+    PollingStation,
+    PostcodeLookup,
+)
+
+
+class PollingStationsImporter(ReadFromUrlMixin, ReadFromFileMixin):
+    """
+    Replaces the local copy of WhereDoIVote's data with an export made up of
+    these CSVs, read from a URL or a local directory:
+
+    councils.csv: council_id, name, details (the council's JSON as it
+        appears in WhereDoIVote's API)
+    polling_stations.csv: council_id, station_id, address, postcode,
+        latitude, longitude
+    advance_voting_stations.csv: the polling_stations.csv columns, plus name
+        and opening_times (a JSON list of [date, opening time, closing time])
+    postcodes.csv: postcode, council_id, station_id,
+        advance_voting_station_id, addresses (a JSON list of the addresses in
+        a postcode that is split between polling stations)
+    """
+
+    BATCH_SIZE = 5000
+
+    def __init__(self, url=None, directory=None, stdout=sys.stdout):
+        self.url = url
+        self.directory = directory
+        self.stdout = stdout
+
+    def read(self, filename):
+        if self.directory:
+            return self.read_from_file(os.path.join(self.directory, filename))
+        return self.read_from_url(
+            "{}/{}".format(self.url.rstrip("/"), filename)
+        )
+
+    def import_dataset(self):
+        # lookups keep using the old data until the new data is complete
+        with transaction.atomic():
+            PostcodeLookup.objects.all().delete()
+            PollingStation.objects.all().delete()
+            AdvanceVotingStation.objects.all().delete()
+            Council.objects.all().delete()
+
+            councils = self.import_councils(self.read("councils.csv"))
+            polling_stations = self.import_stations(
+                PollingStation, self.read("polling_stations.csv")
+            )
+            advance_voting_stations = self.import_stations(
+                AdvanceVotingStation, self.read("advance_voting_stations.csv")
+            )
+            postcodes = self.import_postcodes(
+                self.read("postcodes.csv"),
+                polling_stations,
+                advance_voting_stations,
+            )
+
+        self.stdout.write(
+            f"Imported {councils} councils, {len(polling_stations)} polling "
+            f"stations, {len(advance_voting_stations)} advance voting "
+            f"stations and {postcodes} postcodes\n"
+        )
+        return postcodes
+
+    def import_councils(self, rows):
+        councils = [
+            Council(
+                council_id=row["council_id"],
+                name=row["name"],
+                details=json.loads(row["details"] or "{}"),
+            )
+            for row in rows
+        ]
+        Council.objects.bulk_create(councils, batch_size=self.BATCH_SIZE)
+        return len(councils)
+
+    def clean_coordinate(self, value):
+        return float(value) if value else None
+
+    def import_stations(self, model, rows):
+        """
+        Creates a station for each row, and returns a dict of their primary
+        keys by council_id and station_id
+        """
+        stations = []
+        for row in rows:
+            station = model(
+                council_id=row["council_id"],
+                station_id=row["station_id"],
+                address=row["address"],
+                postcode=row["postcode"],
+                latitude=self.clean_coordinate(row["latitude"]),
+                longitude=self.clean_coordinate(row["longitude"]),
+            )
+            if model is AdvanceVotingStation:
+                station.name = row["name"]
+                station.opening_times = json.loads(row["opening_times"] or "[]")
+            stations.append(station)
+        model.objects.bulk_create(stations, batch_size=self.BATCH_SIZE)
+        return {
+            (station.council_id, station.station_id): station.pk
+            for station in stations
+        }
+
+    def import_postcodes(self, rows, polling_stations, advance_voting_stations):
+        """
+        Creates a PostcodeLookup for each row, and returns how many were
+        created. Rows for a postcode that has already been imported are
+        skipped, so they are counted from the table rather than the rows.
+        """
+        existing = PostcodeLookup.objects.count()
+        batch = []
+        for row in rows:
+            council_id = row["council_id"]
+            batch.append(
+                PostcodeLookup(
+                    postcode=row["postcode"].replace(" ", "").upper(),
+                    council_id=council_id,
+                    polling_station_id=polling_stations.get(
+                        (council_id, row["station_id"])
+                    ),
+                    advance_voting_station_id=advance_voting_stations.get(
+                        (council_id, row["advance_voting_station_id"])
+                    ),
+                    addresses=json.loads(row["addresses"] or "[]"),
+                )
+            )
+            if len(batch) >= self.BATCH_SIZE:
+                self.save_batch(batch)
+                batch = []
+
+        self.save_batch(batch)
+        return PostcodeLookup.objects.count() - existing
+
+    def save_batch(self, batch):
+        PostcodeLookup.objects.bulk_create(batch, ignore_conflicts=True)
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pollingstations.importers import PollingStationsImporter
+
+
+class Command(BaseCommand):
+    help = """
+    Replaces the local copy of WhereDoIVote's polling stations with an
+    export, so polling station lookups don't need a request to WhereDoIVote
+    """
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            "--url",
+            action="store",
+            default=settings.POLLING_STATIONS_EXPORT_URL,
+            help="Base URL of the export's CSVs",
+        )
+        group.add_argument(
+            "--directory",
+            action="store",
+            help="Path to a local directory containing the export's CSVs",
+        )
+
+    def handle(self, **options):
+        if not options["url"] and not options["directory"]:
+            raise CommandError(
+                "Set POLLING_STATIONS_EXPORT_URL or pass --url or --directory"
+            )
+        importer = PollingStationsImporter(
+            url=options["url"],
+            directory=options["directory"],
+            stdout=self.stdout,
+        )
+        importer.import_dataset()
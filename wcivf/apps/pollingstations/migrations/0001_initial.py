@@ -0,0 +1,122 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="Council",
+            fields=[
+                (
+                    "council_id",
+                    models.CharField(
+                        max_length=100, primary_key=True, serialize=False
+                    ),
+                ),
+                ("name", models.CharField(max_length=255)),
+                ("details", models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PollingStation",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("station_id", models.CharField(max_length=255)),
+                ("address", models.TextField()),
+                ("postcode", models.CharField(blank=True, max_length=10)),
+                ("latitude", models.FloatField(null=True)),
+                ("longitude", models.FloatField(null=True)),
+                (
+                    "council",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="pollingstations.council",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "unique_together": {("council", "station_id")},
+            },
+        ),
+        migrations.CreateModel(
+            name="AdvanceVotingStation",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("station_id", models.CharField(max_length=255)),
+                ("address", models.TextField()),
+                ("postcode", models.CharField(blank=True, max_length=10)),
+                ("latitude", models.FloatField(null=True)),
+                ("longitude", models.FloatField(null=True)),
+                ("name", models.CharField(max_length=255)),
+                ("opening_times", models.JSONField(default=list)),
+                (
+                    "council",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="pollingstations.council",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+                "unique_together": {("council", "station_id")},
+            },
+        ),
+        migrations.CreateModel(
+            name="PostcodeLookup",
+            fields=[
+                (
+                    "postcode",
+                    models.CharField(
+                        max_length=10, primary_key=True, serialize=False
+                    ),
+                ),
+                ("addresses", models.JSONField(default=list)),
+                (
+                    "advance_voting_station",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="pollingstations.advancevotingstation",
+                    ),
+                ),
+                (
+                    "council",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="pollingstations.council",
+                    ),
+                ),
+                (
+                    "polling_station",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="pollingstations.pollingstation",
+                    ),
+                ),
+            ],
+        ),
+    ]
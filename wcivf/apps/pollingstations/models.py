@@ -0,0 +1,134 @@
+from django.db import models
+from django.db.models import JSONField
+
+
+class Council(models.Model):
+    council_id = models.CharField(primary_key=True, max_length=100)
+    name = models.CharField(max_length=255)
+    # The council as it appears in WhereDoIVote's API responses, including
+    # its contact details
+    details = JSONField(default=dict)
+
+    def __str__(self):
+        return self.name
+
+
+class Station(models.Model):
+    council = models.ForeignKey(Council, on_delete=models.CASCADE)
+    station_id = models.CharField(max_length=255)
+    address = models.TextField()
+    postcode = models.CharField(max_length=10, blank=True)
+    latitude = models.FloatField(null=True)
+    longitude = models.FloatField(null=True)
+
+    class Meta:
+        abstract = True
+        unique_together = ("council", "station_id")
+
+    def geometry(self):
+        if self.latitude is None or self.longitude is None:
+            return None
+        return {
+            "type": "Point",
+            "coordinates": [self.longitude, self.latitude],
+        }
+
+
+class PollingStation(Station):
+    class Meta(Station.Meta):
+        pass
+
+    def __str__(self):
+        return self.address
+
+    def as_api_response(self):
+        return {
+            "geometry": self.geometry(),
+            "properties": {
+                "address": self.address,
+                "postcode": self.postcode,
+            },
+        }
+
+
+class AdvanceVotingStation(Station):
+    name = models.CharField(max_length=255)
+    # A list of [date, opening time, closing time]
+    opening_times = JSONField(default=list)
+
+    class Meta(Station.Meta):
+        pass
+
+    def __str__(self):
+        return self.name
+
+    def as_api_response(self):
+        return {
+            "name": self.name,
+            "address": self.address,
+            "postcode": self.postcode,
+            "location": self.geometry(),
+            "opening_times": self.opening_times,
+        }
+
+
+class PostcodeLookupManager(models.Manager):
+    def polling_station_info(self, postcode):
+        """
+        Returns the polling station info for the postcode in the same format
+        as WhereDoIVote's API, or None if the postcode isn't in the dataset
+        """
+        postcode = postcode.replace(" ", "").upper()
+        lookups = self.select_related(
+            "council", "polling_station", "advance_voting_station"
+        )
+        try:
+            return lookups.get(postcode=postcode).as_api_response()
+        except self.model.DoesNotExist:
+            return None
+
+
+class PostcodeLookup(models.Model):
+    """
+    The polling station for each postcode, from a WhereDoIVote export.
+    Postcodes are stored in upper case without spaces. Where a postcode is
+    split between polling stations, polling_station is empty and the
+    addresses in it are listed instead.
+    """
+
+    postcode = models.CharField(primary_key=True, max_length=10)
+    council = models.ForeignKey(Council, on_delete=models.CASCADE)
+    polling_station = models.ForeignKey(
+        PollingStation, null=True, on_delete=models.SET_NULL
+    )
+    advance_voting_station = models.ForeignKey(
+        AdvanceVotingStation, null=True, on_delete=models.SET_NULL
+    )
+    addresses = JSONField(default=list)
+
+    objects = PostcodeLookupManager()
+
+    def __str__(self):
+        return self.postcode
+
+    def as_api_response(self):
+        """
+        Returns the lookup in the same format as WhereDoIVote's postcode API,
+        so it can be used in its place
+        """
+        polling_station = None
+        if self.polling_station:
+            polling_station = self.polling_station.as_api_response()
+        advance_voting_station = None
+        if self.advance_voting_station:
+            advance_voting_station = (
+                self.advance_voting_station.as_api_response()
+            )
+        return {
+            "polling_station_known": polling_station is not None,
+            "polling_station": polling_station,
+            "advance_voting_station": advance_voting_station,
+            "addresses": self.addresses,
+            "council": self.council.details,
+            "custom_finder": None,
+        }
@@ -0,0 +1,123 @@
+import csv
+import json
+
+import pytest
+
+from pollingstations.importers import PollingStationsImporter
+from pollingstations.models import PostcodeLookup
+
+COUNCIL = {
+    "council_id": "SHF",
+    "name": "Sheffield City Council",
+    "phone": "0114 273 4567",
+}
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    write_csv(
+        tmp_path / "councils.csv",
+        [
+            {
+                "council_id": "SHF",
+                "name": "Sheffield City Council",
+                "details": json.dumps(COUNCIL),
+            }
+        ],
+    )
+    station = {
+        "council_id": "SHF",
+        "station_id": "1",
+        "address": "St Andrew's Church Hall",
+        "postcode": "S11 8QE",
+        "latitude": "53.36",
+        "longitude": "-1.50",
+    }
+    write_csv(tmp_path / "polling_stations.csv", [station])
+    write_csv(
+        tmp_path / "advance_voting_stations.csv",
+        [
+            dict(
+                station,
+                name="Town Hall",
+                opening_times=json.dumps(
+                    [["2021-05-01", "10:00:00", "16:00:00"]]
+                ),
+            )
+        ],
+    )
+    write_csv(
+        tmp_path / "postcodes.csv",
+        [
+            {
+                "postcode": "s11 8qe",
+                "council_id": "SHF",
+                "station_id": "1",
+                "advance_voting_station_id": "1",
+                "addresses": "",
+            },
+            {
+                "postcode": "S11 8QF",
+                "council_id": "SHF",
+                "station_id": "",
+                "advance_voting_station_id": "",
+                "addresses": json.dumps([{"address": "1 High Street"}]),
+            },
+        ],
+    )
+    return tmp_path
+
+
+@pytest.mark.django_db
+class TestPollingStationsImporter:
+    def test_import_dataset(self, export_dir):
+        importer = PollingStationsImporter(directory=export_dir)
+
+        assert importer.import_dataset() == 2
+
+        info = PostcodeLookup.objects.polling_station_info("S11 8QE")
+        assert info["polling_station_known"] is True
+        assert info["polling_station"] == {
+            "geometry": {"type": "Point", "coordinates": [-1.5, 53.36]},
+            "properties": {
+                "address": "St Andrew's Church Hall",
+                "postcode": "S11 8QE",
+            },
+        }
+        assert info["advance_voting_station"]["name"] == "Town Hall"
+        assert info["advance_voting_station"]["opening_times"] == [
+            ["2021-05-01", "10:00:00", "16:00:00"]
+        ]
+        assert info["council"] == COUNCIL
+
+    def test_split_postcode(self, export_dir):
+        PollingStationsImporter(directory=export_dir).import_dataset()
+
+        info = PostcodeLookup.objects.polling_station_info("S118QF")
+        assert info["polling_station_known"] is False
+        assert info["addresses"] == [{"address": "1 High Street"}]
+        assert info["advance_voting_station"] is None
+
+    def test_reimport_replaces_dataset(self, export_dir):
+        PollingStationsImporter(directory=export_dir).import_dataset()
+        PollingStationsImporter(directory=export_dir).import_dataset()
+
+        assert PostcodeLookup.objects.count() == 2
+
+    def test_duplicate_postcodes_not_counted(self, export_dir):
+        with open(export_dir / "postcodes.csv", "a", newline="") as fh:
+            fh.write("S118QF,SHF,1,1,\n")
+        importer = PollingStationsImporter(directory=export_dir)
+
+        assert importer.import_dataset() == 2
+        assert PostcodeLookup.objects.count() == 2
+
+    def test_unknown_postcode(self):
+        assert PostcodeLookup.objects.polling_station_info("E1 6AN") is None
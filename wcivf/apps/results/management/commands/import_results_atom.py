@@ -1,12 +1,13 @@
 import feedparser
-import requests
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
 
+from core import upstream
 from core.helpers import show_data_on_error
 from people.models import PersonPost
 from elections.models import PostElection
+from elections.signals import ballots_updated
 from results.models import ResultEvent
 
 
@@ -15,8 +16,9 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         feed_url = "{}/results/all.atom".format(settings.YNR_BASE)
-        req = requests.get(feed_url)
+        req = upstream.get(feed_url)
         feed = feedparser.parse(req.text)
+        updated_ballot_ids = set()
         for entry in feed["entries"]:
             with show_data_on_error("Result", entry):
                 post_election = PostElection.objects.get(
@@ -43,3 +45,9 @@ class Command(BaseCommand):
                     result_event.person_posts.add(person_post)
                 person_post.save()
                 result_event.save()
+                updated_ballot_ids.add(post_election.ballot_paper_id)
+
+        if updated_ballot_ids:
+            ballots_updated.send(
+                sender=self.__class__, ballot_paper_ids=updated_ballot_ids
+            )
@@ -0,0 +1,25 @@
+"""
+ASGI config for wcivf project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Set ASYNC_POSTCODE_VIEWS=True to serve the postcode page and API with async
+views, and run it with uvicorn workers:
+
+    gunicorn -k uvicorn.workers.UvicornWorker wcivf.asgi:application
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+import dotenv
+
+from django.core.asgi import get_asgi_application
+
+dotenv.read_dotenv(
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
+)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wcivf.settings")
+
+application = get_asgi_application()
@@ -1,6 +1,7 @@
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 import os
 import sys
+from urllib.parse import urlparse
 
 from dc_utils.settings.pipeline import *  # noqa
 from dc_utils.settings.pipeline import get_pipeline_settings
@@ -70,9 +71,11 @@ INSTALLED_APPS = (
     "dc_design_system",
     "referendums",
     "parishes",
+    "pollingstations",
 )
 
 MIDDLEWARE = (
+    "core.middleware.HotPathTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -195,7 +198,7 @@ CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": "redis://127.0.0.1:6379/1",
-        "OPTIONS": {"CLIENT_CLASS": "django_redis.client.DefaultClient"},
+        "OPTIONS": {"CLIENT_CLASS": "core.cache.TimedRedisClient"},
     }
 }
 SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
@@ -208,6 +211,51 @@ EE_BASE = os.environ.get("EE_BASE", "https://elections.democracyclub.org.uk")
 WDIV_BASE = "http://wheredoivote.co.uk"
 WDIV_API = "/api/beta"
 
+# Number of threads available for making upstream API requests in the
+# background while a view does other work
+UPSTREAM_MAX_WORKERS = 10
+# Connections each process can have open for async views' upstream requests
+UPSTREAM_MAX_ASYNC_CONNECTIONS = 100
+# Serve the postcode page and API with async views, which make their upstream
+# requests concurrently without tying up a worker. Needs the site to be
+# served with ASGI (see wcivf/asgi.py).
+ASYNC_POSTCODE_VIEWS = os.environ.get("ASYNC_POSTCODE_VIEWS", "") == "True"
+# Timeouts, in seconds, for requests made with core.upstream. Hosts the
+# views wait on get a shorter timeout than the importers' default.
+UPSTREAM_TIMEOUT = 60
+UPSTREAM_HOST_TIMEOUTS = {
+    urlparse(EE_BASE).hostname: 10,
+    urlparse(WDIV_BASE).hostname: 10,
+}
+# Failed connections and gateway errors are retried, waiting
+# UPSTREAM_BACKOFF_FACTOR * (2 ** (retry - 1)) seconds between attempts
+UPSTREAM_RETRIES = 2
+UPSTREAM_BACKOFF_FACTOR = 0.3
+# Names upstream requests are recorded under in the Server-Timing header.
+# Requests to other hosts are recorded as "upstream".
+UPSTREAM_TIMING_NAMES = {
+    urlparse(EE_BASE).hostname: "ee",
+    urlparse(WDIV_BASE).hostname: "wdiv",
+    urlparse(YNR_BASE).hostname: "ynr",
+}
+# EveryElection data is cached in memory by EEHelper. Elections are looked
+# up in batches of EE_BATCH_SIZE, which keeps the request URL a sensible length
+EE_CACHE_MAX_SIZE = 10000
+EE_CACHE_TTL = 60 * 60
+EE_BATCH_SIZE = 50
+# Text file of valid postcode outward codes, one per line. Postcodes with
+# other outward codes are rejected without looking them up
+POSTCODE_OUTCODES_FILE = os.environ.get("POSTCODE_OUTCODES_FILE")
+# Base URL of a WhereDoIVote export, imported with the
+# import_polling_stations command
+POLLING_STATIONS_EXPORT_URL = os.environ.get("POLLING_STATIONS_EXPORT_URL")
+# Look up polling stations in the imported WhereDoIVote data before asking
+# the WhereDoIVote API
+LOCAL_POLLING_STATIONS = os.environ.get("LOCAL_POLLING_STATIONS", "") == "True"
+# Number of API pages the importers download ahead of the page they are
+# writing to the database
+IMPORT_PREFETCH_PAGES = 2
+
 CANONICAL_URL = "https://whocanivotefor.co.uk"
 ROBOTS_USE_HOST = False
 
@@ -232,6 +280,24 @@ import redis
 REDIS_POOL = redis.ConnectionPool(host="127.0.0.1", port=6379, db=5)
 REDIS_KEY_PREFIX = "WCIVF"
 REDIS_LOG_POSTCODE = True
+# Only one worker fetches a missing postcode, polling station or ballot
+# bundle at a time. Other workers poll the cache for its result every
+# SINGLE_FLIGHT_POLL_INTERVAL seconds, for up to SINGLE_FLIGHT_WAIT_TIMEOUT
+# seconds. Locks expire after SINGLE_FLIGHT_LOCK_TIMEOUT seconds in case the
+# worker holding it dies.
+SINGLE_FLIGHT_LOCK_TIMEOUT = 30
+SINGLE_FLIGHT_WAIT_TIMEOUT = 5
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+# When an import changes at most this many ballots, their cached candidate
+# bundles are rebuilt straight away rather than on the next page view
+BALLOT_BUNDLE_REBUILD_LIMIT = 200
+
+# Fraction of requests HotPathTimingMiddleware times and adds a Server-Timing
+# header to. Set to 1 to time every request.
+HOT_PATH_TIMING_SAMPLE_RATE = float(
+    os.environ.get("HOT_PATH_TIMING_SAMPLE_RATE", 0.05)
+)
 
 REST_FRAMEWORK = {
     # Use Django's standard `django.contrib.auth` permissions,